@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Shared Basic Plan Document (BPD) artifact store. Many plans adopt the same
+vendor BPD and differ only in their Adoption Agreement (AA), so the BPD's
+layout, provisions, BM25 index and embeddings are built once and kept under
+the BPD's content hash:
+
+  <store>/<sha256>/meta.json          doc_id, source, stage versions/config per artifact
+  <store>/<sha256>/layout.json        normalized layout (when built from a PDF)
+  <store>/<sha256>/provisions.json    segmented provisions
+  <store>/<sha256>/index.pkl          ProvisionIndex: normalized entries plus BM25 postings and statistics
+  <store>/<sha256>/local_embedder.json  local embedder fitted on the BPD (local backend without --local-model)
+  <store>/<sha256>/embeddings.sqlite  provision vectors by (embedder model id, text hash)
+
+Each artifact is rebuilt when its stage version (scripts/manifest.py) or config
+changes, or when any upstream artifact's does (each stamp includes its upstream
+stamp). Per-plan runs index only the AA and search it together with the stored
+BPD index (AA first, so AA elections win retrieval ties; BPD postings are reused,
+not rebuilt), embed only AA text, and run build_canonical() over the combined index.
+
+Usage:
+  python scripts/bpd_store.py --bpd-layout tmp/layout_full/relius_bpd.json \
+      --aa-layout tmp/layout_full/plan_a_aa.json tmp/layout_full/plan_b_aa.json --out-dir tmp/canonical
+  python scripts/bpd_store.py --bpd sample_docs/source/relius_bpd.pdf --aa sample_docs/source/*_aa.pdf --out-dir tmp/canonical
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import extract_canonical
+from embedding_cache import EmbeddingCache
+from extract_canonical import (
+    add_embedding_args,
+    build_canonical,
+    clean_for_embedding,
+    configure_embeddings,
+    finish_embeddings,
+    make_embedder,
+)
+from extract_layout import add_service_args, analyze_document, create_client
+from interval_index import ATTACH_MODES
+from manifest import sha256_file, stage_version
+from local_embeddings import HashingTfidfEmbedder
+from provision_index import IndexedProvision, ProvisionIndex
+from segment_provisions import segment
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Canonical extraction for plans sharing one cached BPD.")
+    bpd = parser.add_mutually_exclusive_group(required=True)
+    bpd.add_argument("--bpd", help="Shared BPD PDF.")
+    bpd.add_argument("--bpd-layout", help="Shared BPD normalized layout JSON.")
+    parser.add_argument("--bpd-doc-id", help="BPD document ID (defaults to the input stem).")
+    parser.add_argument("--aa", nargs="*", default=[], help="Adoption Agreement PDFs.")
+    parser.add_argument("--aa-layout", nargs="*", default=[], help="Adoption Agreement normalized layout JSON files.")
+    parser.add_argument("--out-dir", required=True, help="Canonical output directory (<aa doc_id>.json per plan).")
+    parser.add_argument("--store", default="tmp/cache/bpd_store", help="Shared BPD artifact store root.")
+    parser.add_argument("--redact-text", action="store_true", help="Redact text content in the layout stage.")
+    parser.add_argument("--toc-pages", type=int, default=3, help="Initial pages treated as TOC by segmentation.")
+    parser.add_argument("--table-attach", choices=ATTACH_MODES, default="first", help="Segmentation table attach mode.")
+    add_service_args(parser)
+    add_embedding_args(parser)
+    return parser.parse_args()
+
+
+class StoredVectorEmbedder:
+    """
+    Serves vectors already in a store cache (kept in memory after the first plan)
+    and delegates the rest (e.g. AA text) to the base embedder.
+    """
+
+    def __init__(self, base: Any, cache: EmbeddingCache):
+        self.base = base
+        self.cache = cache
+        self.model_id = base.model_id
+        self.memo: Dict[str, List[float]] = {}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [self.memo.get(t) for t in texts]
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            for i, vec in zip(missing, self.cache.get_many(self.model_id, [texts[i] for i in missing])):
+                vectors[i] = vec
+            unstored = [i for i in missing if vectors[i] is None]
+            if unstored:
+                for i, vec in zip(unstored, self.base.embed([texts[i] for i in unstored])):
+                    vectors[i] = vec
+            for i in missing:
+                self.memo[texts[i]] = vectors[i]  # type: ignore[assignment]
+        return vectors  # type: ignore[return-value]
+
+
+class SharedDocument:
+    """One store entry: lazily (re)built layout, provisions, index and embeddings for a shared BPD."""
+
+    def __init__(self, root: Path, doc_id: str, source: Path):
+        self.root = root
+        self.doc_id = doc_id
+        self.source = source
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path = root / "meta.json"
+        self.meta: Dict[str, Any] = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        self.meta.update({"doc_id": doc_id, "source": source.name})
+        self._embeddings: Optional[EmbeddingCache] = None
+
+    def _fresh(self, artifact: str, stamp: Dict[str, Any]) -> bool:
+        return (self.root / artifact).exists() and self.meta.get(artifact) == stamp
+
+    def _stamp(self, artifact: str, stamp: Dict[str, Any]):
+        self.meta[artifact] = stamp
+        (self.root / "meta.json").write_text(json.dumps(self.meta, indent=2))
+
+    def layout_stamp(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        if self.source.suffix.lower() != ".pdf":
+            return {"input": "layout"}  # the store key is already the layout file's hash
+        return {"version": stage_version("layout"), **config}
+
+    def provisions_stamp(self, layout_stamp: Dict[str, Any], toc_pages: int, table_attach: str) -> Dict[str, Any]:
+        return {"layout": layout_stamp, "version": stage_version("segment"), "toc_pages": toc_pages, "table_attach": table_attach}
+
+    def index_stamp(self, provisions_stamp: Dict[str, Any]) -> Dict[str, Any]:
+        return {"provisions": provisions_stamp, "version": stage_version("canonical")}
+
+    def layout(self, build: Any, stamp: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalized layout; `build()` runs the layout stage on a miss (PDF sources only)."""
+        if self.source.suffix.lower() != ".pdf":
+            return json.loads(self.source.read_text())
+        path = self.root / "layout.json"
+        if not self._fresh("layout.json", stamp):
+            path.write_text(json.dumps(build(), indent=2))
+            self._stamp("layout.json", stamp)
+        return json.loads(path.read_text())
+
+    def provisions(self, layout_fn: Any, stamp: Dict[str, Any]) -> List[Dict[str, Any]]:
+        path = self.root / "provisions.json"
+        if not self._fresh("provisions.json", stamp):
+            provisions = segment(layout_fn(), stamp["toc_pages"], stamp["table_attach"])
+            path.write_text(json.dumps({"provisions": provisions, "source_layout": self.source.name}, indent=2))
+            self._stamp("provisions.json", stamp)
+        return json.loads(path.read_text())["provisions"]
+
+    def index(self, provisions_fn: Any, stamp: Dict[str, Any]) -> ProvisionIndex:
+        """Normalized entries with their BM25 postings, so plans merge into the index instead of rebuilding it."""
+        path = self.root / "index.pkl"
+        if self._fresh("index.pkl", stamp):
+            with path.open("rb") as fh:
+                return pickle.load(fh)
+        index = ProvisionIndex(provisions_fn())
+        with path.open("wb") as fh:
+            pickle.dump(index, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        self._stamp("index.pkl", stamp)
+        return index
+
+    def local_model(self, index: ProvisionIndex, stamp: Dict[str, Any]) -> HashingTfidfEmbedder:
+        """Local embedder fitted on the BPD and kept here, so every plan projects through one stored basis."""
+        path = self.root / "local_embedder.json"
+        if not self._fresh("local_embedder.json", stamp):
+            texts = [clean_for_embedding(entry.blob) for entry in index]
+            HashingTfidfEmbedder(svd_components=stamp["svd_components"]).fit(texts).save(path)
+            self._stamp("local_embedder.json", stamp)
+        return HashingTfidfEmbedder.load(path)
+
+    def embeddings(self) -> EmbeddingCache:
+        # Keyed by (model id, text hash), so vectors stay valid across code changes.
+        if self._embeddings is None:
+            self._embeddings = EmbeddingCache(self.root / "embeddings.sqlite")
+        return self._embeddings
+
+    def ensure_embeddings(self, embedder: Any, entries: Sequence[IndexedProvision]) -> int:
+        """Embed and store any BPD entries the cache lacks for this embedder; returns how many were added."""
+        cache = self.embeddings()
+        texts = [clean_for_embedding(entry.blob) for entry in entries]
+        missing = [t for t, vec in zip(texts, cache.get_many(embedder.model_id, texts)) if vec is None]
+        missing = list(dict.fromkeys(missing))
+        if missing:
+            cache.put_many(embedder.model_id, missing, embedder.embed(missing))
+        return len(missing)
+
+    def close(self):
+        if self._embeddings:
+            self._embeddings.close()
+            self._embeddings = None
+
+
+def shared_embedder(shared: SharedDocument, bpd_index: ProvisionIndex, index_stamp: Dict[str, Any]) -> Optional[Any]:
+    """One embedder for every plan in the run, serving BPD vectors from the store (None for BM25 only)."""
+    if extract_canonical.EMB_BACKEND == "local" and extract_canonical.LOCAL_MODEL_PATH is None:
+        # No corpus model given: reuse one fitted on the BPD instead of refitting over the BPD per plan.
+        stamp = {"index": index_stamp, "svd_components": extract_canonical.LOCAL_SVD_COMPONENTS}
+        base: Optional[Any] = shared.local_model(bpd_index, stamp)
+    else:
+        base = make_embedder(bpd_index)
+    if base is None:
+        return None
+    added = shared.ensure_embeddings(base, bpd_index.entries)
+    if added:
+        print(f"  embedded {added} BPD provisions for {base.model_id}")
+    return StoredVectorEmbedder(base, shared.embeddings())
+
+
+class BpdStore:
+    """Content-addressed store of shared BPD artifacts."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def open(self, source: Path, doc_id: Optional[str] = None) -> SharedDocument:
+        key = sha256_file(source)
+        return SharedDocument(self.root / key, doc_id or source.stem, source)
+
+
+class LayoutRunner:
+    """Layout stage for PDF inputs; the service client is only created if something needs analyzing."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.client: Any = None
+
+    def analyze(self, pdf: Path, doc_id: str) -> Dict[str, Any]:
+        args = self.args
+        if self.client is None and not args.from_cache:
+            self.client = create_client(args)
+        return analyze_document(
+            self.client,
+            pdf,
+            doc_id,
+            args.endpoint,
+            args.key,
+            redact=args.redact_text,
+            cache_dir=None if args.no_cache else Path(args.cache_dir),
+            cache_only=args.from_cache,
+            chunk_pages=args.chunk_pages,
+            chunk_concurrency=args.chunk_concurrency,
+        )
+
+    def layout(self, path: Path) -> Dict[str, Any]:
+        if path.suffix.lower() != ".pdf":
+            return json.loads(path.read_text())
+        return self.analyze(path, path.stem)
+
+
+def main():
+    args = parse_args()
+    aa_inputs = [Path(p) for p in args.aa + args.aa_layout]
+    if not aa_inputs:
+        sys.stderr.write("Provide at least one --aa or --aa-layout.\n")
+        sys.exit(1)
+    configure_embeddings(args)
+    runner = LayoutRunner(args)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    bpd_source = Path(args.bpd or args.bpd_layout)
+    shared = BpdStore(Path(args.store)).open(bpd_source, args.bpd_doc_id)
+    # Each stamp embeds its upstream stamp, so a cached artifact is only reused when its whole chain is current.
+    layout_stamp = shared.layout_stamp({"redact": args.redact_text})
+    provisions_stamp = shared.provisions_stamp(layout_stamp, args.toc_pages, args.table_attach)
+
+    def bpd_layout() -> Dict[str, Any]:
+        return shared.layout(lambda: runner.analyze(bpd_source, shared.doc_id), layout_stamp)
+
+    def bpd_provisions() -> List[Dict[str, Any]]:
+        return shared.provisions(bpd_layout, provisions_stamp)
+
+    index_stamp = shared.index_stamp(provisions_stamp)
+    bpd_index = shared.index(bpd_provisions, index_stamp)
+    embedder = shared_embedder(shared, bpd_index, index_stamp)
+    print(f"Shared BPD {shared.doc_id} ({len(bpd_index)} provisions) ready in {time.perf_counter() - start:.2f}s")
+
+    for aa_path in aa_inputs:
+        start = time.perf_counter()
+        aa_provisions = segment(runner.layout(aa_path), args.toc_pages, args.table_attach)
+        doc_id = aa_provisions[0]["doc_id"] if aa_provisions else aa_path.stem
+        # Only the AA is indexed per plan; the BPD's stored postings are searched alongside it.
+        index = ProvisionIndex.merged([ProvisionIndex(aa_provisions), bpd_index])
+        provisions = [entry.prov for entry in index]
+        canonical = build_canonical(doc_id, provisions, index=index, embedder=embedder if len(index) else None)
+        out_path = out_dir / f"{doc_id}.json"
+        out_path.write_text(json.dumps(canonical, indent=2))
+        print(f"Wrote {out_path} ({len(aa_provisions)} AA + {len(bpd_index)} BPD provisions, {time.perf_counter() - start:.2f}s)")
+    shared.close()
+    finish_embeddings()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+SQLite corpus store: ingest layouts, provisions and canonical drafts for many
+documents into one indexed database, then search provision text across the
+corpus with FTS5 instead of loading every JSON file.
+
+Tables:
+  documents         doc_id, file name, page count
+  artifacts         (kind, source path) -> doc_id + sha256; unchanged files are skipped on re-ingest
+  sections          layout sections (title, page span, block/table counts)
+  provisions        segmented provisions (title, breadcrumbs, page span)
+  blocks            provision blocks in reading order (page, type, text, bbox)
+  canonical_fields  one row per canonical report field: status, value JSON, provenance
+  provisions_fts    FTS5 over provision title / body / table text (rowid = provisions.id)
+
+Usage:
+  python scripts/corpus_db.py ingest --db tmp/corpus.sqlite --layout-dir tmp/layout_full \
+      --provisions-dir tmp/provisions --canonical-dir tmp/canonical
+  python scripts/corpus_db.py search --db tmp/corpus.sqlite "6 year graded" --field vesting.schedule
+  python scripts/corpus_db.py search --db tmp/corpus.sqlite --fts 'title:vesting AND "6 year"' --limit 50
+  python scripts/corpus_db.py fields --db tmp/corpus.sqlite eligibility.age
+  python scripts/corpus_db.py sql --db tmp/corpus.sqlite "SELECT field, status, COUNT(*) FROM canonical_fields GROUP BY 1, 2"
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from field_specs import FIELD_SPECS
+from jsonl_io import iter_provisions, load_layout
+from manifest import sha256_file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    file_name TEXT,
+    page_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (kind, path)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    doc_id TEXT NOT NULL,
+    section_id TEXT,
+    seq INTEGER NOT NULL,
+    title TEXT,
+    page_start INTEGER,
+    page_end INTEGER,
+    block_count INTEGER,
+    table_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS sections_doc ON sections (doc_id);
+CREATE TABLE IF NOT EXISTS provisions (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    provision_id TEXT,
+    seq INTEGER NOT NULL,
+    title TEXT,
+    breadcrumbs TEXT,
+    page_start INTEGER,
+    page_end INTEGER,
+    source_layout TEXT
+);
+CREATE INDEX IF NOT EXISTS provisions_doc ON provisions (doc_id, provision_id);
+CREATE TABLE IF NOT EXISTS blocks (
+    doc_id TEXT NOT NULL,
+    provision_id TEXT,
+    block_id TEXT,
+    seq INTEGER NOT NULL,
+    page INTEGER,
+    type TEXT,
+    text TEXT,
+    bbox TEXT
+);
+CREATE INDEX IF NOT EXISTS blocks_doc ON blocks (doc_id, provision_id);
+CREATE TABLE IF NOT EXISTS canonical_fields (
+    doc_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    status TEXT,
+    value TEXT,
+    provision_id TEXT,
+    page_start INTEGER,
+    page_end INTEGER,
+    PRIMARY KEY (doc_id, field)
+);
+CREATE INDEX IF NOT EXISTS canonical_fields_field ON canonical_fields (field, status);
+CREATE VIRTUAL TABLE IF NOT EXISTS provisions_fts USING fts5(
+    title, body, table_text, tokenize = 'porter unicode61'
+);
+"""
+
+# Artifact kinds, in ingest order; each maps to a CorpusStore.ingest_<kind> method.
+KINDS = ("layout", "provisions", "canonical")
+
+# bm25() column weights for provisions_fts (title, body, table_text); title boosted as in provision_index.py.
+FTS_WEIGHTS = (2.0, 1.0, 1.0)
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def connect(path: Path, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path))
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        try:
+            conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as exc:
+            if "fts5" in str(exc):
+                raise SystemExit("This Python's SQLite build lacks FTS5; corpus_db.py needs it.") from exc
+            raise
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def page_span(page_range: Any) -> Tuple[Optional[int], Optional[int]]:
+    if not page_range:
+        return None, None
+    return page_range[0], page_range[-1]
+
+
+def provision_texts(prov: Dict[str, Any]) -> Tuple[str, str]:
+    """Body (block text) and table-cell text of one provision, original casing kept for snippets."""
+    body = " ".join(blk.get("text") or "" for blk in prov.get("blocks") or [])
+    table_text = " ".join(
+        cell.get("text") or ""
+        for tbl in prov.get("tables") or []
+        for row in tbl.get("rows") or []
+        for cell in row.get("cells") or []
+    )
+    return body, table_text
+
+
+def find_provenance(node: Any) -> Optional[Dict[str, Any]]:
+    """First provenance dict inside a canonical node (depth first, key order)."""
+    if isinstance(node, dict):
+        if isinstance(node.get("provenance"), dict):
+            return node["provenance"]
+        for value in node.values():
+            found = find_provenance(value)
+            if found:
+                return found
+    return None
+
+
+def field_path(field: str) -> Tuple[str, ...]:
+    """Plan location of a report field: its spec's plan_path (loans.enabled -> loans), else the dotted name."""
+    for spec in FIELD_SPECS:
+        if spec.field == field:
+            return spec.plan_path
+    return tuple(field.split("."))
+
+
+def resolve_field(plan: Dict[str, Any], field: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Canonical node for a report field and its provenance (the nearest enclosing one for leaf values)."""
+    node: Any = plan
+    provenance = None
+    for part in field_path(field):
+        if not isinstance(node, dict) or part not in node:
+            return None, None
+        if isinstance(node.get("provenance"), dict):
+            provenance = node["provenance"]
+        node = node[part]
+    return node, find_provenance(node) or provenance
+
+
+class CorpusStore:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def unchanged(self, kind: str, path: Path, digest: str) -> bool:
+        row = self.conn.execute(
+            "SELECT sha256 FROM artifacts WHERE kind = ? AND path = ?", (kind, str(path.resolve()))
+        ).fetchone()
+        return row is not None and row["sha256"] == digest
+
+    def _record(self, doc_id: str, kind: str, path: Path, digest: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO artifacts (kind, path, doc_id, sha256, ingested_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, str(path.resolve()), doc_id, digest, time.time()),
+        )
+
+    def _document(self, doc_id: str, file_name: Optional[str] = None, page_count: Optional[int] = None):
+        self.conn.execute(
+            "INSERT INTO documents (doc_id, file_name, page_count) VALUES (?, ?, ?) "
+            "ON CONFLICT (doc_id) DO UPDATE SET file_name = COALESCE(excluded.file_name, file_name), "
+            "page_count = COALESCE(excluded.page_count, page_count)",
+            (doc_id, file_name, page_count),
+        )
+
+    def ingest_layout(self, path: Path, digest: str) -> str:
+        layout = load_layout(path)
+        doc_id = layout.get("document_id") or path.stem
+        self._document(doc_id, layout.get("file_name"), layout.get("page_count"))
+        self.conn.execute("DELETE FROM sections WHERE doc_id = ?", (doc_id,))
+        self.conn.executemany(
+            "INSERT INTO sections (doc_id, section_id, seq, title, page_start, page_end, block_count, table_count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (doc_id, sec.get("id"), seq, sec.get("title"), *page_span(sec.get("page_range")),
+                 len(sec.get("blocks") or []), len(sec.get("tables") or []))
+                for seq, sec in enumerate(layout.get("sections") or [])
+            ),
+        )
+        self._record(doc_id, "layout", path, digest)
+        return doc_id
+
+    def ingest_provisions(self, path: Path, digest: str) -> str:
+        header, records = iter_provisions(path)
+        first = next(records, None)
+        doc_id = (first or {}).get("doc_id") or path.stem
+        if first is not None:
+            records = itertools.chain([first], records)
+        self.conn.execute(
+            "DELETE FROM provisions_fts WHERE rowid IN (SELECT id FROM provisions WHERE doc_id = ?)", (doc_id,)
+        )
+        self.conn.execute("DELETE FROM provisions WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM blocks WHERE doc_id = ?", (doc_id,))
+        self._document(doc_id)
+        for seq, prov in enumerate(records):
+            provision_id = prov.get("provision_id")
+            cur = self.conn.execute(
+                "INSERT INTO provisions (doc_id, provision_id, seq, title, breadcrumbs, page_start, page_end, source_layout) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, provision_id, seq, prov.get("title"), json.dumps(prov.get("breadcrumbs")),
+                 *page_span(prov.get("page_range")), header.get("source_layout")),
+            )
+            body, table_text = provision_texts(prov)
+            self.conn.execute(
+                "INSERT INTO provisions_fts (rowid, title, body, table_text) VALUES (?, ?, ?, ?)",
+                (cur.lastrowid, prov.get("title") or "", body, table_text),
+            )
+            self.conn.executemany(
+                "INSERT INTO blocks (doc_id, provision_id, block_id, seq, page, type, text, bbox) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (doc_id, provision_id, blk.get("id"), i, blk.get("page"), blk.get("type"), blk.get("text"),
+                     json.dumps(blk.get("bbox")) if blk.get("bbox") is not None else None)
+                    for i, blk in enumerate(prov.get("blocks") or [])
+                ),
+            )
+        self._record(doc_id, "provisions", path, digest)
+        return doc_id
+
+    def ingest_canonical(self, path: Path, digest: str) -> str:
+        canonical = json.loads(path.read_text())
+        doc_id = canonical.get("doc_id") or path.stem
+        plan = canonical.get("plan") or {}
+        self._document(doc_id)
+        self.conn.execute("DELETE FROM canonical_fields WHERE doc_id = ?", (doc_id,))
+        rows = []
+        for field, status in (canonical.get("report") or {}).items():
+            node, provenance = resolve_field(plan, field)
+            provenance = provenance or {}
+            rows.append(
+                (doc_id, field, status, json.dumps(node) if node not in (None, {}) else None,
+                 provenance.get("provision_id"), *page_span(provenance.get("page_range")))
+            )
+        self.conn.executemany(
+            "INSERT INTO canonical_fields (doc_id, field, status, value, provision_id, page_start, page_end) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._record(doc_id, "canonical", path, digest)
+        return doc_id
+
+
+def artifact_files(directory: Optional[str]) -> List[Path]:
+    if not directory:
+        return []
+    paths = [p for p in sorted(Path(directory).iterdir()) if p.suffix.lower() in (".json", ".jsonl")]
+    return [p for p in paths if not p.name.startswith("_") and not p.name.endswith(".manifest.json")]
+
+
+def ingest(store: CorpusStore, dirs: Dict[str, Optional[str]], force: bool = False) -> Dict[str, Dict[str, int]]:
+    counts: Dict[str, Dict[str, int]] = {kind: {"ingested": 0, "unchanged": 0} for kind in KINDS}
+    for kind in KINDS:
+        for path in artifact_files(dirs.get(kind)):
+            digest = sha256_file(path)
+            if not force and store.unchanged(kind, path, digest):
+                counts[kind]["unchanged"] += 1
+                continue
+            with store.conn:  # one transaction per artifact; a document's old rows are replaced
+                getattr(store, f"ingest_{kind}")(path, digest)
+            counts[kind]["ingested"] += 1
+    return counts
+
+
+def match_expression(query: str, phrase: bool) -> str:
+    """FTS5 MATCH string for plain text: every term required (quoted, so punctuation is safe), or one phrase."""
+    terms = TERM_RE.findall(query)
+    if not terms:
+        raise SystemExit(f"No searchable terms in {query!r}.")
+    if phrase:
+        return '"' + " ".join(terms) + '"'
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search(
+    conn: sqlite3.Connection,
+    match: str,
+    field: Optional[str] = None,
+    doc_ids: Sequence[str] = (),
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """Provisions matching an FTS5 expression, best bm25 first; optionally only those backing a canonical field."""
+    sql = [
+        "SELECT p.doc_id, p.provision_id, p.title, p.page_start, p.page_end,",
+        "       snippet(provisions_fts, -1, '[', ']', ' ... ', 16) AS snippet,",
+        "       bm25(provisions_fts, ?, ?, ?) AS score",
+        "FROM provisions_fts JOIN provisions p ON p.id = provisions_fts.rowid",
+    ]
+    params: List[Any] = list(FTS_WEIGHTS)
+    if field:
+        sql.append("JOIN canonical_fields f ON f.doc_id = p.doc_id AND f.provision_id = p.provision_id AND f.field = ?")
+        params.append(field)
+    sql.append("WHERE provisions_fts MATCH ?")
+    params.append(match)
+    if doc_ids:
+        sql.append(f"AND p.doc_id IN ({','.join('?' for _ in doc_ids)})")
+        params.extend(doc_ids)
+    sql.append("ORDER BY score LIMIT ?")
+    params.append(limit)
+    try:
+        rows = conn.execute("\n".join(sql), params).fetchall()
+    except sqlite3.OperationalError as exc:
+        raise SystemExit(f"Bad search expression {match!r}: {exc}") from exc
+    return [dict(row) for row in rows]
+
+
+def field_values(conn: sqlite3.Connection, field: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql = "SELECT doc_id, field, status, value, provision_id, page_start, page_end FROM canonical_fields WHERE field = ?"
+    params: List[Any] = [field]
+    if status:
+        sql += " AND status = ?"
+        params.append(status)
+    rows = [dict(row) for row in conn.execute(sql + " ORDER BY doc_id", params)]
+    for row in rows:
+        row["value"] = json.loads(row["value"]) if row["value"] else None
+    return rows
+
+
+def pages(row: Dict[str, Any]) -> str:
+    if row.get("page_start") is None:
+        return "-"
+    if row["page_start"] == row["page_end"]:
+        return f"p{row['page_start']}"
+    return f"p{row['page_start']}-{row['page_end']}"
+
+
+def print_rows(rows: Iterable[Dict[str, Any]], as_json: bool, line: Any):
+    rows = list(rows)
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    for row in rows:
+        print(line(row))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingest pipeline outputs into SQLite and search them across documents.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="Load layout/provision/canonical files (changed files only).")
+    p.add_argument("--db", default="tmp/corpus.sqlite", help="Corpus database path.")
+    p.add_argument("--layout-dir", help="Normalized layout JSON/JSONL directory.")
+    p.add_argument("--provisions-dir", help="Provision JSON/JSONL directory.")
+    p.add_argument("--canonical-dir", help="Canonical JSON directory.")
+    p.add_argument("--force", action="store_true", help="Re-ingest files even if their hash is unchanged.")
+
+    p = sub.add_parser("search", help="Full-text search over provision title, body and table text.")
+    p.add_argument("--db", default="tmp/corpus.sqlite", help="Corpus database path.")
+    p.add_argument("query", nargs="?", help="Plain-text query; every term must appear (stemmed).")
+    p.add_argument("--phrase", action="store_true", help="Require the query terms as one adjacent phrase.")
+    p.add_argument("--fts", help="Raw FTS5 MATCH expression (columns: title, body, table_text).")
+    p.add_argument("--field", help="Only provisions cited as provenance for this canonical field (e.g. vesting.schedule).")
+    p.add_argument("--doc-id", action="append", default=[], help="Restrict to a document (repeatable).")
+    p.add_argument("--limit", type=int, default=20, help="Maximum results.")
+    p.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    p = sub.add_parser("fields", help="Canonical field values across documents.")
+    p.add_argument("--db", default="tmp/corpus.sqlite", help="Corpus database path.")
+    p.add_argument("field", help="Canonical report field, e.g. eligibility.age.")
+    p.add_argument("--status", choices=["hit", "miss"], help="Only documents with this outcome.")
+    p.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    p = sub.add_parser("sql", help="Run a read-only SQL query.")
+    p.add_argument("--db", default="tmp/corpus.sqlite", help="Corpus database path.")
+    p.add_argument("statement", help="SQL statement.")
+    p.add_argument("--json", action="store_true", help="Print results as JSON.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db_path = Path(args.db)
+    if args.command == "ingest":
+        dirs = {"layout": args.layout_dir, "provisions": args.provisions_dir, "canonical": args.canonical_dir}
+        if not any(dirs.values()):
+            sys.stderr.write("Provide at least one of --layout-dir, --provisions-dir, --canonical-dir.\n")
+            sys.exit(1)
+        conn = connect(db_path)
+        start = time.perf_counter()
+        counts = ingest(CorpusStore(conn), dirs, force=args.force)
+        conn.execute("INSERT INTO provisions_fts (provisions_fts) VALUES ('optimize')")
+        conn.commit()
+        conn.close()
+        summary = ", ".join(f"{kind} {c['ingested']} new/{c['unchanged']} unchanged" for kind, c in counts.items())
+        print(f"Ingested into {db_path} in {time.perf_counter() - start:.2f}s: {summary}")
+        return
+
+    if not db_path.exists():
+        sys.stderr.write(f"{db_path} not found; run the ingest command first.\n")
+        sys.exit(1)
+    conn = connect(db_path, read_only=True)
+    start = time.perf_counter()
+    if args.command == "search":
+        if not args.query and not args.fts:
+            sys.stderr.write("Provide a query or --fts expression.\n")
+            sys.exit(1)
+        match = args.fts or match_expression(args.query, args.phrase)
+        rows = search(conn, match, field=args.field, doc_ids=args.doc_id, limit=args.limit)
+        print_rows(rows, args.json, lambda r: f"{r['doc_id']}  {r['provision_id']}  {pages(r)}  {r['title']}\n    {r['snippet']}")
+    elif args.command == "fields":
+        rows = field_values(conn, args.field, args.status)
+        print_rows(
+            rows,
+            args.json,
+            lambda r: f"{r['doc_id']}  {r['status']}  {r['provision_id'] or '-'}  {pages(r)}  {json.dumps(r['value'])}",
+        )
+    else:
+        try:
+            rows = [dict(row) for row in conn.execute(args.statement)]
+        except sqlite3.Error as exc:
+            raise SystemExit(f"SQL error: {exc}") from exc
+        print_rows(rows, args.json, lambda r: "\t".join("" if v is None else str(v) for v in r.values()))
+    if not args.json:
+        sys.stderr.write(f"{len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
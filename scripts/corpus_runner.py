@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Corpus runner: segmentation + canonical extraction for many documents, fanned
+out over a process pool (both stages are CPU-bound pure Python, so threads would
+serialize on the GIL). Each worker reads its own inputs and writes its own
+outputs, returning only a small status record, so throughput scales with cores.
+A failing document is recorded and the rest of the corpus continues.
+
+Usage:
+  python scripts/corpus_runner.py --layout-dir tmp/layout_full --provisions-dir tmp/provisions --canonical-dir tmp/canonical --workers 8
+  python scripts/corpus_runner.py --provisions-dir tmp/provisions --canonical-dir tmp/canonical   # provisions already segmented
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from extract_canonical import add_embedding_args, build_canonical, configure_embeddings, load_provisions
+from interval_index import ATTACH_MODES
+from metrics import add_metrics_args, instrument
+from segment_provisions import segment
+
+# Per-worker segmentation options, set by init_worker.
+_SEGMENT_OPTS: Dict[str, Any] = {}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Segment and extract canonical drafts for a corpus in parallel.")
+    parser.add_argument("--layout-dir", help="Normalized layout JSON inputs (omit to start from --provisions-dir).")
+    parser.add_argument(
+        "--provisions-dir", required=True, help="Provision JSON outputs (or inputs when --layout-dir is omitted)."
+    )
+    parser.add_argument("--canonical-dir", required=True, help="Canonical JSON outputs.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count).")
+    parser.add_argument("--summary", help="Corpus summary path (defaults to <canonical-dir>/_corpus_summary.json).")
+    parser.add_argument("--toc-pages", type=int, default=3, help="Initial pages treated as TOC by segmentation.")
+    parser.add_argument("--table-attach", choices=ATTACH_MODES, default="first", help="Segmentation table attach mode.")
+    add_embedding_args(parser)
+    add_metrics_args(parser, per_document=True)
+    return parser.parse_args()
+
+
+def init_worker(embedding_opts: Dict[str, Any], segment_opts: Dict[str, Any]):
+    """Process-pool initializer: module globals are not inherited under spawn, so configure each worker."""
+    configure_embeddings(argparse.Namespace(**embedding_opts))
+    _SEGMENT_OPTS.update(segment_opts)
+
+
+def process_document(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one document end to end inside a worker; never raises."""
+    record: Dict[str, Any] = {"doc_id": job["doc_id"]}
+    start = time.perf_counter()
+    try:
+        provisions_path = Path(job["provisions"])
+        metrics_path = Path(job["metrics"]) if job.get("metrics") else None
+        with instrument(job["doc_id"], metrics_path, job.get("profile"), Path(job.get("profile_dir") or "tmp/profiles")):
+            if job.get("layout"):
+                layout_path = Path(job["layout"])
+                provisions = segment(
+                    json.loads(layout_path.read_text()), _SEGMENT_OPTS["toc_pages"], _SEGMENT_OPTS["table_attach"]
+                )
+                provisions_path.write_text(
+                    json.dumps({"provisions": provisions, "source_layout": layout_path.name}, indent=2)
+                )
+            doc_id, provisions = load_provisions(provisions_path)
+            canonical = build_canonical(doc_id, provisions)
+            Path(job["canonical"]).write_text(json.dumps(canonical, indent=2))
+        record.update({"status": "ok", "provisions": len(provisions), "report": canonical["report"]})
+    except Exception as exc:
+        record.update({"status": "failed", "error": f"{type(exc).__name__}: {exc}"})
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def collect_jobs(layout_dir: Optional[str], provisions_dir: Path, canonical_dir: Path) -> List[Dict[str, Any]]:
+    source = Path(layout_dir) if layout_dir else provisions_dir
+    paths = [p for p in source.glob("*.json") if not p.name.startswith("_") and not p.name.endswith(".manifest.json")]
+    # Largest first, so a few big documents do not trail at the end of the run.
+    paths.sort(key=lambda p: p.stat().st_size, reverse=True)
+    return [
+        {
+            "doc_id": p.stem,
+            "layout": str(p) if layout_dir else None,
+            "provisions": str(provisions_dir / p.name),
+            "canonical": str(canonical_dir / p.name),
+        }
+        for p in paths
+    ]
+
+
+def aggregate_reports(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Corpus-level hit/miss counts and hit rate per canonical field."""
+    fields: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        for field, outcome in (record.get("report") or {}).items():
+            counts = fields.setdefault(field, {"hit": 0, "miss": 0})
+            counts[outcome] = counts.get(outcome, 0) + 1
+    for counts in fields.values():
+        total = counts["hit"] + counts["miss"]
+        counts["hit_rate"] = round(counts["hit"] / total, 4) if total else None
+    return fields
+
+
+def run_corpus(
+    jobs: List[Dict[str, Any]], workers: int, embedding_opts: Dict[str, Any], segment_opts: Dict[str, Any]
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    records: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=init_worker, initargs=(embedding_opts, segment_opts)) as pool:
+        futures = {pool.submit(process_document, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as exc:  # worker died (e.g. OOM kill / BrokenProcessPool)
+                record = {"doc_id": futures[future]["doc_id"], "status": "failed", "error": f"{type(exc).__name__}: {exc}"}
+            records.append(record)
+            if record["status"] != "ok":
+                print(f"[failed] {record['doc_id']}: {record['error']}")
+    wall = time.perf_counter() - started
+    records.sort(key=lambda r: r["doc_id"])
+    succeeded = sum(1 for r in records if r["status"] == "ok")
+    return {
+        "documents": len(jobs),
+        "succeeded": succeeded,
+        "failed": len(records) - succeeded,
+        "workers": workers,
+        "wall_seconds": round(wall, 3),
+        "docs_per_second": round(succeeded / wall, 3) if wall else None,
+        "fields": aggregate_reports(records),
+        "records": records,
+    }
+
+
+def main():
+    args = parse_args()
+    provisions_dir = Path(args.provisions_dir)
+    canonical_dir = Path(args.canonical_dir)
+    provisions_dir.mkdir(parents=True, exist_ok=True)
+    canonical_dir.mkdir(parents=True, exist_ok=True)
+
+    embedding_opts = {
+        name: getattr(args, name)
+        for name in (
+            "embedding_backend",
+            "use_openai_embeddings",
+            "openai_model",
+            "embedding_cache",
+            "embedding_cache_max_mb",
+            "no_embedding_cache",
+            "reuse_near_duplicates",
+            "near_duplicate_threshold",
+            "local_model",
+            "local_svd_components",
+        )
+    }
+    if args.embedding_backend == "local" and args.local_model and not Path(args.local_model).exists():
+        # Warn once here rather than from every worker's configure_embeddings().
+        print(
+            f"WARNING: {args.local_model} not found; each document fits its own local model. "
+            "Fit a corpus model first with scripts/local_embeddings.py."
+        )
+        embedding_opts["local_model"] = None
+
+    jobs = collect_jobs(args.layout_dir, provisions_dir, canonical_dir)
+    for job in jobs:
+        if args.metrics_dir:
+            job["metrics"] = str(Path(args.metrics_dir) / f"{job['doc_id']}.metrics.json")
+        if args.profile:
+            job.update({"profile": args.profile, "profile_dir": args.profile_dir})
+    segment_opts = {"toc_pages": args.toc_pages, "table_attach": args.table_attach}
+    summary = run_corpus(jobs, args.workers, embedding_opts, segment_opts)
+
+    summary_path = Path(args.summary) if args.summary else canonical_dir / "_corpus_summary.json"
+    summary_path.write_text(json.dumps(summary, indent=2))
+    print(
+        f"Corpus: {summary['succeeded']}/{summary['documents']} ok with {summary['workers']} workers "
+        f"in {summary['wall_seconds']}s ({summary['docs_per_second']} docs/s); summary at {summary_path}"
+    )
+    for field, counts in summary["fields"].items():
+        print(f"  {field}: {counts['hit']} hit / {counts['miss']} miss")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Persistent, content-addressed cache for text embeddings.
+
+Vectors are stored in SQLite as packed float32 blobs keyed by
+(model, sha256 of the embedded text), so reruns over unchanged provisions make
+no embedding calls. Tracks hit/miss counts for the current run and evicts
+least-recently-used entries once the stored vectors exceed a size budget.
+
+Default location is under tmp/ (git-ignored), e.g. tmp/cache/embeddings.sqlite.
+"""
+
+import hashlib
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store with run-level hit/miss stats and LRU eviction."""
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Generous lock timeout: corpus_runner worker processes share one cache file.
+        # Not tied to the creating thread: query_service.py embeds from request threads (one at a time).
+        self.conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # Apply a (possibly lowered) budget to what earlier runs left behind.
+        self.evict()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vectors aligned with texts (None for misses); refreshes LRU stamps on hits."""
+        keys = [text_key(t) for t in texts]
+        found = self.get_by_keys(model, keys)
+        results = [found.get(k) for k in keys]
+        hit_count = sum(1 for r in results if r is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def get_by_keys(self, model: str, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Cached vectors by text hash (absent keys omitted); refreshes LRU stamps, does not count hits."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(unique), 500):
+            chunk = unique[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model] + chunk,
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = unpack_vector(blob)
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, k) for k in found],
+            )
+            self.conn.commit()
+        return found
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            blob = pack_vector(vec)
+            rows.append((model, text_key(text), len(vec), blob, len(blob), now))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, nbytes, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+        self.evict()
+
+    def total_bytes(self) -> int:
+        row = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()
+        return int(row[0])
+
+    def evict(self) -> int:
+        """Drop least-recently-used vectors until the store fits max_bytes."""
+        if not self.max_bytes:
+            return 0
+        excess = self.total_bytes() - self.max_bytes
+        removed = 0
+        while excess > 0:
+            rows = self.conn.execute(
+                "SELECT model, text_hash, nbytes FROM embeddings ORDER BY last_used ASC LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            doomed = []
+            for model, text_hash, nbytes in rows:
+                doomed.append((model, text_hash))
+                excess -= nbytes
+                if excess <= 0:
+                    break
+            self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", doomed)
+            removed += len(doomed)
+        if removed:
+            self.conn.commit()
+            self.evicted += removed
+        return removed
+
+    def stats(self) -> Dict[str, object]:
+        entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evicted": self.evicted,
+            "entries": entries,
+            "bytes": self.total_bytes(),
+        }
+
+    def close(self):
+        self.conn.close()
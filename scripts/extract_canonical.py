@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """
 Draft canonical extractor: map provision chunks to canonical fields.
-Heuristic layer with optional semantic ranking via OpenAI embeddings.
+Heuristic layer (BM25 retrieval over provisions) with optional semantic ranking via
+OpenAI embeddings or an offline hashing TF-IDF embedder (scripts/local_embeddings.py).
 
-Targets (initial):
+Fields are declared in scripts/field_specs.py (query, keywords, numeric ranges,
+label rules); targets (initial):
 - eligibility.age (deferrals/match/profit_sharing)
 - eligibility.service (years/hours where obvious)
 - eligibility.entry_dates (provenance only)
@@ -26,69 +28,180 @@ import argparse
 import json
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from embedding_cache import EmbeddingCache
+from field_specs import FIELD_SPECS, FieldSpec
+from jsonl_io import iter_provisions
+from local_embeddings import load_or_fit
+from metrics import add_metrics_args, incr, instrument, timer
+from multi_pattern import PatternMatcher
+from near_duplicates import NearDuplicateStore
+from provision_index import IndexedProvision, ProvisionIndex
+from similarity import normalize_rows, similarity_matrix, top_k_indices
 
 try:
     import openai  # type: ignore
 except Exception:
     openai = None
 
-USE_EMB = False
+EMB_BACKEND = "none"  # none | openai | local
 EMB_MODEL = "text-embedding-3-small"
-
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Heuristic canonical extraction from provision JSON.")
-    parser.add_argument("--provisions", required=True, help="Path to provisions JSON (from segment_provisions).")
-    parser.add_argument("--out", required=True, help="Output path for canonical JSON.")
-    parser.add_argument("--doc-id", help="Override doc_id for output (defaults to provisions doc).")
+LOCAL_MODEL_PATH: Optional[Path] = None
+LOCAL_SVD_COMPONENTS = 0
+EMB_CACHE: Optional[EmbeddingCache] = None
+EMB_NEAR_DUPS: Optional[NearDuplicateStore] = None
+EMB_CALLS = 0
+# OpenAI embeddings API limits: inputs per request, tokens per request, tokens per input.
+EMB_MAX_INPUTS = 2048
+EMB_MAX_REQUEST_TOKENS = 250_000
+EMB_MAX_INPUT_CHARS = 24_000  # ~8k tokens at ~3 chars/token for plan-document prose
+
+# One query per canonical field; embedded together in a single request per document.
+FIELD_QUERIES: Dict[str, str] = {spec.field: spec.query for spec in FIELD_SPECS}
+
+
+def add_embedding_args(parser: argparse.ArgumentParser):
+    """Semantic-ranking options, shared with scripts/pipeline.py."""
+    parser.add_argument(
+        "--embedding-backend",
+        choices=["none", "openai", "local"],
+        default="none",
+        help="Semantic ranking backend: OpenAI API, local hashing TF-IDF (offline), or none (BM25 only).",
+    )
     parser.add_argument(
         "--use-openai-embeddings",
         action="store_true",
-        help="Enable semantic ranking with OpenAI embeddings (requires OPENAI_API_KEY).",
+        help="Shorthand for --embedding-backend openai (requires OPENAI_API_KEY).",
     )
     parser.add_argument(
         "--openai-model",
         default="text-embedding-3-small",
         help="OpenAI embedding model to use when --use-openai-embeddings is set.",
     )
+    parser.add_argument(
+        "--embedding-cache",
+        default="tmp/cache/embeddings.sqlite",
+        help="SQLite file caching embeddings by (model, text hash) across runs.",
+    )
+    parser.add_argument(
+        "--embedding-cache-max-mb",
+        type=float,
+        default=512,
+        help="Evict least-recently-used cached embeddings beyond this size (MB).",
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Disable the on-disk embedding cache (always call the API).",
+    )
+    parser.add_argument(
+        "--reuse-near-duplicates",
+        action="store_true",
+        help="Serve cache misses from the cached embedding of a near-identical text (MinHash/LSH, see scripts/near_duplicates.py).",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=0.9,
+        help="Minimum estimated Jaccard similarity for --reuse-near-duplicates.",
+    )
+    parser.add_argument(
+        "--local-model",
+        help="Corpus model fitted with scripts/local_embeddings.py (without one, each document fits its own unsaved model).",
+    )
+    parser.add_argument(
+        "--local-svd-components",
+        type=int,
+        default=0,
+        help="Truncated SVD dimensions when fitting the local embedder here (0 = none; needs numpy).",
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Heuristic canonical extraction from provision JSON.")
+    parser.add_argument(
+        "--provisions", required=True, help="Path to provisions JSON or JSONL (from segment_provisions)."
+    )
+    parser.add_argument("--out", required=True, help="Output path for canonical JSON.")
+    parser.add_argument("--doc-id", help="Override doc_id for output (defaults to provisions doc).")
+    add_embedding_args(parser)
+    add_metrics_args(parser)
     return parser.parse_args()
 
 
 def load_provisions(path: Path) -> Tuple[str, List[Dict[str, Any]]]:
-    data = json.loads(path.read_text())
-    provisions = data.get("provisions", [])
-    doc_id = data.get("provisions", [{}])[0].get("doc_id") if provisions else data.get("source_layout", path.stem)
+    # .jsonl provision files are read a line at a time (see jsonl_io.py).
+    header, records = iter_provisions(path)
+    provisions = list(records)
+    doc_id = provisions[0].get("doc_id") if provisions else header.get("source_layout", path.stem)
     return doc_id or path.stem, provisions
 
 
-def text_blob(prov: Dict[str, Any]) -> str:
-    parts = [prov.get("title") or ""]
-    for blk in prov.get("blocks", []):
-        parts.append(blk.get("text") or "")
-    for tbl in prov.get("tables", []):
-        for row in tbl.get("rows", []):
-            for cell in row.get("cells", []):
-                parts.append(cell.get("text") or "")
-    return " ".join(parts).lower()
-
-
 def clean_for_embedding(text: str) -> str:
     text = re.sub(r"^[0-9.\\-\\s]+", "", text)
-    return text
-
-
-def score_provision(prov: Dict[str, Any], keywords: List[str]) -> int:
-    blob = text_blob(prov)
-    return sum(blob.count(k.lower()) for k in keywords)
+    return text[:EMB_MAX_INPUT_CHARS]
+
+
+def chunk_for_embedding(texts: List[str]) -> List[List[str]]:
+    """Split texts into request-sized batches (input count and estimated token budget)."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    budget = 0
+    for text in texts:
+        est = len(text) // 3 + 1
+        if current and (len(current) >= EMB_MAX_INPUTS or budget + est > EMB_MAX_REQUEST_TOKENS):
+            batches.append(current)
+            current, budget = [], 0
+        current.append(text)
+        budget += est
+    if current:
+        batches.append(current)
+    return batches
 
 
 def embed_texts(texts: List[str], model: str) -> List[List[float]]:
-    client = openai.OpenAI()
-    res = client.embeddings.create(model=model, input=texts)
-    return [item.embedding for item in res.data]
+    """
+    Embed texts, serving repeats from EMB_CACHE (and, with EMB_NEAR_DUPS, texts
+    near-identical to a cached one) and only sending the rest to the API.
+    """
+    global EMB_CALLS
+    cached: List[Optional[List[float]]] = EMB_CACHE.get_many(model, texts) if EMB_CACHE else [None] * len(texts)
+    missing = list(dict.fromkeys(t for t, vec in zip(texts, cached) if vec is None))
+    if EMB_CACHE:
+        incr("embedding.cache_hits", len(texts) - sum(1 for vec in cached if vec is None))
+        incr("embedding.cache_misses", sum(1 for vec in cached if vec is None))
+    fresh: Dict[str, List[float]] = {}
+    if missing and EMB_CACHE and EMB_NEAR_DUPS:
+        with timer("embedding.near_duplicate_lookup"):
+            twins = EMB_NEAR_DUPS.lookup(missing)
+            vectors = EMB_CACHE.get_by_keys(model, [t for t in twins if t])
+        fresh = {text: vectors[twin] for text, twin in zip(missing, twins) if twin in vectors}
+        if fresh:
+            EMB_CACHE.put_many(model, list(fresh), list(fresh.values()))
+            incr("embedding.near_duplicate_hits", len(fresh))
+            missing = [t for t in missing if t not in fresh]
+    if missing:
+        client = openai.OpenAI()
+        for batch in chunk_for_embedding(missing):
+            with timer("embedding.api_request"):
+                res = client.embeddings.create(model=model, input=batch)
+            EMB_CALLS += 1
+            incr("embedding.api_calls")
+            incr("embedding.api_inputs", len(batch))
+            usage = getattr(res, "usage", None)
+            incr("embedding.api_tokens", getattr(usage, "total_tokens", 0) or 0)
+            fresh.update({text: item.embedding for text, item in zip(batch, res.data)})
+        if EMB_CACHE:
+            EMB_CACHE.put_many(model, missing, [fresh[t] for t in missing])
+        if EMB_NEAR_DUPS:
+            # Only API-embedded texts become reuse sources, so reuse never chains.
+            EMB_NEAR_DUPS.add(missing)
+    return [vec if vec is not None else fresh[t] for t, vec in zip(texts, cached)]
 
 
 def cosine(a: List[float], b: List[float]) -> float:
+    """Reference pairwise cosine; ranking uses the vectorized similarity module."""
     import math
 
     dot = sum(x * y for x, y in zip(a, b))
@@ -97,52 +210,90 @@ def cosine(a: List[float], b: List[float]) -> float:
     return dot / (na * nb + 1e-9)
 
 
+class OpenAIEmbedder:
+    """Embedding backend over the OpenAI API (cached via embed_texts)."""
+
+    def __init__(self, model: str):
+        self.model_id = model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return embed_texts(texts, self.model_id)
+
+
+def make_embedder(index: ProvisionIndex) -> Optional[Any]:
+    """Embedder for the configured backend, or None for BM25-only ranking."""
+    if EMB_BACKEND == "openai":
+        return OpenAIEmbedder(EMB_MODEL)
+    if EMB_BACKEND == "local":
+        texts = [clean_for_embedding(entry.blob) for entry in index]
+        return load_or_fit(LOCAL_MODEL_PATH, texts, svd_components=LOCAL_SVD_COMPONENTS)
+    return None
+
+
+class SemanticRanker:
+    """
+    Embeds every provision once per document (chunked bulk requests) and all field
+    queries in one request, then shares the query x provision similarity matrix
+    across extractors. Queries outside the prepared set are embedded on demand.
+    """
+
+    def __init__(self, index: ProvisionIndex, queries: List[str], embedder: Any):
+        self.embedder = embedder
+        self.positions = {id(entry): pos for pos, entry in enumerate(index)}
+        with timer("canonical.embed_provisions"):
+            self.prov_matrix = normalize_rows(embedder.embed([clean_for_embedding(entry.blob) for entry in index]))
+        incr("embedding.texts", len(index))
+        self.sims: Dict[str, Any] = {}
+        self._add_queries(list(dict.fromkeys(queries)))
+
+    def _add_queries(self, queries: List[str]):
+        if not queries:
+            return
+        with timer("canonical.embed_queries"):
+            query_matrix = normalize_rows(self.embedder.embed(queries))
+        incr("embedding.texts", len(queries))
+        for query, row in zip(queries, similarity_matrix(query_matrix, self.prov_matrix)):
+            self.sims[query] = row
+
+    def _row(self, query: str) -> Any:
+        if query not in self.sims:
+            self._add_queries([query])
+        return self.sims[query]
+
+    def similarity(self, query: str, entry: IndexedProvision) -> float:
+        return float(self._row(query)[self.positions[id(entry)]])
+
+    def best(self, query: str, entries: List[IndexedProvision]) -> Optional[IndexedProvision]:
+        """Highest-similarity entry among a candidate subset."""
+        row = self._row(query)
+        ranked = top_k_indices([row[self.positions[id(e)]] for e in entries], 1)
+        return entries[ranked[0]] if ranked else None
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Positions of the k most similar provisions in the whole index."""
+        return top_k_indices(self._row(query), k)
+
+
 def semantic_best(
-    provisions: List[Dict[str, Any]],
+    index: ProvisionIndex,
     query: str,
     keywords: Optional[List[str]],
-    use_embeddings: bool,
-    model: str,
+    ranker: Optional[SemanticRanker] = None,
     title_keywords: Optional[List[str]] = None,
     top_k: int = 50,
-) -> Optional[Dict[str, Any]]:
-    pool = provisions
-    if keywords:
-        pool = [p for p in pool if any(k.lower() in text_blob(p) for k in keywords)]
-    if title_keywords:
-        pool = [p for p in pool if any(k.lower() in (p.get("title") or "").lower() for k in title_keywords)]
-    if not pool:
-        return None
-    if use_embeddings and openai:
-        texts = [clean_for_embedding(text_blob(p)) for p in pool[:top_k]]
-        embeddings = embed_texts([query] + texts, model)
-        query_emb = embeddings[0]
-        prov_embs = embeddings[1:]
-        scores = [(cosine(query_emb, emb), prov) for emb, prov in zip(prov_embs, pool[:top_k])]
-        scores.sort(key=lambda x: x[0], reverse=True)
-        return scores[0][1] if scores else None
-    # fallback: keyword score
-    return best_match(pool, keywords or [])
-
-
-def best_match(provisions: List[Dict[str, Any]], keywords: List[str]) -> Optional[Dict[str, Any]]:
-    scored = [(score_provision(p, keywords), p) for p in provisions]
-    scored = [pair for pair in scored if pair[0] > 0]
-    if not scored:
+) -> Optional[IndexedProvision]:
+    """BM25 candidates (title matches boosted), re-ranked by embedding cosine when a ranker is given."""
+    candidates = index.search(keywords or [query], title_keywords, top_k=top_k)
+    if not candidates:
         return None
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return scored[0][1]
+    if ranker:
+        return ranker.best(query, [entry for _, entry in candidates])
+    # fallback: top BM25 hit
+    return candidates[0][1]
 
 
-def extract_int_in_range(text: str, min_val: int, max_val: int) -> Optional[int]:
-    for m in re.finditer(r"\b(\d{1,3})\b", text):
-        val = int(m.group(1))
-        if min_val <= val <= max_val:
-            return val
-    return None
-
-
-def provenance_from(prov: Dict[str, Any]) -> Dict[str, Any]:
+def provenance_from(entry: IndexedProvision) -> Dict[str, Any]:
+    prov = entry.prov
     return {
         "doc_id": prov.get("doc_id"),
         "provision_id": prov.get("provision_id"),
@@ -151,156 +302,73 @@ def provenance_from(prov: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def extract_eligibility_age(provisions: List[Dict[str, Any]]) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
-    prov = semantic_best(
-        provisions,
-        "eligibility age requirement for plan participation",
-        ["eligibility", "age"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["eligibility"],
-    )
-    if not prov:
-        return None, None
-    blob = text_blob(prov)
-    age = extract_int_in_range(blob, 15, 75)
-    return age, provenance_from(prov)
-
-
-def extract_eligibility_service(provisions: List[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int], Optional[Dict[str, Any]]]:
-    prov = semantic_best(
-        provisions,
-        "eligibility service requirement",
-        ["eligibility", "service"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["eligibility"],
-    )
-    if not prov:
-        return None, None, None
-    blob = text_blob(prov)
-    years = extract_int_in_range(blob, 0, 5)
-    hours = extract_int_in_range(blob, 500, 2000)
-    return years, hours, provenance_from(prov)
-
-
-def extract_entry_dates(provisions: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
-    prov = semantic_best(
-        provisions,
-        "plan entry dates for participation",
-        ["entry", "participation"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["entry", "participation"],
-    )
-    if not prov:
-        return None, None
-    # Heuristic: look for patterns like monthly, quarterly, first of month
-    blob = text_blob(prov)
-    pattern = None
-    for key, label in [
-        ("monthly", "monthly"),
-        ("quarter", "quarterly"),
-        ("semi", "semi_annual"),
-        ("annual", "annual"),
-        ("payroll", "per_payroll"),
-        ("first day", "first_of_period"),
-    ]:
-        if key in blob:
-            pattern = label
-            break
-    return pattern, provenance_from(prov)
-
-
-def extract_normal_retirement_age(provisions: List[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int], Optional[Dict[str, Any]]]:
-    prov = semantic_best(
-        provisions,
-        "normal retirement age definition",
-        ["retirement"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["normal retirement"],
-    )
-    if not prov:
-        return None, None, None
-    blob = text_blob(prov)
-    age = extract_int_in_range(blob, 50, 80)
-    svc = extract_int_in_range(blob, 0, 10)
-    return age, svc, provenance_from(prov)
-
-
-def extract_comp_base(provisions: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
-    prov = semantic_best(
-        provisions,
-        "compensation base definition",
-        ["compensation"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["compensation"],
-    )
-    if not prov:
-        return None, None
-    blob = text_blob(prov)
-    definition = None
-    if "w-2" in blob:
-        definition = "W2"
-    elif "3401" in blob:
-        definition = "3401"
-    elif "415" in blob:
-        definition = "415_safe_harbor"
-    return definition, provenance_from(prov)
-
-
-def extract_comp_exclusions(provisions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    prov = semantic_best(
-        provisions,
-        "compensation exclusions",
-        ["compensation", "exclusion"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["compensation"],
-    )
-    if not prov:
-        return None
-    return {"provenance": provenance_from(prov)}
-
-
-def extract_loans(provisions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    prov = semantic_best(
-        provisions,
-        "participant loans",
-        ["loan"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["loan"],
-    )
-    if not prov:
-        return None
-    return {"enabled": True, "provenance": provenance_from(prov)}
-
-
-def extract_in_service(provisions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    prov = semantic_best(
-        provisions,
-        "in-service distribution",
-        ["in-service", "in service"],
-        USE_EMB,
-        EMB_MODEL,
-        title_keywords=["in-service", "in service"],
-    )
-    if not prov:
-        return None
-    blob = text_blob(prov)
-    age = extract_int_in_range(blob, 50, 80)
-    return {"age_threshold": age, "provenance": provenance_from(prov)}
-
-
-def find_provenance_for_keywords(provisions: List[Dict[str, Any]], keywords: List[str]) -> Optional[Dict[str, Any]]:
-    prov = semantic_best(provisions, " ".join(keywords), keywords, USE_EMB, EMB_MODEL)
-    return provenance_from(prov) if prov else None
-
-
-def build_canonical(doc_id: str, provisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+class FieldResolver:
+    """
+    Resolves registry specs (scripts/field_specs.py) against one document: BM25
+    (+ semantic) retrieval per field, then one multi-pattern pass per chosen
+    provision serves every field's label rules; numeric captures read the
+    provision's number tokens collected once at index time.
+    """
+
+    def __init__(self, index: ProvisionIndex, ranker: Optional[SemanticRanker], specs: List[FieldSpec]):
+        self.index = index
+        self.ranker = ranker
+        self.matcher = PatternMatcher(key for spec in specs for key in spec.substrings)
+        self._found: Dict[int, FrozenSet[str]] = {}
+
+    def substrings_in(self, entry: IndexedProvision) -> FrozenSet[str]:
+        found = self._found.get(id(entry))
+        if found is None:
+            found = self._found[id(entry)] = self.matcher.find(entry.blob)
+        return found
+
+    def resolve(self, spec: FieldSpec) -> Optional[Any]:
+        """Plan node for one field, or None when no provision matches."""
+        with timer(f"canonical.extract.{spec.field}"):
+            entry = semantic_best(
+                self.index, spec.query, list(spec.keywords), self.ranker, title_keywords=list(spec.title_keywords)
+            )
+            if not entry:
+                return None
+            values: Dict[str, Any] = {name: entry.first_int_in_range(lo, hi) for name, lo, hi in spec.ints}
+            if spec.labels:
+                found = self.substrings_in(entry)
+                for name, rules in spec.labels:
+                    values[name] = next((label for key, label in rules if key in found), None)
+            return spec.build(values, provenance_from(entry))
+
+    def resolve_all(self, specs: List[FieldSpec]) -> List[Optional[Any]]:
+        """Nodes aligned with specs."""
+        return [self.resolve(spec) for spec in specs]
+
+
+def set_path(plan: Dict[str, Any], path: Tuple[str, ...], node: Any):
+    target = plan
+    for part in path[:-1]:
+        target = target.setdefault(part, {})
+    target[path[-1]] = node
+
+
+def build_canonical(
+    doc_id: str,
+    provisions: List[Dict[str, Any]],
+    index: Optional[ProvisionIndex] = None,
+    embedder: Optional[Any] = None,
+    ranker: Optional[SemanticRanker] = None,
+) -> Dict[str, Any]:
+    # Normalize provision text once; every field spec below queries this index.
+    # Callers with prebuilt entries (scripts/bpd_store.py) pass index/embedder directly;
+    # scripts/query_service.py passes the ranker it keeps per loaded document.
+    if index is None:
+        with timer("canonical.index"):
+            index = ProvisionIndex(provisions)
+    incr("canonical.provisions", len(index))
+    # Batched semantic mode: one embedding pass over provisions + queries, shared by all fields.
+    if ranker is None:
+        if embedder is None and len(index):
+            with timer("canonical.make_embedder"):
+                embedder = make_embedder(index)
+        ranker = SemanticRanker(index, list(FIELD_QUERIES.values()), embedder) if embedder else None
     report = {}
     plan: Dict[str, Any] = {
         "eligibility": {"age": {}, "service": {}, "entry_dates": {}},
@@ -311,101 +379,70 @@ def build_canonical(doc_id: str, provisions: List[Dict[str, Any]]) -> Dict[str,
         "distributions": {"hardship": {}, "in_service": {}},
     }
 
-    # eligibility.age
-    age, age_prov = extract_eligibility_age(provisions)
-    if age_prov:
-        for src in ["deferrals", "match", "profit_sharing"]:
-            plan["eligibility"]["age"][src] = {"value": age, "unit": "years", "provenance": age_prov}
-    report["eligibility.age"] = "hit" if age_prov else "miss"
-
-    # eligibility.service
-    years, hours, serv_prov = extract_eligibility_service(provisions)
-    if serv_prov:
-        plan["eligibility"]["service"] = {
-            "deferrals": {"years_required": years, "hours_required": hours, "provenance": serv_prov},
-            "match": {"years_required": years, "hours_required": hours, "provenance": serv_prov},
-            "profit_sharing": {"years_required": years, "hours_required": hours, "provenance": serv_prov},
-        }
-    report["eligibility.service"] = "hit" if serv_prov else "miss"
-
-    # eligibility.entry_dates (provenance + pattern)
-    entry_pattern, entry_prov = extract_entry_dates(provisions)
-    if entry_prov:
-        plan["eligibility"]["entry_dates"] = {
-            "pattern": entry_pattern,
-            "provenance": entry_prov,
-        }
-    report["eligibility.entry_dates"] = "hit" if entry_prov else "miss"
-
-    # retirement.normal_age
-    nra_age, nra_svc, nra_prov = extract_normal_retirement_age(provisions)
-    if nra_prov:
-        plan["retirement"]["normal_age"] = {"age": nra_age, "service_years": nra_svc, "provenance": nra_prov}
-    report["retirement.normal_age"] = "hit" if nra_prov else "miss"
-
-    # compensation.base_definition
-    comp_def, comp_def_prov = extract_comp_base(provisions)
-    if comp_def_prov:
-        plan["compensation"]["base_definition"] = {"definition": comp_def, "provenance": comp_def_prov}
-    report["compensation.base_definition"] = "hit" if comp_def_prov else "miss"
-
-    # compensation.exclusions (provenance-only placeholder)
-    comp_excl = extract_comp_exclusions(provisions)
-    if comp_excl:
-        plan["compensation"]["exclusions"] = comp_excl
-    report["compensation.exclusions"] = "hit" if comp_excl else "miss"
-
-    # vesting.schedule (provenance only for now)
-    vest_prov = find_provenance_for_keywords(provisions, ["vesting"])
-    if vest_prov:
-        plan["vesting"]["schedule"] = {
-            "match": {"provenance": vest_prov},
-            "profit_sharing": {"provenance": vest_prov},
-        }
-    report["vesting.schedule"] = "hit" if vest_prov else "miss"
-
-    # loans.enabled (provenance-only)
-    loan_info = extract_loans(provisions)
-    if loan_info:
-        plan["loans"] = loan_info
-    report["loans.enabled"] = "hit" if loan_info else "miss"
-
-    # distributions.hardship (provenance only)
-    hardship_prov = find_provenance_for_keywords(provisions, ["hardship"])
-    if hardship_prov:
-        plan["distributions"]["hardship"] = {
-            "provenance": hardship_prov,
-            "definition": None,
-            "allowed_sources": None,
-        }
-    report["distributions.hardship"] = "hit" if hardship_prov else "miss"
-
-    # distributions.in_service (provenance + optional age threshold)
-    in_service = extract_in_service(provisions)
-    if in_service:
-        plan["distributions"]["in_service"] = in_service
-    report["distributions.in_service"] = "hit" if in_service else "miss"
+    # Field definitions live in scripts/field_specs.py; nodes are placed in registry order.
+    resolver = FieldResolver(index, ranker, FIELD_SPECS)
+    for spec, node in zip(FIELD_SPECS, resolver.resolve_all(FIELD_SPECS)):
+        if node is not None:
+            set_path(plan, spec.plan_path, node)
+        report[spec.field] = "hit" if node is not None else "miss"
 
+    incr("canonical.hits", sum(1 for outcome in report.values() if outcome == "hit"))
+    incr("canonical.misses", sum(1 for outcome in report.values() if outcome == "miss"))
     return {"doc_id": doc_id, "plan": plan, "report": report}
 
 
+def configure_embeddings(args: argparse.Namespace):
+    """Apply add_embedding_args() options to the module-level embedding settings."""
+    global EMB_BACKEND, EMB_MODEL, EMB_CACHE, EMB_NEAR_DUPS, LOCAL_MODEL_PATH, LOCAL_SVD_COMPONENTS
+    EMB_BACKEND = "openai" if args.use_openai_embeddings else args.embedding_backend
+    EMB_MODEL = args.openai_model
+    LOCAL_MODEL_PATH = Path(args.local_model) if args.local_model else None
+    LOCAL_SVD_COMPONENTS = args.local_svd_components
+    if EMB_BACKEND == "openai" and openai is None:
+        print("WARNING: openai package not available; falling back to heuristic matching.")
+        EMB_BACKEND = "none"
+    if EMB_BACKEND == "local" and LOCAL_MODEL_PATH and not LOCAL_MODEL_PATH.exists():
+        print(
+            f"WARNING: {LOCAL_MODEL_PATH} not found; each document fits its own unsaved local model. "
+            "Fit a corpus model first with scripts/local_embeddings.py."
+        )
+        LOCAL_MODEL_PATH = None
+    if EMB_BACKEND == "openai" and not args.no_embedding_cache:
+        EMB_CACHE = EmbeddingCache(Path(args.embedding_cache), max_bytes=int(args.embedding_cache_max_mb * 1024 * 1024))
+        if args.reuse_near_duplicates:
+            # Signatures live in the embedding cache file (minhash_* tables).
+            EMB_NEAR_DUPS = NearDuplicateStore(Path(args.embedding_cache), threshold=args.near_duplicate_threshold)
+
+
+def finish_embeddings():
+    """Print embedding call/cache stats and close the cache."""
+    global EMB_CACHE, EMB_NEAR_DUPS
+    if EMB_BACKEND == "openai":
+        print(f"Embedding API calls: {EMB_CALLS}")
+    if EMB_CACHE:
+        print("Embedding cache:", EMB_CACHE.stats())
+        EMB_CACHE.close()
+        EMB_CACHE = None
+    if EMB_NEAR_DUPS:
+        EMB_NEAR_DUPS.close()
+        EMB_NEAR_DUPS = None
+
+
 def main():
     args = parse_args()
     provisions_path = Path(args.provisions)
     doc_id, provisions = load_provisions(provisions_path)
     if args.doc_id:
         doc_id = args.doc_id
-    global USE_EMB, EMB_MODEL
-    USE_EMB = args.use_openai_embeddings and openai is not None
-    EMB_MODEL = args.openai_model
-    if args.use_openai_embeddings and openai is None:
-        print("WARNING: openai package not available; falling back to heuristic matching.")
-    canonical = build_canonical(doc_id, provisions)
+    configure_embeddings(args)
+    with instrument(doc_id, Path(args.metrics) if args.metrics else None, args.profile, Path(args.profile_dir)):
+        canonical = build_canonical(doc_id, provisions)
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(json.dumps(canonical, indent=2))
     print(f"Wrote canonical draft to {out_path}")
     print("Report:", canonical.get("report"))
+    finish_embeddings()
 
 
 if __name__ == "__main__":
@@ -4,14 +4,38 @@ Extract layout from a PDF using Azure AI Document Intelligence (prebuilt-layout)
 and normalize it to the schema defined in docs/layout_schema.md.
 
 Outputs are intended to stay local (e.g., under tmp/) and should not be committed.
+
+Batch mode (--input-dir or --manifest) analyzes many PDFs over a bounded thread
+pool, backs off adaptively on 429 throttling, writes one layout per document to
+--out-dir, and records per-document timings/failures in a summary JSON.
+
+Raw analysis results are cached under --cache-dir keyed by SHA-256 of the PDF
+bytes plus the model id, so normalization changes can be replayed with
+--from-cache (single/batch) or --renormalize (whole cache) without service calls.
+
+Large PDFs can be split with --chunk-pages: page ranges are analyzed
+concurrently via the service's `pages` parameter, then merged (page numbers and
+span offsets rebased) before normalization so sections stitch across chunks.
 """
 
 import argparse
+import hashlib
 import json
 import os
+import random
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from interval_index import attach_tables
+from jsonl_io import write_layout
+from metrics import add_metrics_args, enabled, incr, instrument, timer
+from spatial_index import link_selection_marks
 
 try:
     from azure.ai.formrecognizer import DocumentAnalysisClient
@@ -23,12 +47,18 @@ except ImportError as e:  # pragma: no cover - dependency may not be installed l
 else:
     _IMPORT_ERROR = None
 
+try:
+    from pypdf import PdfReader  # type: ignore
+except Exception:  # pragma: no cover - optional, only used to count pages for --chunk-pages
+    PdfReader = None
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Extract normalized layout JSON from a PDF.")
-    parser.add_argument("--input", required=True, help="Path to PDF file.")
-    parser.add_argument("--doc-id", help="Document ID to store in output (defaults to stem of input).")
-    parser.add_argument("--out", required=True, help="Output path for normalized JSON.")
+MODEL_ID = "prebuilt-layout"
+# Paragraph roles that open a section (Document Intelligence emits title/sectionHeading).
+HEADING_ROLES = {"title", "sectionHeading", "heading"}
+
+
+def add_service_args(parser: argparse.ArgumentParser):
+    """Service/cache/chunking options shared with scripts/pipeline.py."""
     parser.add_argument(
         "--endpoint",
         default=os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT"),
@@ -39,11 +69,62 @@ def parse_args() -> argparse.Namespace:
         default=os.getenv("AZURE_FORM_RECOGNIZER_KEY"),
         help="Azure Form Recognizer key (or set AZURE_FORM_RECOGNIZER_KEY).",
     )
+    parser.add_argument(
+        "--cache-dir",
+        default="tmp/cache/azure_layout",
+        help="Raw analysis cache (keyed by PDF SHA-256 + model id).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the raw analysis cache.")
+    parser.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="Normalize from cached raw results only; fail documents with no cache entry instead of calling the service.",
+    )
+    parser.add_argument(
+        "--chunk-pages",
+        type=int,
+        default=0,
+        help="Split PDFs longer than this many pages into page-range chunks analyzed concurrently (0 = off).",
+    )
+    parser.add_argument(
+        "--chunk-concurrency", type=int, default=4, help="Concurrent chunk requests per document with --chunk-pages."
+    )
+    parser.add_argument(
+        "--local-standin",
+        action="store_true",
+        help="Use the offline stand-in service (scripts/layout_standin.py) instead of Azure; no endpoint/key needed.",
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Extract normalized layout JSON from a PDF.")
+    parser.add_argument("--input", help="Path to PDF file.")
+    parser.add_argument("--doc-id", help="Document ID to store in output (defaults to stem of input).")
+    parser.add_argument("--out", help="Output path for normalized JSON (.jsonl for the streaming line format).")
+    parser.add_argument("--input-dir", help="Batch mode: analyze every *.pdf in this directory.")
+    parser.add_argument(
+        "--manifest",
+        help='Batch mode: JSON list of PDF paths or {"input": ..., "doc_id": ...} objects.',
+    )
+    parser.add_argument("--out-dir", help="Batch mode: directory for <doc_id>.json outputs.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch mode: concurrent analyze requests.")
+    parser.add_argument("--max-retries", type=int, default=6, help="Batch mode: retries per service request (document or chunk) on 429.")
+    parser.add_argument(
+        "--summary",
+        help="Batch mode: path for the timings/failures summary (defaults to <out-dir>/_batch_summary.json).",
+    )
+    add_service_args(parser)
+    parser.add_argument(
+        "--renormalize",
+        action="store_true",
+        help="Rebuild <out-dir>/<doc_id>.json for every cached raw result (no service calls).",
+    )
     parser.add_argument(
         "--redact-text",
         action="store_true",
         help="If set, redact text content in the output (keep structure/bboxes).",
     )
+    add_metrics_args(parser)
     return parser.parse_args()
 
 
@@ -56,6 +137,25 @@ def require_dependencies():
         sys.exit(1)
 
 
+def create_client(args: argparse.Namespace):
+    """
+    Analysis client for the parsed service options: the offline stand-in, None for
+    cache-only runs, or an Azure DocumentAnalysisClient. Exits on missing config.
+    """
+    if args.local_standin:
+        from layout_standin import LocalLayoutClient  # local import: the stand-in builds on this module
+
+        args.endpoint = args.endpoint or "local-standin"
+        return LocalLayoutClient()
+    if args.from_cache:
+        return None
+    require_dependencies()
+    if not args.endpoint or not args.key:
+        sys.stderr.write("Azure endpoint/key not provided. Set env vars or pass --endpoint/--key.\n")
+        sys.exit(1)
+    return DocumentAnalysisClient(args.endpoint, AzureKeyCredential(args.key))
+
+
 def maybe_redact(text: Optional[str], redact: bool) -> Optional[str]:
     if not text:
         return text
@@ -127,21 +227,25 @@ def build_table(table, redact: bool) -> Dict[str, Any]:
 
 
 def build_sections(paragraphs, page_count: int, redact: bool) -> List[Dict[str, Any]]:
-    """Heuristic: treat each heading as a new section; if none, fall back to one section."""
+    """
+    Heuristic: treat each heading as a new section; if none, fall back to one section.
+    The heading paragraph also stays the section's first block, since segmentation groups blocks.
+    """
     sections: List[Dict[str, Any]] = []
     current = None
     for para in paragraphs:
-        if para.role == "heading":
+        if para.role in HEADING_ROLES:
             if current:
                 sections.append(current)
+            heading = maybe_redact(para.content.strip(), redact)
             current = {
-                "id": para.content.strip(),
-                "title": para.content.strip(),
-                "breadcrumbs": [para.content.strip()],
+                "id": heading,
+                "title": heading,
+                "breadcrumbs": [heading],
                 "page_range": [para.bounding_regions[0].page_number, para.bounding_regions[0].page_number]
                 if para.bounding_regions
                 else None,
-                "blocks": [],
+                "blocks": [build_block(para, redact)],
                 "tables": [],
             }
         else:
@@ -179,48 +283,164 @@ def build_sections(paragraphs, page_count: int, redact: bool) -> List[Dict[str,
 
 
 def attach_tables_to_sections(sections: List[Dict[str, Any]], tables: List[Dict[str, Any]]):
-    """Assign tables to the first section whose page_range overlaps."""
-    for table in tables:
-        assigned = False
-        for section in sections:
-            pr = section.get("page_range")
-            tpr = table.get("page_range")
-            if not pr or not tpr:
-                continue
-            if tpr[0] <= pr[1] and tpr[1] >= pr[0]:
-                section.setdefault("tables", []).append(table)
-                assigned = True
-                break
-        if not assigned:
-            # If no section match, append to a synthetic section
-            sections.append(
-                {
-                    "id": "Unassigned Tables",
-                    "title": "Unassigned Tables",
-                    "breadcrumbs": ["Unassigned Tables"],
-                    "page_range": tpr,
-                    "blocks": [],
-                    "tables": [table],
-                }
-            )
+    """Assign tables to the first section whose page_range overlaps (page-interval index)."""
+    for table in attach_tables(sections, tables, mode="first"):
+        # If no section match, append to a synthetic section
+        sections.append(
+            {
+                "id": "Unassigned Tables",
+                "title": "Unassigned Tables",
+                "breadcrumbs": ["Unassigned Tables"],
+                "page_range": table.get("page_range"),
+                "blocks": [],
+                "tables": [table],
+            }
+        )
 
 
-def analyze_document(
-    client: DocumentAnalysisClient, pdf_path: Path, doc_id: str, endpoint: str, key: str, redact: bool
-) -> Dict[str, Any]:
-    with pdf_path.open("rb") as f:
-        poller = client.begin_analyze_document("prebuilt-layout", document=f)
-    result = poller.result()
+class _Node(SimpleNamespace):
+    """Attribute view of a cached result dict; absent attributes read as None like optional SDK fields."""
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: _plain(v) for k, v in vars(self).items()}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, _Node):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def result_from_dict(data: Any) -> Any:
+    """Rebuild an attribute-accessible result from AnalyzeResult.to_dict() output."""
+    if isinstance(data, dict):
+        return _Node(**{k: result_from_dict(v) for k, v in data.items()})
+    if isinstance(data, list):
+        return [result_from_dict(v) for v in data]
+    return data
+
+
+def cache_path(cache_dir: Path, pdf_sha: str, model_id: str = MODEL_ID, pages: Optional[str] = None) -> Path:
+    suffix = f".pages-{pages}" if pages else ""
+    return cache_dir / model_id / f"{pdf_sha}{suffix}.json"
+
+
+def load_cached_result(
+    cache_dir: Path, pdf_sha: str, model_id: str = MODEL_ID, pages: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    path = cache_path(cache_dir, pdf_sha, model_id, pages)
+    return json.loads(path.read_text()) if path.exists() else None
 
+
+def save_cached_result(
+    cache_dir: Path,
+    pdf_sha: str,
+    result: Any,
+    file_name: str,
+    doc_id: str,
+    endpoint: str,
+    model_id: str = MODEL_ID,
+    pages: Optional[str] = None,
+    page_count: int = 0,
+):
+    path = cache_path(cache_dir, pdf_sha, model_id, pages)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "sha256": pdf_sha,
+        "model": model_id,
+        "pages": pages,
+        "page_count": page_count or None,  # whole-document page count, recorded for chunks
+        "file_name": file_name,
+        "doc_id": doc_id,
+        "endpoint": endpoint,
+        "result": result.to_dict(),
+    }
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(entry, default=lambda o: o.isoformat() if hasattr(o, "isoformat") else str(o)))
+    tmp.replace(path)
+
+
+def count_pdf_pages(pdf_bytes: bytes) -> int:
+    """Page count via pypdf when installed, else a /Type /Page object scan (approximate; 0 if unknown)."""
+    if PdfReader is not None:
+        import io
+
+        try:
+            return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+        except Exception:
+            pass
+    return len(re.findall(rb"/Type\s*/Page(?![a-zA-Z])", pdf_bytes))
+
+
+def page_chunks(page_count: int, chunk_pages: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_pages - 1, page_count)) for start in range(1, page_count + 1, chunk_pages)]
+
+
+def _regions(item: Any) -> List[Any]:
+    return list(getattr(item, "bounding_regions", None) or [])
+
+
+def _content_length(result: Any) -> int:
+    content = getattr(result, "content", None)
+    if content is not None:
+        return len(content)
+    ends = [span.offset + span.length for para in (result.paragraphs or []) for span in (para.spans or [])]
+    return max(ends) if ends else 0
+
+
+def merge_chunk_results(chunks: List[Tuple[int, Any]]) -> Any:
+    """
+    Merge per-chunk results (ordered by first page) into one result: span offsets are rebased
+    onto the concatenated content so `blk-{offset}` ids stay unique, and page numbers are
+    shifted when the service reports them relative to the chunk.
+    """
+    paragraphs: List[Any] = []
+    tables: List[Any] = []
+    pages: List[Any] = []
+    created_on = None
+    base = 0
+    for start_page, result in sorted(chunks, key=lambda c: c[0]):
+        chunk_pages = result.pages or []
+        first = min((p.page_number for p in chunk_pages), default=start_page)
+        shift = start_page - first if first < start_page else 0
+        items = list(result.paragraphs or []) + list(result.tables or [])
+        items += [cell for tbl in (result.tables or []) for cell in (tbl.cells or [])]
+        items += [mark for page in chunk_pages for mark in (getattr(page, "selection_marks", None) or [])]
+        for item in items:
+            for span in getattr(item, "spans", None) or []:
+                span.offset += base
+            for region in _regions(item):
+                region.page_number += shift
+        for page in chunk_pages:
+            page.page_number += shift
+        paragraphs.extend(result.paragraphs or [])
+        tables.extend(result.tables or [])
+        pages.extend(chunk_pages)
+        created_on = created_on or getattr(result, "created_on", None)
+        base += _content_length(result) + 1
+    return _Node(paragraphs=paragraphs, tables=tables, pages=pages, created_on=created_on)
+
+
+def normalize_result(result: Any, doc_id: str, file_name: str, endpoint: str, redact: bool) -> Dict[str, Any]:
     paragraphs = result.paragraphs or []
     tables = result.tables or []
-    sections = build_sections(paragraphs, page_count=len(result.pages), redact=redact)
+    pages = result.pages or []
+    sections = build_sections(paragraphs, page_count=len(pages), redact=redact)
     tables_normalized = [build_table(t, redact=redact) for t in tables]
+    for idx, tbl in enumerate(tables_normalized):
+        tbl["id"] = tbl["id"] or f"tbl-{idx}"
     attach_tables_to_sections(sections, tables_normalized)
 
     # selection marks (checkboxes/radios)
     selection_marks: List[Dict[str, Any]] = []
-    for page in result.pages or []:
+    for page in pages:
         for mark in getattr(page, "selection_marks", []) or []:
             poly = mark.polygon
             selection_marks.append(
@@ -232,30 +452,381 @@ def analyze_document(
                     "polygon": [[p.x, p.y] for p in poly] if poly else None,
                 }
             )
+    # Tie marks to their containing table cell (checkbox_state) or nearest label block.
+    with timer("layout.link_selection_marks"):
+        link_selection_marks(sections, tables_normalized, selection_marks)
+    if enabled():
+        incr("layout.pages", len(pages))
+        incr("layout.sections", len(sections))
+        incr("layout.blocks", sum(len(sec["blocks"]) for sec in sections))
+        incr("layout.tables", len(tables_normalized))
+        incr("layout.selection_marks", len(selection_marks))
 
+    created_on = getattr(result, "created_on", None)
     return {
         "document_id": doc_id,
-        "file_name": pdf_path.name,
-        "page_count": len(result.pages),
+        "file_name": file_name,
+        "page_count": len(pages),
         "sections": sections,
         "tables": [],
         "selection_marks": selection_marks,
         "extraction_metadata": {
             "tool": "azure_document_intelligence",
-            "model": "prebuilt-layout",
-            "run_at": result.created_on.isoformat() if getattr(result, "created_on", None) else None,
+            "model": MODEL_ID,
+            "run_at": created_on.isoformat() if hasattr(created_on, "isoformat") else created_on,
             "endpoint": endpoint,
         },
     }
 
 
+def analyze_pages(
+    client: Any,
+    pdf_bytes: bytes,
+    pdf_sha: str,
+    pages: Optional[str],
+    file_name: str,
+    doc_id: str,
+    endpoint: str,
+    cache_dir: Optional[Path],
+    cache_only: bool,
+    page_count: int = 0,
+    throttle: Any = None,
+    max_retries: int = 0,
+) -> Any:
+    """
+    Raw result for the whole PDF (pages=None) or a page range like "1-50", via the cache when possible.
+    With a throttle, a 429 on this request backs off and resubmits only this request (up to max_retries).
+    """
+    cached = load_cached_result(cache_dir, pdf_sha, pages=pages) if cache_dir else None
+    if cached:
+        incr("layout.cache_hits")
+        return result_from_dict(cached["result"])
+    incr("layout.cache_misses")
+    if cache_only:
+        label = f" pages {pages}" if pages else ""
+        raise FileNotFoundError(f"No cached {MODEL_ID} result for {file_name}{label} (sha256 {pdf_sha[:12]})")
+    kwargs = {"pages": pages} if pages else {}
+    attempts = 0
+    while True:
+        if throttle:
+            throttle.wait()
+        attempts += 1
+        try:
+            # Submit and poll are timed separately: submit covers the upload, poll the service-side analysis.
+            with timer("layout.service_submit"):
+                poller = client.begin_analyze_document(MODEL_ID, document=pdf_bytes, **kwargs)
+            with timer("layout.service_poll"):
+                result = poller.result()
+            break
+        except Exception as exc:
+            if throttle is None or not is_throttled(exc) or attempts > max_retries:
+                raise
+            incr("layout.throttled")
+            throttle.on_throttled(retry_after_seconds(exc))
+    if throttle:
+        throttle.on_success()
+    incr("layout.service_calls")
+    if cache_dir:
+        save_cached_result(cache_dir, pdf_sha, result, file_name, doc_id, endpoint, pages=pages, page_count=page_count)
+    return result
+
+
+def analyze_document(
+    client: DocumentAnalysisClient,
+    pdf_path: Path,
+    doc_id: str,
+    endpoint: str,
+    key: str,
+    redact: bool,
+    cache_dir: Optional[Path] = None,
+    cache_only: bool = False,
+    chunk_pages: int = 0,
+    chunk_concurrency: int = 4,
+    throttle: Any = None,
+    max_retries: int = 0,
+) -> Dict[str, Any]:
+    pdf_bytes = pdf_path.read_bytes()
+    pdf_sha = hashlib.sha256(pdf_bytes).hexdigest()
+    page_count = count_pdf_pages(pdf_bytes) if chunk_pages else 0
+    if not chunk_pages or page_count <= chunk_pages:
+        with timer("layout.analyze"):
+            result = analyze_pages(
+                client,
+                pdf_bytes,
+                pdf_sha,
+                None,
+                pdf_path.name,
+                doc_id,
+                endpoint,
+                cache_dir,
+                cache_only,
+                throttle=throttle,
+                max_retries=max_retries,
+            )
+        with timer("layout.normalize"):
+            return normalize_result(result, doc_id, pdf_path.name, endpoint, redact)
+
+    ranges = page_chunks(page_count, chunk_pages)
+    incr("layout.chunks", len(ranges))
+    with timer("layout.analyze"):
+        with ThreadPoolExecutor(max_workers=max(1, chunk_concurrency)) as pool:
+            futures = {
+                start: pool.submit(
+                    analyze_pages,
+                    client,
+                    pdf_bytes,
+                    pdf_sha,
+                    f"{start}-{end}",
+                    pdf_path.name,
+                    doc_id,
+                    endpoint,
+                    cache_dir,
+                    cache_only,
+                    page_count,
+                    throttle,
+                    max_retries,
+                )
+                for start, end in ranges
+            }
+            chunks = [(start, future.result()) for start, future in futures.items()]
+    with timer("layout.merge_chunks"):
+        merged = merge_chunk_results(chunks)
+    with timer("layout.normalize"):
+        return normalize_result(merged, doc_id, pdf_path.name, endpoint, redact)
+
+
+def renormalize_cache(cache_dir: Path, out_dir: Path, redact: bool, model_id: str = MODEL_ID) -> int:
+    """Rebuild normalized layouts for every cached raw result (merging page-range chunks); returns the number written."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    by_sha: Dict[str, List[Dict[str, Any]]] = {}
+    for path in sorted((cache_dir / model_id).glob("*.json")):
+        entry = json.loads(path.read_text())
+        by_sha.setdefault(entry["sha256"], []).append(entry)
+    written = 0
+    for entries in by_sha.values():
+        whole = [e for e in entries if not e.get("pages")]
+        if whole:
+            entry = whole[0]
+            result = result_from_dict(entry["result"])
+        else:
+            # Chunks from runs with different --chunk-pages may coexist; take a contiguous, non-overlapping cover.
+            ranged = sorted(
+                ((int(e["pages"].split("-")[0]), int(e["pages"].split("-")[1]), e) for e in entries),
+                key=lambda r: (r[0], -r[1]),
+            )
+            chunks, expected = [], 1
+            for start, end, e in ranged:
+                if start == expected:
+                    chunks.append((start, result_from_dict(e["result"])))
+                    expected = end + 1
+            entry = entries[0]
+            # Older entries lack page_count; the largest cached end then stands in (a missing last chunk goes unseen).
+            page_count = max(max(e.get("page_count") or 0 for e in entries), max(end for _, end, _ in ranged))
+            if not chunks or expected - 1 != page_count:
+                print(
+                    f"WARNING: skipping {entry['doc_id']} (sha256 {entry['sha256'][:12]}): cached chunks cover "
+                    f"pages 1-{expected - 1} of {page_count}."
+                )
+                continue
+            result = merge_chunk_results(chunks)
+        layout = normalize_result(result, entry["doc_id"], entry["file_name"], entry.get("endpoint"), redact)
+        (out_dir / f"{entry['doc_id']}.json").write_text(json.dumps(layout, indent=2))
+        written += 1
+    return written
+
+
+def is_throttled(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status == 429
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveThrottle:
+    """Shared backoff: 429s raise a delay every worker waits before submitting; successes decay it."""
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self.delay
+        if delay:
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def on_throttled(self, retry_after: Optional[float]):
+        with self._lock:
+            self.throttled += 1
+            self.delay = min(self.max_delay, max(self.delay * 2, self.base_delay, retry_after or 0.0))
+
+    def on_success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base_delay / 4 else 0.0
+
+
+class DocumentThrottle:
+    """One document's view of a shared AdaptiveThrottle that also counts that document's 429s."""
+
+    def __init__(self, shared: AdaptiveThrottle):
+        self.shared = shared
+        self.throttled = 0
+        self._lock = threading.Lock()  # chunks of one document run concurrently
+
+    def wait(self):
+        self.shared.wait()
+
+    def on_throttled(self, retry_after: Optional[float]):
+        with self._lock:
+            self.throttled += 1
+        self.shared.on_throttled(retry_after)
+
+    def on_success(self):
+        self.shared.on_success()
+
+
+def collect_batch_jobs(input_dir: Optional[str], manifest: Optional[str]) -> List[Dict[str, Any]]:
+    jobs: List[Dict[str, Any]] = []
+    if input_dir:
+        for pdf in sorted(Path(input_dir).glob("*.pdf")):
+            jobs.append({"input": pdf, "doc_id": pdf.stem})
+    if manifest:
+        for item in json.loads(Path(manifest).read_text()):
+            entry = item if isinstance(item, dict) else {"input": item}
+            pdf = Path(entry["input"])
+            jobs.append({"input": pdf, "doc_id": entry.get("doc_id") or pdf.stem})
+    return jobs
+
+
+def run_batch(
+    client: Any,
+    jobs: List[Dict[str, Any]],
+    out_dir: Path,
+    endpoint: str,
+    key: str,
+    redact: bool,
+    concurrency: int = 4,
+    max_retries: int = 6,
+    cache_dir: Optional[Path] = None,
+    cache_only: bool = False,
+    chunk_pages: int = 0,
+    chunk_concurrency: int = 4,
+) -> Dict[str, Any]:
+    """Analyze jobs over a bounded thread pool; one output per document plus a summary dict."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    throttle = AdaptiveThrottle()
+
+    def run_one(job: Dict[str, Any]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"doc_id": job["doc_id"], "input": str(job["input"])}
+        doc_throttle = DocumentThrottle(throttle)
+        start = time.perf_counter()
+        try:
+            # Retries happen per service request (whole document or chunk) inside analyze_pages().
+            result = analyze_document(
+                client,
+                job["input"],
+                job["doc_id"],
+                endpoint,
+                key,
+                redact=redact,
+                cache_dir=cache_dir,
+                cache_only=cache_only,
+                chunk_pages=chunk_pages,
+                chunk_concurrency=chunk_concurrency,
+                throttle=doc_throttle,
+                max_retries=max_retries,
+            )
+            out_path = out_dir / f"{job['doc_id']}.json"
+            out_path.write_text(json.dumps(result, indent=2))
+            record.update({"status": "ok", "out": str(out_path)})
+        except Exception as exc:
+            record.update({"status": "failed", "error": f"{type(exc).__name__}: {exc}"})
+        record["throttled"] = doc_throttle.throttled
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    started = time.perf_counter()
+    records: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run_one, job) for job in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            print(f"[{record['status']}] {record['doc_id']} ({record['seconds']}s, throttled={record['throttled']})")
+    records.sort(key=lambda r: r["doc_id"])
+    return {
+        "documents": len(jobs),
+        "succeeded": sum(1 for r in records if r["status"] == "ok"),
+        "failed": sum(1 for r in records if r["status"] != "ok"),
+        "throttled": throttle.throttled,
+        "concurrency": concurrency,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "records": records,
+    }
+
+
 def main():
     args = parse_args()
-    require_dependencies()
-    if not args.endpoint or not args.key:
-        sys.stderr.write("Azure endpoint/key not provided. Set env vars or pass --endpoint/--key.\n")
+    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    if args.renormalize:
+        if not cache_dir or not args.out_dir:
+            sys.stderr.write("--renormalize requires --out-dir and the raw cache (drop --no-cache).\n")
+            sys.exit(1)
+        written = renormalize_cache(cache_dir, Path(args.out_dir), redact=args.redact_text)
+        print(f"Renormalized {written} cached results into {args.out_dir}")
+        return
+    if args.from_cache and not cache_dir:
+        sys.stderr.write("--from-cache cannot be combined with --no-cache.\n")
+        sys.exit(1)
+    batch = bool(args.input_dir or args.manifest)
+    if batch and not args.out_dir:
+        sys.stderr.write("Batch mode requires --out-dir.\n")
+        sys.exit(1)
+    if not batch and (not args.input or not args.out):
+        sys.stderr.write("Provide --input and --out, or --input-dir/--manifest with --out-dir.\n")
         sys.exit(1)
-    client = DocumentAnalysisClient(args.endpoint, AzureKeyCredential(args.key))
+    if batch and args.profile:
+        # Documents run on pool threads, which a per-run profiler would not see.
+        sys.stderr.write("--profile is single-document only; batch mode supports --metrics (aggregated).\n")
+        sys.exit(1)
+    client = create_client(args)
+
+    if batch:
+        jobs = collect_batch_jobs(args.input_dir, args.manifest)
+        out_dir = Path(args.out_dir)
+        with instrument("batch", Path(args.metrics) if args.metrics else None):
+            summary = run_batch(
+                client,
+                jobs,
+                out_dir,
+                args.endpoint,
+                args.key,
+                redact=args.redact_text,
+                concurrency=args.concurrency,
+                max_retries=args.max_retries,
+                cache_dir=cache_dir,
+                cache_only=args.from_cache,
+                chunk_pages=args.chunk_pages,
+                chunk_concurrency=args.chunk_concurrency,
+            )
+        summary_path = Path(args.summary) if args.summary else out_dir / "_batch_summary.json"
+        summary_path.write_text(json.dumps(summary, indent=2))
+        print(f"Batch: {summary['succeeded']}/{summary['documents']} ok in {summary['wall_seconds']}s; summary at {summary_path}")
+        if summary["failed"]:
+            sys.exit(1)
+        return
 
     pdf_path = Path(args.input)
     if not pdf_path.exists():
@@ -263,10 +834,22 @@ def main():
         sys.exit(1)
     doc_id = args.doc_id or pdf_path.stem
 
-    result = analyze_document(client, pdf_path, doc_id, args.endpoint, args.key, redact=args.redact_text)
     out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(result, indent=2))
+    with instrument(doc_id, Path(args.metrics) if args.metrics else None, args.profile, Path(args.profile_dir)):
+        result = analyze_document(
+            client,
+            pdf_path,
+            doc_id,
+            args.endpoint,
+            args.key,
+            redact=args.redact_text,
+            cache_dir=cache_dir,
+            cache_only=args.from_cache,
+            chunk_pages=args.chunk_pages,
+            chunk_concurrency=args.chunk_concurrency,
+        )
+        with timer("layout.write"):
+            write_layout(out_path, result)
     print(f"Wrote normalized layout to {out_path}")
 
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Declarative registry of canonical fields for scripts/extract_canonical.py.
+
+Each FieldSpec says how to retrieve the field's provision (semantic query, BM25
+keywords, boosted title keywords) and what to read from it:
+- ints: named numeric captures, the first number in the provision within [min, max]
+- labels: named substring rules, the label of the first rule whose substring occurs
+  in the provision text (lowercased); all rules of all fields are evaluated in one
+  multi-pattern pass per provision (scripts/multi_pattern.py)
+- build: turns the captured values and provenance into the plan node stored at `path`
+
+Adding a canonical node means adding a spec here; build_canonical() needs no change.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+CONTRIBUTION_SOURCES = ("deferrals", "match", "profit_sharing")
+
+Values = Dict[str, Any]
+Provenance = Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    field: str  # report key, e.g. "eligibility.age"
+    query: str  # semantic ranking query (embedded once per document with all others)
+    keywords: Tuple[str, ...]
+    build: Callable[[Values, Provenance], Any]
+    title_keywords: Tuple[str, ...] = ()
+    ints: Tuple[Tuple[str, int, int], ...] = ()
+    labels: Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], ...] = ()
+    path: Tuple[str, ...] = ()  # plan location; defaults to the dotted field name
+
+    @property
+    def plan_path(self) -> Tuple[str, ...]:
+        return self.path or tuple(self.field.split("."))
+
+    @property
+    def substrings(self) -> List[str]:
+        return [key for _, rules in self.labels for key, _ in rules]
+
+
+def per_source(node: Callable[[Values, Provenance], Dict[str, Any]]) -> Callable[[Values, Provenance], Dict[str, Any]]:
+    """Same node for every contribution type (until per-type extraction lands)."""
+    return lambda values, prov: {src: node(values, prov) for src in CONTRIBUTION_SOURCES}
+
+
+def provenance_only(values: Values, prov: Provenance) -> Dict[str, Any]:
+    return {"provenance": prov}
+
+
+FIELD_SPECS: List[FieldSpec] = [
+    FieldSpec(
+        field="eligibility.age",
+        query="eligibility age requirement for plan participation",
+        keywords=("eligibility", "age"),
+        title_keywords=("eligibility",),
+        ints=(("age", 15, 75),),
+        build=per_source(lambda v, p: {"value": v["age"], "unit": "years", "provenance": p}),
+    ),
+    FieldSpec(
+        field="eligibility.service",
+        query="eligibility service requirement",
+        keywords=("eligibility", "service"),
+        title_keywords=("eligibility",),
+        ints=(("years", 0, 5), ("hours", 500, 2000)),
+        build=per_source(lambda v, p: {"years_required": v["years"], "hours_required": v["hours"], "provenance": p}),
+    ),
+    FieldSpec(
+        field="eligibility.entry_dates",
+        query="plan entry dates for participation",
+        keywords=("entry", "participation"),
+        title_keywords=("entry", "participation"),
+        labels=(
+            (
+                "pattern",
+                (
+                    ("monthly", "monthly"),
+                    ("quarter", "quarterly"),
+                    ("semi", "semi_annual"),
+                    ("annual", "annual"),
+                    ("payroll", "per_payroll"),
+                    ("first day", "first_of_period"),
+                ),
+            ),
+        ),
+        build=lambda v, p: {"pattern": v["pattern"], "provenance": p},
+    ),
+    FieldSpec(
+        field="retirement.normal_age",
+        query="normal retirement age definition",
+        keywords=("retirement",),
+        title_keywords=("normal retirement",),
+        ints=(("age", 50, 80), ("service_years", 0, 10)),
+        build=lambda v, p: {"age": v["age"], "service_years": v["service_years"], "provenance": p},
+    ),
+    FieldSpec(
+        field="compensation.base_definition",
+        query="compensation base definition",
+        keywords=("compensation",),
+        title_keywords=("compensation",),
+        labels=(("definition", (("w-2", "W2"), ("3401", "3401"), ("415", "415_safe_harbor"))),),
+        build=lambda v, p: {"definition": v["definition"], "provenance": p},
+    ),
+    FieldSpec(
+        field="compensation.exclusions",
+        query="compensation exclusions",
+        keywords=("compensation", "exclusion"),
+        title_keywords=("compensation",),
+        build=provenance_only,
+    ),
+    FieldSpec(
+        field="vesting.schedule",
+        query="vesting",
+        keywords=("vesting",),
+        build=lambda v, p: {"match": {"provenance": p}, "profit_sharing": {"provenance": p}},
+    ),
+    FieldSpec(
+        field="loans.enabled",
+        query="participant loans",
+        keywords=("loan",),
+        title_keywords=("loan",),
+        path=("loans",),
+        build=lambda v, p: {"enabled": True, "provenance": p},
+    ),
+    FieldSpec(
+        field="distributions.hardship",
+        query="hardship",
+        keywords=("hardship",),
+        build=lambda v, p: {"provenance": p, "definition": None, "allowed_sources": None},
+    ),
+    FieldSpec(
+        field="distributions.in_service",
+        query="in-service distribution",
+        keywords=("in-service", "in service"),
+        title_keywords=("in-service", "in service"),
+        ints=(("age", 50, 80),),
+        build=lambda v, p: {"age_threshold": v["age"], "provenance": p},
+    ),
+]
+
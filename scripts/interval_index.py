@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Page-interval index shared by layout extraction and segmentation for attaching
+tables to sections/provisions by page_range overlap.
+
+Containers are sorted by start page with a running max of end pages, so the
+first overlapping container is found with one bisect and all overlaps with a
+bisect plus a short scan: O(T log S) for T tables over S containers instead of
+O(T x S). Containers and tables may be plain dicts (layout extraction) or
+layout_records objects (segmentation).
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, List, Optional, Tuple
+
+ATTACH_MODES = ("first", "all", "best")
+
+
+def _get(item: Any, name: str) -> Any:
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+
+def _append_table(container: Any, table: Any):
+    if isinstance(container, dict):
+        container.setdefault("tables", []).append(table)
+    elif container.tables is None:
+        container.set("tables", [table])
+    else:
+        container.tables.append(table)
+
+
+def _page_range(item: Any) -> Optional[List[int]]:
+    pr = _get(item, "page_range")
+    if not pr or pr[0] is None or pr[1] is None:
+        return None
+    return pr
+
+
+class PageIntervalIndex:
+    """Sorted start pages + prefix-max end pages over items carrying [start, end] page ranges."""
+
+    def __init__(self, items: List[Any], key: Callable[[Any], Optional[List[int]]] = _page_range):
+        ranged = [(pr[0], pr[1], item) for item in items for pr in [key(item)] if pr]
+        # Stable sort keeps document order among equal starts, matching a first-match linear scan.
+        ranged.sort(key=lambda r: r[0])
+        self.starts = [r[0] for r in ranged]
+        self.ends = [r[1] for r in ranged]
+        self.items = [r[2] for r in ranged]
+        self.max_ends: List[int] = []
+        running = None
+        for end in self.ends:
+            running = end if running is None else max(running, end)
+            self.max_ends.append(running)
+
+    def first_overlap(self, start: int, end: int) -> Optional[Any]:
+        idx = bisect_left(self.max_ends, start)
+        if idx < len(self.items) and self.starts[idx] <= end:
+            return self.items[idx]
+        return None
+
+    def overlapping(self, start: int, end: int) -> List[Any]:
+        lo = bisect_left(self.max_ends, start)
+        hi = bisect_right(self.starts, end)
+        return [self.items[i] for i in range(lo, hi) if self.ends[i] >= start]
+
+
+def _bbox_overlap(a: Optional[List[float]], b: Optional[List[float]]) -> float:
+    if not a or not b:
+        return 0.0
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def _vertical_gap(a: Optional[List[float]], b: Optional[List[float]]) -> float:
+    if not a or not b:
+        return float("inf")
+    return max(a[1] - b[3], b[1] - a[3], 0.0)
+
+
+def _blocks_bbox_on_page(container: Any, page: int) -> Optional[List[float]]:
+    boxes = [_get(b, "bbox") for b in _get(container, "blocks") or [] if _get(b, "page") == page and _get(b, "bbox")]
+    if not boxes:
+        return None
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def _best_candidate(table: Any, candidates: List[Any]) -> Any:
+    """Most page overlap, then most bbox overlap (table's first page), then nearest vertically."""
+    tpr = _get(table, "page_range")
+    tbbox = _get(table, "bbox")
+
+    def score(container: Any) -> Tuple[int, float, float]:
+        cpr = _get(container, "page_range")
+        pages = min(tpr[1], cpr[1]) - max(tpr[0], cpr[0]) + 1
+        region = _blocks_bbox_on_page(container, tpr[0])
+        return pages, _bbox_overlap(region, tbbox), -_vertical_gap(region, tbbox)
+
+    return max(candidates, key=score)
+
+
+def attach_tables(containers: List[Any], tables: List[Any], mode: str = "first") -> List[Any]:
+    """
+    Append each table to overlapping containers' "tables" lists:
+    - first: the first container (by start page) whose page_range overlaps,
+    - all: every overlapping container,
+    - best: the overlapping container with the most page, then bbox, overlap.
+    Returns the tables that matched nothing.
+    """
+    if mode not in ATTACH_MODES:
+        raise ValueError(f"Unknown table attach mode {mode!r}; expected one of {ATTACH_MODES}")
+    index = PageIntervalIndex(containers)
+    unassigned: List[Any] = []
+    for table in tables:
+        tpr = _page_range(table)
+        if not tpr:
+            unassigned.append(table)
+            continue
+        if mode == "first":
+            match = index.first_overlap(tpr[0], tpr[1])
+            targets = [match] if match else []
+        else:
+            targets = index.overlapping(tpr[0], tpr[1])
+            if mode == "best" and targets:
+                targets = [_best_candidate(table, targets)]
+        if not targets:
+            unassigned.append(table)
+        for container in targets:
+            _append_table(container, table)
+    return unassigned
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON Lines format for layout and provision files.
+
+A `.jsonl` artifact is a header record followed by one record per line:
+
+  {"header": {"format": "layout", "version": 1, "document_id": ..., "file_name": ..., ...}}
+  {"section": {...}}              # layout: one per section, in document order
+  {"selection_mark": {...}}       # layout: top-level marks
+  {"provision": {...}}            # provisions: one per provision
+
+Readers parse one line at a time and writers emit one line at a time, so peak
+memory tracks the largest single record rather than the whole document plus its
+pretty-printed text. Paths with any other suffix keep the original indented
+single-object JSON, so every stage accepts either format.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+FORMAT_VERSION = 1
+
+# Record key per top-level list in the single-object formats.
+LAYOUT_LISTS = {"sections": "section", "tables": "table", "selection_marks": "selection_mark"}
+
+
+def is_jsonl(path: Path) -> bool:
+    return Path(path).suffix.lower() == ".jsonl"
+
+
+class JsonlWriter:
+    """Incremental writer; output goes to a temp file renamed into place on close, so readers never see partial files."""
+
+    def __init__(self, path: Path, fmt: str, header: Dict[str, Any]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.fh = self.tmp_path.open("w", encoding="utf-8")
+        self.count = 0
+        self._line({"header": {"format": fmt, "version": FORMAT_VERSION, **header}})
+
+    def _line(self, obj: Dict[str, Any]):
+        self.fh.write(json.dumps(obj, separators=(",", ":")))
+        self.fh.write("\n")
+
+    def write(self, kind: str, record: Dict[str, Any]):
+        self._line({kind: record})
+        self.count += 1
+
+    def close(self):
+        self.fh.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.fh.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+def read_jsonl(path: Path) -> Tuple[Dict[str, Any], Iterator[Tuple[str, Dict[str, Any]]]]:
+    """Header dict plus a lazy iterator of (kind, record) pairs."""
+    fh = Path(path).open("r", encoding="utf-8")
+    first = fh.readline()
+    header = json.loads(first).get("header") if first.strip() else None
+    if header is None:
+        fh.close()
+        raise ValueError(f"{path}: missing JSONL header record")
+
+    def records() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with fh:
+            for line in fh:
+                if line.strip():
+                    ((kind, record),) = json.loads(line).items()
+                    yield kind, record
+
+    return header, records()
+
+
+def _split(data: Dict[str, Any], lists: Dict[str, str]) -> Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]:
+    header = {k: v for k, v in data.items() if k not in lists}
+    items = [(kind, item) for key, kind in lists.items() for item in data.get(key) or []]
+    return header, items
+
+
+def _assemble(header: Dict[str, Any], records: Iterable[Tuple[str, Dict[str, Any]]], lists: Dict[str, str]) -> Dict[str, Any]:
+    data = {k: v for k, v in header.items() if k not in ("format", "version")}
+    for key in lists:
+        data[key] = []
+    by_kind = {kind: key for key, kind in lists.items()}
+    for kind, record in records:
+        data[by_kind[kind]].append(record)
+    return data
+
+
+def open_layout(path: Path) -> Tuple[Dict[str, Any], Iterator[Tuple[str, Dict[str, Any]]]]:
+    """Layout header and (kind, record) stream for either format (single-object JSON is parsed up front)."""
+    if is_jsonl(path):
+        return read_jsonl(path)
+    header, items = _split(json.loads(Path(path).read_text()), LAYOUT_LISTS)
+    return header, iter(items)
+
+
+def load_layout(path: Path) -> Dict[str, Any]:
+    if not is_jsonl(path):
+        return json.loads(Path(path).read_text())
+    header, records = read_jsonl(path)
+    return _assemble(header, records, LAYOUT_LISTS)
+
+
+def write_layout(path: Path, layout: Dict[str, Any]):
+    path = Path(path)
+    if not is_jsonl(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(layout, indent=2))
+        return
+    header, items = _split(layout, LAYOUT_LISTS)
+    with JsonlWriter(path, "layout", header) as writer:
+        for kind, item in items:
+            writer.write(kind, item)
+
+
+def iter_provisions(path: Path) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Provisions header (e.g. source_layout) and a provision iterator for either format."""
+    if is_jsonl(path):
+        header, records = read_jsonl(path)
+        return header, (record for kind, record in records if kind == "provision")
+    data = json.loads(Path(path).read_text())
+    return {k: v for k, v in data.items() if k != "provisions"}, iter(data.get("provisions", []))
+
+
+def write_provisions(path: Path, provisions: Iterable[Dict[str, Any]], source_layout: Optional[str]) -> int:
+    """Write provisions (consumed lazily for JSONL); returns the count."""
+    path = Path(path)
+    if not is_jsonl(path):
+        provisions = list(provisions)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"provisions": provisions, "source_layout": source_layout}, indent=2))
+        return len(provisions)
+    with JsonlWriter(path, "provisions", {"source_layout": source_layout}) as writer:
+        for prov in provisions:
+            writer.write("provision", prov)
+        return writer.count
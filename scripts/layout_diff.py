@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Page- and block-level diff of two normalized layouts of the same document
+(e.g. a BPD before and after a 2-page amendment).
+
+Pages are fingerprinted by their blocks (in reading order) and the tables that
+touch them, ignoring ids, page numbers and page ranges (block ids are character
+offsets, so they shift with any earlier edit). Page fingerprints are aligned
+with difflib, which tolerates inserted/removed pages: unchanged pages map old
+page -> new page, and only the pages in changed runs get a block-level diff.
+
+Used by segment_provisions.py --previous-layout to re-segment only the region
+around changed pages.
+
+Usage:
+  python scripts/layout_diff.py --old tmp/layout_full/bpd_v1.json --new tmp/layout_full/bpd_v2.json --out tmp/bpd_layout_diff.json
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from jsonl_io import load_layout
+
+# Keys that move with unrelated edits (offset-based ids, page numbers), so are not content.
+VOLATILE_KEYS = {"id", "page", "page_range", "selection_mark_ids", "label_block_id"}
+
+
+def reading_key(block: Dict[str, Any]) -> Tuple[int, Tuple[float, ...]]:
+    """Same order as segment_provisions.reading_order(), on plain dicts."""
+    bbox = block.get("bbox")
+    return block.get("page") or 0, tuple(bbox) if bbox else (0, 0, 0, 0)
+
+
+def _strip(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _strip(v) for k, v in obj.items() if k not in VOLATILE_KEYS}
+    if isinstance(obj, list):
+        return [_strip(v) for v in obj]
+    return obj
+
+
+def block_fingerprint(block: Dict[str, Any]) -> Hashable:
+    bbox = block.get("bbox")
+    style = block.get("style")
+    return (
+        block.get("type"),
+        block.get("text"),
+        tuple(bbox) if bbox else None,
+        json.dumps(style, sort_keys=True) if isinstance(style, (dict, list)) else style,
+    )
+
+
+def table_fingerprint(table: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(_strip(table), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _table_pages(table: Dict[str, Any]) -> Optional[List[int]]:
+    pr = table.get("page_range")
+    return pr if pr and pr[0] is not None and pr[1] is not None else None
+
+
+class LayoutPages:
+    """A layout's blocks grouped by page in reading order, and its section tables in collection order."""
+
+    def __init__(self, layout: Dict[str, Any]):
+        self.layout = layout
+        self.pages: Dict[int, List[Dict[str, Any]]] = {}
+        self.tables: List[Dict[str, Any]] = []
+        for section in layout.get("sections", []):
+            for block in section.get("blocks") or []:
+                self.pages.setdefault(block.get("page") or 0, []).append(block)
+            self.tables.extend(section.get("tables") or [])
+        for blocks in self.pages.values():
+            blocks.sort(key=reading_key)  # stable: ties keep section order, like segment_provisions
+        ends = [pr[1] for pr in map(_table_pages, self.tables) if pr]
+        self.page_count = max([layout.get("page_count") or 0] + list(self.pages) + ends)
+
+    def fingerprints(self) -> List[Hashable]:
+        """One fingerprint per page 1..page_count: block fingerprints plus tables touching the page (relative span)."""
+        touching: Dict[int, List[Tuple[str, int, int]]] = {}
+        for table in self.tables:
+            pr = _table_pages(table)
+            if not pr:
+                continue
+            fp = table_fingerprint(table)
+            for page in range(pr[0], pr[1] + 1):
+                touching.setdefault(page, []).append((fp, pr[0] - page, pr[1] - page))
+        return [
+            hash((tuple(block_fingerprint(b) for b in self.pages.get(page, [])), tuple(touching.get(page, []))))
+            for page in range(1, self.page_count + 1)
+        ]
+
+    def content_blocks(self, toc_pages: int) -> Tuple[List[Dict[str, Any]], Dict[int, int]]:
+        """Blocks past the TOC pages in reading order, and each content page's offset into that list."""
+        blocks: List[Dict[str, Any]] = []
+        offsets: Dict[int, int] = {}
+        for page in sorted(p for p in self.pages if p > toc_pages):
+            offsets[page] = len(blocks)
+            blocks.extend(self.pages[page])
+        return blocks, offsets
+
+
+@dataclass
+class LayoutDiff:
+    old: LayoutPages
+    new: LayoutPages
+    opcodes: List[Tuple[str, int, int, int, int]]  # difflib opcodes over 1-based page numbers (end exclusive)
+    page_map: Dict[int, int] = field(default_factory=dict)  # unchanged old page -> new page
+
+    @property
+    def changed_pages(self) -> List[int]:
+        """New pages that were inserted or edited."""
+        return [page for tag, _, _, j1, j2 in self.opcodes if tag in ("replace", "insert") for page in range(j1, j2)]
+
+    @property
+    def removed_pages(self) -> List[int]:
+        return [page for tag, i1, i2, _, _ in self.opcodes if tag == "delete" for page in range(i1, i2)]
+
+    def block_changes(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Block-level edits within each changed page run (text truncated for the report)."""
+        changes: List[Dict[str, Any]] = []
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == "equal":
+                continue
+            old_blocks = [b for page in range(i1, i2) for b in self.old.pages.get(page, [])]
+            new_blocks = [b for page in range(j1, j2) for b in self.new.pages.get(page, [])]
+            matcher = difflib.SequenceMatcher(
+                None, [block_fingerprint(b) for b in old_blocks], [block_fingerprint(b) for b in new_blocks], autojunk=False
+            )
+            for op, a1, a2, b1, b2 in matcher.get_opcodes():
+                if op == "equal":
+                    continue
+                changes.append(
+                    {
+                        "op": op,
+                        "old": [_block_ref(b) for b in old_blocks[a1:a2]],
+                        "new": [_block_ref(b) for b in new_blocks[b1:b2]],
+                    }
+                )
+                if len(changes) >= limit:
+                    return changes
+        return changes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "old_pages": self.old.page_count,
+            "new_pages": self.new.page_count,
+            "changed_pages": self.changed_pages,
+            "removed_pages": self.removed_pages,
+            "page_runs": [
+                {"op": tag, "old_pages": [i1, i2 - 1], "new_pages": [j1, j2 - 1]} for tag, i1, i2, j1, j2 in self.opcodes
+            ],
+            "block_changes": self.block_changes(),
+        }
+
+
+def _block_ref(block: Dict[str, Any]) -> Dict[str, Any]:
+    text = block.get("text") or ""
+    return {"id": block.get("id"), "page": block.get("page"), "text": text if len(text) <= 120 else text[:117] + "..."}
+
+
+def diff_layouts(old_layout: Dict[str, Any], new_layout: Dict[str, Any]) -> LayoutDiff:
+    old, new = LayoutPages(old_layout), LayoutPages(new_layout)
+    matcher = difflib.SequenceMatcher(None, old.fingerprints(), new.fingerprints(), autojunk=False)
+    opcodes = [(tag, i1 + 1, i2 + 1, j1 + 1, j2 + 1) for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
+    diff = LayoutDiff(old, new, opcodes)
+    for tag, i1, i2, j1, _ in opcodes:
+        if tag == "equal":
+            diff.page_map.update({page: j1 + (page - i1) for page in range(i1, i2)})
+    return diff
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Page/block diff of two layouts of the same document.")
+    parser.add_argument("--old", required=True, help="Earlier layout JSON/JSONL.")
+    parser.add_argument("--new", required=True, help="Later layout JSON/JSONL.")
+    parser.add_argument("--out", help="Write the diff report (JSON) here.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    diff = diff_layouts(load_layout(Path(args.old)), load_layout(Path(args.new)))
+    report = diff.to_dict()
+    print(
+        f"{len(report['changed_pages'])} changed/inserted pages, {len(report['removed_pages'])} removed, "
+        f"{len(report['block_changes'])} block edits ({report['old_pages']} -> {report['new_pages']} pages)"
+    )
+    if args.out:
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Azure Document Intelligence (prebuilt-layout).
+
+LocalLayoutClient exposes the same begin_analyze_document(...).result() interface
+as DocumentAnalysisClient, serving either recorded raw results (the cache written
+by extract_layout.py, keyed by PDF SHA-256) or deterministic synthetic layouts.
+Latency, a service capacity (concurrent requests beyond it get 429) and random
+throttling can be injected, so batching, caching and normalization throughput
+can be measured offline and reproducibly.
+
+Usage:
+  # benchmark batch extraction against synthetic documents
+  python scripts/layout_standin.py --docs 20 --pages 40 --latency 0.5 --capacity 4 --concurrency 8
+  # drive the real CLI offline
+  python scripts/extract_layout.py --local-standin --input-dir <dir> --out-dir tmp/layout_bench
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from extract_layout import MODEL_ID, count_pdf_pages, normalize_result, result_from_dict, run_batch
+
+SYNTH_TOPICS = [
+    ("Eligibility", "An Employee will be eligible to participate upon attaining age 21 and completing 1 Year of Service."),
+    ("Entry Date", "Entry Dates are the first day of each Plan Year quarter following satisfaction of eligibility."),
+    ("Compensation", "Compensation means W-2 wages, excluding bonuses, overtime and commissions as elected."),
+    ("Normal Retirement Age", "Normal Retirement Age is age 65 or the fifth anniversary of participation, if later."),
+    ("Vesting", "Matching Contributions vest under a 6-year graded schedule; deferrals are always 100% vested."),
+    ("Loans", "Participant loans are permitted subject to the written loan policy adopted by the Administrator."),
+    ("Hardship Distributions", "Hardship distributions are permitted for an immediate and heavy financial need."),
+    ("In-Service Distributions", "In-service distributions are permitted after attaining age 59 1/2."),
+]
+FILLER = "The Plan Administrator will interpret the Plan in a uniform and nondiscriminatory manner. "
+
+
+class StandinThrottled(Exception):
+    """429 raised by the stand-in; mirrors HttpResponseError's status_code/response shape."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("(429) Requests to the Analyze Layout API have exceeded the rate limit.")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"Retry-After": str(retry_after)}})()
+
+
+def _poly(x0: float, y0: float, x1: float, y1: float) -> List[Dict[str, float]]:
+    return [{"x": x0, "y": y0}, {"x": x1, "y": y0}, {"x": x1, "y": y1}, {"x": x0, "y": y1}]
+
+
+def synthetic_result(seed: str, first_page: int, last_page: int) -> Dict[str, Any]:
+    """Deterministic prebuilt-layout-shaped dict (AnalyzeResult.to_dict() keys) for a page range."""
+    content_parts: List[str] = []
+    offset = 0
+    paragraphs: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+    pages: List[Dict[str, Any]] = []
+
+    def add_paragraph(text: str, role: Optional[str], page: int, y: float):
+        nonlocal offset
+        paragraphs.append(
+            {
+                "role": role,
+                "content": text,
+                "spans": [{"offset": offset, "length": len(text)}],
+                "bounding_regions": [{"page_number": page, "polygon": _poly(1.0, y, 7.5, y + 0.4)}],
+            }
+        )
+        content_parts.append(text)
+        offset += len(text) + 1
+
+    for page in range(first_page, last_page + 1):
+        rng = random.Random(f"{seed}:{page}")
+        topic, body = SYNTH_TOPICS[rng.randrange(len(SYNTH_TOPICS))]
+        add_paragraph(f"{page}.1 {topic.upper()}", "sectionHeading", page, 1.0)
+        add_paragraph(FILLER * rng.randint(1, 3) + body, None, page, 1.6)
+        add_paragraph(FILLER * rng.randint(1, 4), None, page, 2.4)
+        marks = []
+        if page % 3 == 0:
+            cells = []
+            for row, label in enumerate(["Elective Deferrals", "Matching", "Profit Sharing"]):
+                y = 4.0 + row * 0.5
+                cells.append(
+                    {
+                        "row_index": row,
+                        "column_index": 0,
+                        "content": label,
+                        "bounding_regions": [{"page_number": page, "polygon": _poly(1.0, y, 3.0, y + 0.5)}],
+                    }
+                )
+                cells.append(
+                    {
+                        "row_index": row,
+                        "column_index": 1,
+                        "content": ":selected:" if row % 2 == 0 else ":unselected:",
+                        "bounding_regions": [{"page_number": page, "polygon": _poly(3.0, y, 4.0, y + 0.5)}],
+                    }
+                )
+                marks.append(
+                    {
+                        "state": "selected" if row % 2 == 0 else "unselected",
+                        "polygon": _poly(3.4, y + 0.15, 3.6, y + 0.35),
+                        "confidence": 0.99,
+                    }
+                )
+            tables.append(
+                {
+                    "row_count": 3,
+                    "column_count": 2,
+                    "cells": cells,
+                    "bounding_regions": [{"page_number": page, "polygon": _poly(1.0, 4.0, 4.0, 5.5)}],
+                }
+            )
+        # A standalone checkbox next to a label paragraph.
+        marks.append({"state": "selected" if page % 2 else "unselected", "polygon": _poly(0.6, 2.5, 0.8, 2.7)})
+        pages.append({"page_number": page, "width": 8.5, "height": 11.0, "unit": "inch", "selection_marks": marks})
+    return {
+        "model_id": MODEL_ID,
+        "content": "\n".join(content_parts),
+        "pages": pages,
+        "paragraphs": paragraphs,
+        "tables": tables,
+        "created_on": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def slice_pages(data: Dict[str, Any], first_page: int, last_page: int) -> Dict[str, Any]:
+    """Restrict a recorded whole-document result to a page range (page numbers stay absolute)."""
+
+    def on_pages(item: Dict[str, Any]) -> bool:
+        regions = item.get("bounding_regions") or []
+        return bool(regions) and first_page <= regions[0]["page_number"] <= last_page
+
+    return {
+        **data,
+        "pages": [p for p in data.get("pages") or [] if first_page <= p["page_number"] <= last_page],
+        "paragraphs": [p for p in data.get("paragraphs") or [] if on_pages(p)],
+        "tables": [t for t in data.get("tables") or [] if on_pages(t)],
+    }
+
+
+class _Poller:
+    def __init__(self, client: "LocalLayoutClient", data: Dict[str, Any], latency: float):
+        self._client = client
+        self._data = data
+        self._latency = latency
+
+    def result(self) -> Any:
+        try:
+            if self._latency:
+                time.sleep(self._latency)
+            return result_from_dict(json.loads(json.dumps(self._data)))
+        finally:
+            self._client._finish()
+
+
+class LocalLayoutClient:
+    """Drop-in for DocumentAnalysisClient.begin_analyze_document with latency/throttling injection."""
+
+    def __init__(
+        self,
+        recorded_dir: Optional[Path] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        per_page_latency: float = 0.0,
+        capacity: int = 0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.5,
+        default_pages: int = 10,
+        seed: int = 0,
+    ):
+        self.recorded_dir = Path(recorded_dir) if recorded_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.per_page_latency = per_page_latency
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.default_pages = default_pages
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"requests": 0, "throttled": 0, "recorded": 0, "synthetic": 0}
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def begin_analyze_document(self, model_id: str, document: Any, pages: Optional[str] = None, **kwargs) -> _Poller:
+        body = document if isinstance(document, (bytes, bytearray)) else document.read()
+        with self._lock:
+            self.stats["requests"] += 1
+            over_capacity = bool(self.capacity) and self.in_flight >= self.capacity
+            if over_capacity or self._rng.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                raise StandinThrottled(self.retry_after)
+            self.in_flight += 1
+            jitter = self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+        try:
+            data = self._resolve(model_id, bytes(body), pages)
+        except Exception:
+            self._finish()
+            raise
+        page_total = len(data.get("pages") or [])
+        return _Poller(self, data, self.latency + jitter + self.per_page_latency * page_total)
+
+    def _resolve(self, model_id: str, body: bytes, pages: Optional[str]) -> Dict[str, Any]:
+        sha = hashlib.sha256(body).hexdigest()
+        first, last = (int(x) for x in pages.split("-")) if pages else (1, None)
+        if self.recorded_dir:
+            path = self.recorded_dir / model_id / f"{sha}.json"
+            if path.exists():
+                with self._lock:
+                    self.stats["recorded"] += 1
+                data = json.loads(path.read_text())["result"]
+                return slice_pages(data, first, last) if pages else data
+        with self._lock:
+            self.stats["synthetic"] += 1
+        page_count = count_pdf_pages(body) or self.default_pages
+        return synthetic_result(sha, first, min(last or page_count, page_count))
+
+
+def write_synthetic_pdfs(out_dir: Path, docs: int, pages: int) -> List[Path]:
+    """Placeholder PDFs whose bytes differ per document and carry `pages` page objects."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(docs):
+        path = out_dir / f"synthetic_{i:03d}.pdf"
+        header = f"%PDF-1.7\n% synthetic {i}\n".encode("ascii")
+        path.write_bytes(header + b"<< /Type /Page >>\n" * pages + b"%%EOF\n")
+        paths.append(path)
+    return paths
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark layout extraction against the local stand-in.")
+    parser.add_argument("--docs", type=int, default=10, help="Synthetic documents to generate.")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic document.")
+    parser.add_argument("--input-dir", help="Use these PDFs instead of generating synthetic ones.")
+    parser.add_argument("--recorded-dir", help="Serve recorded raw results from this extract_layout cache dir.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Base seconds per analyze request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (0..jitter seconds).")
+    parser.add_argument("--per-page-latency", type=float, default=0.0, help="Extra seconds per analyzed page.")
+    parser.add_argument("--capacity", type=int, default=0, help="Concurrent requests before 429s (0 = unlimited).")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Random 429 probability per request.")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After seconds on injected 429s.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch concurrency passed to run_batch().")
+    parser.add_argument("--chunk-pages", type=int, default=0, help="Passed through to analyze_document().")
+    parser.add_argument("--cache-dir", help="Raw result cache dir (omit to benchmark uncached).")
+    parser.add_argument("--out-dir", help="Where to write layouts (defaults to a temp dir).")
+    parser.add_argument("--summary", help="Write the benchmark summary JSON here.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    client = LocalLayoutClient(
+        recorded_dir=Path(args.recorded_dir) if args.recorded_dir else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        per_page_latency=args.per_page_latency,
+        capacity=args.capacity,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.input_dir:
+            pdfs = sorted(Path(args.input_dir).glob("*.pdf"))
+        else:
+            pdfs = write_synthetic_pdfs(Path(scratch) / "pdfs", args.docs, args.pages)
+        out_dir = Path(args.out_dir) if args.out_dir else Path(scratch) / "layouts"
+        jobs = [{"input": pdf, "doc_id": pdf.stem} for pdf in pdfs]
+        summary = run_batch(
+            client,
+            jobs,
+            out_dir,
+            endpoint="local-standin",
+            key="",
+            redact=False,
+            concurrency=args.concurrency,
+            cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+            chunk_pages=args.chunk_pages,
+        )
+        # Normalization-only throughput, with service latency removed.
+        raw = [synthetic_result(f"bench-{i}", 1, args.pages) for i in range(len(jobs))]
+        start = time.perf_counter()
+        for i, data in enumerate(raw):
+            normalize_result(result_from_dict(data), f"bench-{i}", f"bench-{i}.pdf", "local-standin", redact=False)
+        norm_seconds = time.perf_counter() - start
+
+    summary["standin"] = dict(client.stats)
+    summary["docs_per_second"] = round(len(jobs) / summary["wall_seconds"], 3) if summary["wall_seconds"] else None
+    summary["normalize_pages_per_second"] = round(len(raw) * args.pages / norm_seconds, 1) if norm_seconds else None
+    report = {k: v for k, v in summary.items() if k != "records"}
+    print(json.dumps(report, indent=2))
+    if args.summary:
+        Path(args.summary).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.summary).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Offline embedding backend: hashing vectorizer + TF-IDF, optionally reduced with
+truncated SVD, fitted over a provision corpus. Runs on CPU with no network, for
+air-gapped processing of client documents or when API latency dominates.
+
+Usage (fit once over a corpus, then reuse from extract_canonical.py):
+  python scripts/local_embeddings.py --provisions tmp/provisions/*.json --out tmp/cache/local_embedder.json --svd-components 128
+  python scripts/extract_canonical.py --provisions ... --out ... --embedding-backend local --local-model tmp/cache/local_embedder.json
+
+SVD requires numpy; without it the embedder emits the (L2-normalized) hashed
+TF-IDF vectors directly. The SVD basis is a randomized truncated SVD over at most
+SVD_SAMPLE_ROWS sampled provisions, so fitting stays bounded at corpus scale.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from provision_index import analyze
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+DEFAULT_FEATURES = 4096
+SVD_SAMPLE_ROWS = 20000  # provisions sampled for the SVD basis; IDF still uses every text
+SVD_OVERSAMPLE = 10
+SVD_POWER_ITERATIONS = 4
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fit the local hashing TF-IDF embedder over provision files.")
+    parser.add_argument("--provisions", nargs="+", required=True, help="Provision JSON files to fit over.")
+    parser.add_argument("--out", required=True, help="Output path for the fitted model (JSON).")
+    parser.add_argument("--n-features", type=int, default=DEFAULT_FEATURES, help="Hashed feature dimensions.")
+    parser.add_argument(
+        "--svd-components",
+        type=int,
+        default=0,
+        help="Reduce to this many dimensions with truncated SVD (0 = no reduction; needs numpy).",
+    )
+    return parser.parse_args()
+
+
+def _pack(values: Sequence[float]) -> str:
+    return base64.b64encode(array("f", values).tobytes()).decode("ascii")
+
+
+def _unpack(data: str) -> List[float]:
+    vec = array("f")
+    vec.frombytes(base64.b64decode(data))
+    return vec.tolist()
+
+
+def _l2(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec))
+    return [x / norm for x in vec] if norm else vec
+
+
+class HashingTfidfEmbedder:
+    """Unigram+bigram feature hashing with sublinear TF, smoothed IDF and optional SVD projection."""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES, svd_components: int = 0):
+        self.n_features = n_features
+        self.svd_components = svd_components
+        self.idf: List[float] = [1.0] * n_features
+        self.components: Optional[List[List[float]]] = None  # svd_components x n_features
+
+    @property
+    def model_id(self) -> str:
+        digest = hashlib.sha256(array("f", self.idf).tobytes())
+        if self.components:
+            digest.update(array("f", [x for row in self.components for x in row]).tobytes())
+        dims = len(self.components) if self.components else self.n_features
+        return f"local-hashing-tfidf-{dims}d-{digest.hexdigest()[:12]}"
+
+    def _features(self, text: str) -> Dict[int, float]:
+        """Signed hashed term frequencies (sublinear) for one text."""
+        terms = analyze(text)
+        grams = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+        counts: Dict[int, float] = {}
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            bucket = h % self.n_features
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        return {b: math.copysign(1.0 + math.log(abs(c)), c) for b, c in counts.items() if c}
+
+    def _tfidf(self, text: str) -> List[float]:
+        vec = [0.0] * self.n_features
+        for bucket, tf in self._features(text).items():
+            vec[bucket] = tf * self.idf[bucket]
+        return _l2(vec)
+
+    def fit(self, texts: Sequence[str]) -> "HashingTfidfEmbedder":
+        n = len(texts)
+        df = [0] * self.n_features
+        for text in texts:
+            for bucket in self._features(text):
+                df[bucket] += 1
+        self.idf = [math.log((1.0 + n) / (1.0 + d)) + 1.0 for d in df]
+        self.components = None
+        if self.svd_components and np is not None and n:
+            rng = np.random.default_rng(0)
+            rows = sorted(rng.choice(n, SVD_SAMPLE_ROWS, replace=False)) if n > SVD_SAMPLE_ROWS else range(n)
+            mat = np.asarray([self._tfidf(texts[i]) for i in rows], dtype=np.float32)
+            self.components = randomized_svd_basis(mat, self.svd_components, rng).tolist()
+        return self
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = [self._tfidf(t) for t in texts]
+        if not self.components:
+            return vectors
+        if np is not None:
+            projected = np.asarray(vectors, dtype=np.float32) @ np.asarray(self.components, dtype=np.float32).T
+            return [_l2(row) for row in projected.tolist()]
+        return [_l2([sum(x * c for x, c in zip(vec, comp)) for comp in self.components]) for vec in vectors]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": "hashing_tfidf",
+            "n_features": self.n_features,
+            "svd_components": self.svd_components,
+            "idf": _pack(self.idf),
+            "components": [_pack(row) for row in self.components] if self.components else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HashingTfidfEmbedder":
+        model = cls(n_features=data["n_features"], svd_components=data.get("svd_components") or 0)
+        model.idf = _unpack(data["idf"])
+        model.components = [_unpack(row) for row in data["components"]] if data.get("components") else None
+        return model
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: Path) -> "HashingTfidfEmbedder":
+        return cls.from_dict(json.loads(path.read_text()))
+
+
+def randomized_svd_basis(mat: Any, k: int, rng: Any) -> Any:
+    """
+    Top-k right singular vectors (k x features) by randomized range finding
+    (Halko et al.): a Gaussian sketch refined by a few power iterations, then an
+    exact SVD of the small projected matrix, never of the full one.
+    """
+    width = min(k + SVD_OVERSAMPLE, *mat.shape)
+    q, _ = np.linalg.qr(mat @ rng.standard_normal((mat.shape[1], width)).astype(mat.dtype))
+    for _ in range(SVD_POWER_ITERATIONS):
+        z, _ = np.linalg.qr(mat.T @ q)
+        q, _ = np.linalg.qr(mat @ z)
+    _, _, vt = np.linalg.svd(q.T @ mat, full_matrices=False)
+    return vt[:k]
+
+
+def load_or_fit(path: Optional[Path], texts: Sequence[str], svd_components: int = 0) -> HashingTfidfEmbedder:
+    """Load a persisted corpus model, or fit a throwaway one over texts (never saved: one document is not a corpus)."""
+    if path and path.exists():
+        return HashingTfidfEmbedder.load(path)
+    return HashingTfidfEmbedder(svd_components=svd_components).fit(texts)
+
+
+def main():
+    # Imported here: extract_canonical imports this module for its --embedding-backend option.
+    from extract_canonical import clean_for_embedding, load_provisions
+    from provision_index import text_blob
+
+    args = parse_args()
+    texts: List[str] = []
+    for name in args.provisions:
+        _, provisions = load_provisions(Path(name))
+        texts.extend(clean_for_embedding(text_blob(p)) for p in provisions)
+    if args.svd_components and np is None:
+        print("WARNING: numpy not available; fitting without SVD reduction.")
+    model = HashingTfidfEmbedder(n_features=args.n_features, svd_components=args.svd_components).fit(texts)
+    out_path = Path(args.out)
+    model.save(out_path)
+    print(f"Fitted {model.model_id} over {len(texts)} provisions; wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
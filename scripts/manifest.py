@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Build manifests for pipeline artifacts: each output gets a sidecar
+`<artifact>.manifest.json` recording the content hashes of its inputs, the stage
+version (hash of the stage's source files) and the stage config, plus the hash
+of the output itself. An artifact is up to date when all of those still match,
+so a driver can skip it and rebuild only what changed downstream.
+"""
+
+import ast
+import hashlib
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Entry module of each stage. The stage version covers it plus every scripts/ module it
+# imports, transitively (see stage_files), so a new helper module cannot be missed.
+STAGE_SOURCES = {
+    "layout": ["extract_layout.py"],
+    "segment": ["segment_provisions.py"],
+    "canonical": ["extract_canonical.py"],
+}
+# Instrumentation and bookkeeping: imported by every stage, never change its output.
+UNVERSIONED = {"metrics.py", "manifest.py"}
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_version(files: Iterable[str], base: Path = SCRIPTS_DIR) -> str:
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update((base / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def local_imports(name: str, base: Path = SCRIPTS_DIR) -> List[str]:
+    """scripts/ modules imported anywhere in a module (including function-level imports)."""
+    modules: List[str] = []
+    for node in ast.walk(ast.parse((base / name).read_text(), filename=name)):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return [f"{module}.py" for module in modules if (base / f"{module}.py").exists()]
+
+
+@lru_cache(maxsize=None)
+def stage_files(stage: str) -> Tuple[str, ...]:
+    """A stage's entry modules and their transitive scripts/ imports, sorted."""
+    seen: Set[str] = set()
+    todo = list(STAGE_SOURCES[stage])
+    while todo:
+        name = todo.pop()
+        if name not in seen and name not in UNVERSIONED:
+            seen.add(name)
+            todo.extend(local_imports(name))
+    return tuple(sorted(seen))
+
+
+def stage_version(stage: str) -> str:
+    return source_version(stage_files(stage))
+
+
+def manifest_path(artifact: Path) -> Path:
+    return artifact.with_name(artifact.name + ".manifest.json")
+
+
+def load_manifest(artifact: Path) -> Optional[Dict[str, Any]]:
+    path = manifest_path(artifact)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return None
+
+
+def write_manifest(artifact: Path, stage: str, version: str, inputs: Dict[str, str], config: Dict[str, Any]):
+    record = {
+        "stage": stage,
+        "stage_version": version,
+        "inputs": inputs,
+        "config": config,
+        "output_sha256": sha256_file(artifact),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    manifest_path(artifact).write_text(json.dumps(record, indent=2))
+
+
+def stale_reason(
+    artifact: Path, stage: str, version: str, inputs: Dict[str, str], config: Dict[str, Any]
+) -> Optional[str]:
+    """Why the artifact must be rebuilt, or None when it is up to date."""
+    if not artifact.exists():
+        return "missing"
+    record = load_manifest(artifact)
+    if not record:
+        return "no manifest"
+    if record.get("stage") != stage or record.get("stage_version") != version:
+        return "stage version changed"
+    if record.get("inputs") != inputs:
+        return "inputs changed"
+    if record.get("config") != config:
+        return "config changed"
+    if record.get("output_sha256") != sha256_file(artifact):
+        return "output modified"
+    return None
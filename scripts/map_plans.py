@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Source-vs-target mapping (roadmap phase "Mapping & Scoring"): compare two
+canonical drafts (e.g. Relius -> Ascensus) together with their provision sets
+and emit, for every canonical node and contribution type, a category
+(Exact / Close / Fuzzy / Gap), a confidence and provenance for both sides.
+
+Scoring:
+- The full source x target provision similarity matrix is computed in one
+  vectorized pass: TF-IDF over the provision index terms by default, or the
+  configured embedding backend (--embedding-backend openai|local).
+- Alignment is one-to-many: a source node's provision aligns to every target
+  provision within --margin of the best match (up to --max-targets), plus the
+  target draft's own provision for that node. Nodes split by contribution type
+  (deferrals/match/profit_sharing) are aligned per type.
+- Category: typed values (age, years, pattern, definition, ...) decide
+  Exact/Close vs Fuzzy when both sides have them; provenance-only nodes are
+  rated by similarity thresholds. Nothing above --fuzzy-threshold is a Gap.
+
+Usage:
+  python scripts/map_plans.py --source-canonical tmp/canonical/relius.json --source-provisions tmp/provisions/relius.json \
+      --target-canonical tmp/canonical/ascensus.json --target-provisions tmp/provisions/ascensus.json \
+      --out tmp/mapping/relius__ascensus.json --csv tmp/mapping/relius__ascensus.csv
+  python scripts/map_plans.py --pairs tmp/mapping/book.json   # [{"source_canonical": ..., ..., "out": ...}, ...]
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import extract_canonical
+from extract_canonical import (
+    add_embedding_args,
+    clean_for_embedding,
+    configure_embeddings,
+    finish_embeddings,
+    load_provisions,
+    make_embedder,
+    provenance_from,
+)
+from field_specs import CONTRIBUTION_SOURCES, FIELD_SPECS
+from provision_index import IndexedProvision, ProvisionIndex
+from similarity import normalize_rows, similarity_matrix, top_k_indices
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+CATEGORIES = ("Exact", "Close", "Fuzzy", "Gap")
+
+# Cosine thresholds; tuned for the TF-IDF default (same-template text scores ~0.9+).
+EXACT_THRESHOLD = 0.85
+CLOSE_THRESHOLD = 0.6
+FUZZY_THRESHOLD = 0.3
+ALIGN_MARGIN = 0.05
+MAX_TARGETS = 3
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Map source canonical nodes to a target plan (Exact/Close/Fuzzy/Gap).")
+    parser.add_argument("--source-canonical", help="Source canonical JSON (extract_canonical.py output).")
+    parser.add_argument("--source-provisions", help="Source provisions JSON/JSONL.")
+    parser.add_argument("--target-canonical", help="Target canonical JSON.")
+    parser.add_argument("--target-provisions", help="Target provisions JSON/JSONL.")
+    parser.add_argument("--out", help="Mapping JSON output.")
+    parser.add_argument("--csv", help="Also write a spreadsheet-ready CSV (one row per node and contribution type).")
+    parser.add_argument(
+        "--pairs", help='Batch: JSON list of {"source_canonical", "source_provisions", "target_canonical", "target_provisions", "out"[, "csv"]}.'
+    )
+    parser.add_argument("--exact-threshold", type=float, default=EXACT_THRESHOLD, help="Similarity for Exact.")
+    parser.add_argument("--close-threshold", type=float, default=CLOSE_THRESHOLD, help="Similarity for Close.")
+    parser.add_argument("--fuzzy-threshold", type=float, default=FUZZY_THRESHOLD, help="Below this similarity is a Gap.")
+    parser.add_argument("--margin", type=float, default=ALIGN_MARGIN, help="Align targets within this much of the best.")
+    parser.add_argument("--max-targets", type=int, default=MAX_TARGETS, help="Most target provisions per source node.")
+    add_embedding_args(parser)
+    return parser.parse_args()
+
+
+@dataclass
+class Side:
+    """One plan: its canonical draft and indexed provisions (positions match similarity matrix rows/columns)."""
+
+    doc_id: str
+    canonical: Dict[str, Any]
+    entries: List[IndexedProvision]
+    positions: Dict[str, int]
+
+    @classmethod
+    def load(cls, canonical_path: Path, provisions_path: Path) -> "Side":
+        doc_id, provisions = load_provisions(provisions_path)
+        canonical = json.loads(canonical_path.read_text())
+        entries = [IndexedProvision.from_provision(p) for p in provisions]
+        positions = {e.prov.get("provision_id"): pos for pos, e in enumerate(entries)}
+        return cls(canonical.get("doc_id") or doc_id, canonical, entries, positions)
+
+    def node(self, path: Tuple[str, ...]) -> Any:
+        node: Any = self.canonical.get("plan") or {}
+        for part in path:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+
+def lexical_vectors(entries: List[IndexedProvision], idf: Dict[str, float], vocab: Dict[str, int]) -> Any:
+    """Sublinear-TF x IDF term vectors over a shared vocabulary (dense ndarray with NumPy, sparse dicts otherwise)."""
+    if np is not None:
+        mat = np.zeros((len(entries), len(vocab)), dtype=np.float32)
+        for row, entry in enumerate(entries):
+            if entry.token_counts:
+                cols = [vocab[t] for t in entry.token_counts]
+                mat[row, cols] = [(1.0 + math.log(c)) * idf[t] for t, c in entry.token_counts.items()]
+        return mat
+    return [{t: (1.0 + math.log(c)) * idf[t] for t, c in entry.token_counts.items()} for entry in entries]
+
+
+def _sparse_cosine(source: List[Dict[str, float]], target: List[Dict[str, float]]) -> List[List[float]]:
+    def unit(vec: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    source, target = [unit(v) for v in source], [unit(v) for v in target]
+    return [[sum(v * t.get(term, 0.0) for term, v in s.items()) for t in target] for s in source]
+
+
+def pair_similarity(source: Side, target: Side) -> Tuple[Any, str]:
+    """Source x target provision similarity matrix and the scorer's id."""
+    if extract_canonical.EMB_BACKEND != "none":
+        combined = ProvisionIndex.from_entries(source.entries + target.entries)
+        embedder = make_embedder(combined)
+        if embedder:
+            vectors = normalize_rows(embedder.embed([clean_for_embedding(e.blob) for e in combined]))
+            split = len(source.entries)
+            return similarity_matrix(vectors[:split], vectors[split:]), embedder.model_id
+    # IDF over both plans, so terms common to either vendor's boilerplate weigh little.
+    entries = source.entries + target.entries
+    df: Counter = Counter()
+    for entry in entries:
+        df.update(entry.token_counts.keys())
+    n = len(entries)
+    idf = {t: math.log((1.0 + n) / (1.0 + d)) + 1.0 for t, d in df.items()}
+    vocab = {t: i for i, t in enumerate(df)}
+    src, tgt = lexical_vectors(source.entries, idf, vocab), lexical_vectors(target.entries, idf, vocab)
+    if np is None:
+        return _sparse_cosine(src, tgt), "lexical-tfidf"
+    return similarity_matrix(normalize_rows(src), normalize_rows(tgt)), "lexical-tfidf"
+
+
+def field_splits(node: Any) -> Dict[Optional[str], Dict[str, Any]]:
+    """Per-contribution-type sub-nodes, or {None: node} for unsplit nodes; {} when the node is empty."""
+    if not isinstance(node, dict) or not node:
+        return {}
+    split = {src: node[src] for src in CONTRIBUTION_SOURCES if isinstance(node.get(src), dict) and node[src]}
+    return split or ({None: node} if "provenance" in node else {})
+
+
+def typed_values(node: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {k: v for k, v in (node or {}).items() if k != "provenance" and v is not None}
+
+
+class PlanMapper:
+    def __init__(self, source: Side, target: Side, sims: Any, args: argparse.Namespace):
+        self.source = source
+        self.target = target
+        self.sims = sims
+        self.args = args
+
+    def _aligned(self, row: Any, anchor: Optional[int]) -> List[Tuple[int, float]]:
+        """Target positions aligned with one source provision, best first (one-to-many)."""
+        args = self.args
+        ranked = top_k_indices(row, args.max_targets)
+        if not ranked:
+            return []
+        floor = max(args.fuzzy_threshold, float(row[ranked[0]]) - args.margin)
+        aligned = [(pos, float(row[pos])) for pos in ranked if float(row[pos]) >= floor]
+        if anchor is not None and float(row[anchor]) >= args.fuzzy_threshold and all(p != anchor for p, _ in aligned):
+            aligned.append((anchor, float(row[anchor])))
+        return aligned
+
+    def _target_ref(self, pos: int, sim: float) -> Dict[str, Any]:
+        return {**provenance_from(self.target.entries[pos]), "similarity": round(sim, 4)}
+
+    def map_node(self, field: str, ctype: Optional[str], src_node: Optional[Dict], tgt_node: Optional[Dict]) -> Dict[str, Any]:
+        args = self.args
+        record: Dict[str, Any] = {
+            "field": field,
+            "contribution_type": ctype,
+            "source": {"value": typed_values(src_node), "provenance": (src_node or {}).get("provenance")},
+            "target": {"value": typed_values(tgt_node), "provenance": (tgt_node or {}).get("provenance"), "aligned": []},
+            "notes": [],
+        }
+        if src_node is None:
+            record.update({"category": "Gap", "confidence": 0.5, "similarity": None})
+            record["notes"].append("not extracted from source")
+            return record
+
+        src_pos = self.source.positions.get((src_node.get("provenance") or {}).get("provision_id"))
+        tgt_anchor = self.target.positions.get(((tgt_node or {}).get("provenance") or {}).get("provision_id"))
+        if src_pos is None:
+            record.update({"category": "Gap", "confidence": 0.5, "similarity": None})
+            record["notes"].append("source provision not found in source provisions")
+            return record
+
+        row = self.sims[src_pos]
+        aligned = self._aligned(row, tgt_anchor)
+        record["target"]["aligned"] = [self._target_ref(pos, sim) for pos, sim in aligned]
+        if not aligned:
+            best = max((float(v) for v in row), default=0.0)
+            record.update({"category": "Gap", "confidence": round(1.0 - max(best, 0.0), 3), "similarity": round(best, 4)})
+            record["notes"].append("no target provision above the fuzzy threshold")
+            return record
+
+        # Prefer the target draft's own provision for this node when it aligns.
+        primary = next(((p, s) for p, s in aligned if p == tgt_anchor), aligned[0])
+        sim = primary[1]
+        src_vals, tgt_vals = record["source"]["value"], record["target"]["value"]
+        if src_vals and tgt_vals:
+            diffs = [f"{k}: {src_vals.get(k)} vs {tgt_vals.get(k)}" for k in sorted(set(src_vals) | set(tgt_vals)) if src_vals.get(k) != tgt_vals.get(k)]
+            if diffs:
+                category, confidence = "Fuzzy", sim
+                record["notes"].append("values differ (" + "; ".join(diffs) + ")")
+            else:
+                category = "Exact" if sim >= args.close_threshold else "Close"
+                confidence = (1.0 + sim) / 2
+        else:
+            category = "Exact" if sim >= args.exact_threshold else "Close" if sim >= args.close_threshold else "Fuzzy"
+            confidence = sim
+        if tgt_node is None:
+            confidence *= 0.8
+            record["notes"].append("not extracted from target; aligned by text similarity")
+        elif primary[0] != tgt_anchor:
+            confidence *= 0.8
+            record["notes"].append("target draft cites a different provision")
+        if len(aligned) > 1:
+            record["notes"].append(f"one-to-many: {len(aligned)} target provisions")
+        record.update({"category": category, "confidence": round(min(max(confidence, 0.0), 1.0), 3), "similarity": round(sim, 4)})
+        return record
+
+    def map_all(self) -> List[Dict[str, Any]]:
+        records = []
+        for spec in FIELD_SPECS:
+            src_split = field_splits(self.source.node(spec.plan_path))
+            tgt_split = field_splits(self.target.node(spec.plan_path))
+            # An unsplit node on one side stands in for every contribution type on the other.
+            types = list(dict.fromkeys(list(src_split) + list(tgt_split)))
+            if len(types) > 1 and None in types:
+                types.remove(None)
+            for ctype in types or [None]:
+                src_node = src_split.get(ctype) or src_split.get(None)
+                tgt_node = tgt_split.get(ctype) or tgt_split.get(None)
+                records.append(self.map_node(spec.field, ctype, src_node, tgt_node))
+        return records
+
+
+def map_pair(source: Side, target: Side, args: argparse.Namespace) -> Dict[str, Any]:
+    start = time.perf_counter()
+    sims, scorer = pair_similarity(source, target)
+    nodes = PlanMapper(source, target, sims, args).map_all()
+    return {
+        "source": source.doc_id,
+        "target": target.doc_id,
+        "scorer": scorer,
+        "thresholds": {
+            "exact": args.exact_threshold,
+            "close": args.close_threshold,
+            "fuzzy": args.fuzzy_threshold,
+            "margin": args.margin,
+            "max_targets": args.max_targets,
+        },
+        "summary": {category: sum(1 for n in nodes if n["category"] == category) for category in CATEGORIES},
+        "nodes": nodes,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def _pages(prov: Optional[Dict[str, Any]]) -> str:
+    pr = (prov or {}).get("page_range") or []
+    return "-".join(str(p) for p in dict.fromkeys(pr)) if pr else ""
+
+
+def write_csv(path: Path, mapping: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(
+            ["field", "contribution_type", "category", "confidence", "similarity", "source_provision", "source_title",
+             "source_pages", "target_provisions", "target_title", "target_pages", "notes"]
+        )
+        for node in mapping["nodes"]:
+            src = node["source"]["provenance"] or {}
+            aligned = node["target"]["aligned"]
+            tgt = node["target"]["provenance"] or (aligned[0] if aligned else {})
+            writer.writerow(
+                [node["field"], node["contribution_type"] or "", node["category"], node["confidence"], node["similarity"],
+                 src.get("provision_id") or "", src.get("title") or "", _pages(src),
+                 "; ".join(a["provision_id"] or "" for a in aligned), tgt.get("title") or "", _pages(tgt),
+                 "; ".join(node["notes"])]
+            )
+
+
+def main():
+    args = parse_args()
+    if args.pairs:
+        pairs = json.loads(Path(args.pairs).read_text())
+    elif all([args.source_canonical, args.source_provisions, args.target_canonical, args.target_provisions, args.out]):
+        pairs = [
+            {
+                "source_canonical": args.source_canonical,
+                "source_provisions": args.source_provisions,
+                "target_canonical": args.target_canonical,
+                "target_provisions": args.target_provisions,
+                "out": args.out,
+                "csv": args.csv,
+            }
+        ]
+    else:
+        sys.stderr.write("Provide --pairs, or all of --source-canonical/--source-provisions/--target-canonical/--target-provisions/--out.\n")
+        sys.exit(1)
+    configure_embeddings(args)
+    for pair in pairs:
+        source = Side.load(Path(pair["source_canonical"]), Path(pair["source_provisions"]))
+        target = Side.load(Path(pair["target_canonical"]), Path(pair["target_provisions"]))
+        mapping = map_pair(source, target, args)
+        out_path = Path(pair["out"])
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(mapping, indent=2))
+        if pair.get("csv"):
+            write_csv(Path(pair["csv"]), mapping)
+        summary = ", ".join(f"{c}={n}" for c, n in mapping["summary"].items())
+        print(f"{source.doc_id} -> {target.doc_id}: {summary} ({mapping['seconds']}s, {mapping['scorer']}); wrote {out_path}")
+    finish_embeddings()
+
+
+if __name__ == "__main__":
+    main()
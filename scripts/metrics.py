@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Opt-in pipeline instrumentation: named timers and counters recorded by the
+stages (service poll vs normalization, segmentation, index build, embedding,
+each canonical extractor), written as one metrics JSON per run/document, plus
+an optional cProfile or pyinstrument dump.
+
+Instrumentation is off unless a driver enables it (--metrics / --profile), and
+the module-level helpers are no-ops while disabled, so stage code can call
+timer()/incr() unconditionally.
+
+Metrics JSON:
+  {"doc_id": ..., "recorded_at": ..., "python": ..., "stage_versions": {...},
+   "timers": {"canonical.extract.eligibility.age": {"seconds": 0.0012, "calls": 1}, ...},
+   "counts": {"segment.provisions": 412, "embedding.cache_hits": 398, ...},
+   "rates": {"embedding.cache_hit_rate": 0.97, "layout.cache_hit_rate": 1.0}}
+"""
+
+import argparse
+import json
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import pyinstrument  # type: ignore
+except Exception:  # pragma: no cover - optional, only for --profile pyinstrument
+    pyinstrument = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Hit/miss counter pairs reported as rates.
+RATES = {
+    "embedding.cache_hit_rate": ("embedding.cache_hits", "embedding.cache_misses"),
+    "layout.cache_hit_rate": ("layout.cache_hits", "layout.cache_misses"),
+}
+
+
+class Metrics:
+    """Timers (total seconds + calls) and counters for one document or run; thread-safe for chunked layout."""
+
+    def __init__(self, doc_id: Optional[str] = None):
+        self.doc_id = doc_id
+        self.timers: Dict[str, Dict[str, float]] = {}
+        self.counts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.timers.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def incr(self, name: str, n: float = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        from manifest import STAGE_SOURCES, stage_version
+
+        rates = {}
+        for rate, (hit_key, miss_key) in RATES.items():
+            hits, misses = self.counts.get(hit_key, 0), self.counts.get(miss_key, 0)
+            if hits + misses:
+                rates[rate] = round(hits / (hits + misses), 4)
+        return {
+            "doc_id": self.doc_id,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "stage_versions": {stage: stage_version(stage) for stage in STAGE_SOURCES},
+            "timers": {
+                name: {"seconds": round(entry["seconds"], 6), "calls": entry["calls"]}
+                for name, entry in sorted(self.timers.items())
+            },
+            "counts": dict(sorted(self.counts.items())),
+            "rates": rates,
+        }
+
+
+_ACTIVE: Optional[Metrics] = None
+
+
+def enabled() -> bool:
+    return _ACTIVE is not None
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    metrics = _ACTIVE
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - start)
+
+
+def incr(name: str, n: float = 1):
+    if _ACTIVE is not None:
+        _ACTIVE.incr(name, n)
+
+
+def add_metrics_args(parser: argparse.ArgumentParser, per_document: bool = False):
+    """Instrumentation flags; per_document drivers take a metrics directory instead of one file."""
+    if per_document:
+        parser.add_argument("--metrics-dir", help="Write <doc_id>.metrics.json per document here.")
+    else:
+        parser.add_argument("--metrics", help="Write per-stage timers/counters (JSON) here.")
+    parser.add_argument("--profile", choices=PROFILERS, help="Profile each document (pyinstrument falls back to cProfile if missing).")
+    parser.add_argument("--profile-dir", default="tmp/profiles", help="Profile output directory (<doc_id>.prof/.html).")
+
+
+class Profiler:
+    """cProfile (.prof, open with pstats/snakeviz) or pyinstrument (.html) around one document."""
+
+    def __init__(self, kind: str):
+        if kind == "pyinstrument" and pyinstrument is None:
+            print("WARNING: pyinstrument package not available; profiling with cProfile instead.")
+            kind = "cprofile"
+        self.kind = kind
+        if kind == "cprofile":
+            import cProfile
+
+            self.profiler: Any = cProfile.Profile()
+        else:
+            self.profiler = pyinstrument.Profiler()
+
+    def start(self):
+        if self.kind == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self, out_dir: Path, name: str) -> Path:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            path = out_dir / f"{name}.prof"
+            self.profiler.dump_stats(str(path))
+        else:
+            self.profiler.stop()
+            path = out_dir / f"{name}.html"
+            path.write_text(self.profiler.output_html())
+        return path
+
+
+@contextmanager
+def instrument(
+    doc_id: Optional[str],
+    metrics_path: Optional[Path] = None,
+    profile: Optional[str] = None,
+    profile_dir: Optional[Path] = None,
+) -> Iterator[Optional[Metrics]]:
+    """Enable metrics (and the profiler) for one document; writes the outputs on exit, even if the stage fails."""
+    global _ACTIVE
+    if not metrics_path and not profile:
+        yield None
+        return
+    metrics = Metrics(doc_id)
+    profiler = Profiler(profile) if profile else None
+    previous, _ACTIVE = _ACTIVE, metrics
+    if profiler:
+        profiler.start()
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_time("total", time.perf_counter() - start)
+        if profiler:
+            profiler.stop(Path(profile_dir or "tmp/profiles"), metrics.doc_id or "run")
+        _ACTIVE = previous
+        if metrics_path:
+            write_metrics(metrics_path, metrics)
+
+
+def write_metrics(path: Path, metrics: Metrics):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(metrics.to_dict(), indent=2))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern substring matcher: which of a fixed set of literal patterns occur
+in a text, found in one pass instead of one `pattern in text` scan per pattern.
+
+Uses an Aho-Corasick automaton from `pyahocorasick` when installed. Without it,
+all patterns are compiled into one regex of the form (?=(p1|p2|...)), tried at
+every position (longest alternative first); patterns that are prefixes of a
+match at the same position are added from a precomputed table, so overlapping
+and nested occurrences are all reported.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List
+
+try:
+    import ahocorasick  # type: ignore
+except Exception:  # pragma: no cover - optional, the regex path gives the same results
+    ahocorasick = None
+
+
+class PatternMatcher:
+    """Compiled once per pattern set; find() returns the set of patterns present in a text."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = sorted({p for p in patterns if p}, key=lambda p: (-len(p), p))
+        self._automaton = None
+        self._regex = None
+        if not self.patterns:
+            return
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for pattern in self.patterns:
+                automaton.add_word(pattern, pattern)
+            automaton.make_automaton()
+            self._automaton = automaton
+            return
+        # Longest first, so the alternative that matches at a position is the longest one starting there.
+        self._regex = re.compile("(?=(" + "|".join(re.escape(p) for p in self.patterns) + "))")
+        self._prefixes: Dict[str, FrozenSet[str]] = {
+            p: frozenset(q for q in self.patterns if p.startswith(q)) for p in self.patterns
+        }
+
+    def find(self, text: str) -> FrozenSet[str]:
+        if self._automaton is not None:
+            return frozenset(pattern for _, pattern in self._automaton.iter(text))
+        if self._regex is None:
+            return frozenset()
+        found: set = set()
+        for match in self._regex.finditer(text):
+            found |= self._prefixes[match.group(1)]
+        return frozenset(found)
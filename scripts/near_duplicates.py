@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate provisions: word shingles + MinHash signatures + LSH banding.
+
+Vendor BPDs are reissued with small edits each restatement cycle and AA
+boilerplate repeats across plans, so most provisions have a near-identical twin
+somewhere in the corpus. Signatures estimate Jaccard similarity of the shingle
+sets; LSH buckets each signature by bands of rows, so candidate pairs come from
+shared buckets rather than an all-pairs comparison, and only candidates are
+verified against the threshold.
+
+Uses:
+- cluster: group near-identical provisions across a provisions directory; each
+  cluster names a representative whose canonical results/embeddings can be reused
+- diff: which provisions were unchanged, edited, added or removed between two
+  versions of the same vendor document
+- NearDuplicateStore: persistent LSH index next to the embedding cache, so
+  extract_canonical can reuse the embedding of a near-identical provision text
+  (--reuse-near-duplicates)
+
+Usage:
+  python scripts/near_duplicates.py cluster --provisions-dir tmp/provisions --out tmp/near_duplicates.json
+  python scripts/near_duplicates.py diff --old tmp/provisions/bpd_2020.json --new tmp/provisions/bpd_2024.json --out tmp/bpd_diff.json
+"""
+
+import argparse
+import difflib
+import json
+import random
+import re
+import sqlite3
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from embedding_cache import text_key
+from jsonl_io import iter_provisions
+from provision_index import text_blob
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# b bands of r rows put the LSH S-curve's midpoint near (1/b)**(1/r): 16x8 ~0.71 for clustering at 0.8,
+# 32x4 ~0.42 for version diffs at 0.5.
+BANDS = 16
+THRESHOLD = 0.8
+DIFF_BANDS = 32
+DIFF_THRESHOLD = 0.5
+SEED = 1
+# Prime just above 2**32: a*x + b stays below 2**64 for 32-bit shingles, so uint64 math never overflows.
+PRIME = 4294967311
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> Set[int]:
+    """32-bit hashes of the word k-grams of text (one shingle for texts shorter than k words)."""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) <= k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i : i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """NUM_PERM universal hash functions (a*x + b) mod PRIME; a signature keeps each function's minimum."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED, shingle_size: int = SHINGLE_SIZE):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = [rng.randrange(1, 1 << 32) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, 1 << 32) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> Optional[array]:
+        """uint64 signature (array('Q')), or None for texts without words."""
+        sh = shingles(text, self.shingle_size)
+        if not sh:
+            return None
+        if np is not None:
+            x = np.fromiter(sh, dtype=np.uint64, count=len(sh))[None, :]
+            return array("Q", ((self._a * x + self._b) % PRIME).min(axis=1).tobytes())
+        return array("Q", (min((a * x + b) % PRIME for x in sh) for a, b in zip(self.a, self.b)))
+
+
+def jaccard_estimate(a: Sequence[int], b: Sequence[int]) -> float:
+    if np is not None:
+        return float(np.mean(np.frombuffer(a, dtype=np.uint64) == np.frombuffer(b, dtype=np.uint64)))
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_keys(signature: array, bands: int = BANDS) -> List[bytes]:
+    rows = len(signature) // bands
+    raw = signature.tobytes()
+    width = rows * signature.itemsize
+    return [raw[i * width : (i + 1) * width] for i in range(bands)]
+
+
+class LSHIndex:
+    """In-memory banded LSH over MinHash signatures; keys are any hashable ids."""
+
+    def __init__(self, bands: int = BANDS):
+        self.bands = bands
+        self.signatures: Dict[Hashable, array] = {}
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+
+    def add(self, key: Hashable, signature: array):
+        self.signatures[key] = signature
+        for band, bucket in zip(self.buckets, band_keys(signature, self.bands)):
+            band.setdefault(bucket, []).append(key)
+
+    def candidates(self, signature: array) -> Set[Hashable]:
+        found: Set[Hashable] = set()
+        for band, bucket in zip(self.buckets, band_keys(signature, self.bands)):
+            found.update(band.get(bucket, ()))
+        return found
+
+    def query(self, signature: array, threshold: float = THRESHOLD) -> List[Tuple[Hashable, float]]:
+        """Verified near-duplicates of a signature, most similar first."""
+        scored = [(key, jaccard_estimate(signature, self.signatures[key])) for key in self.candidates(signature)]
+        return sorted((item for item in scored if item[1] >= threshold), key=lambda item: -item[1])
+
+
+def provision_text(prov: Dict[str, Any]) -> str:
+    return text_blob(prov)
+
+
+def cluster_provisions(
+    provisions: Iterable[Dict[str, Any]], hasher: MinHasher, threshold: float = THRESHOLD, bands: int = BANDS
+) -> List[Dict[str, Any]]:
+    """
+    Connected components of verified near-duplicate pairs; the first-seen
+    provision represents its cluster. Identical signatures are merged up front,
+    and within a bucket each signature is verified against one member per
+    cluster already present there, so large boilerplate buckets stay linear.
+    """
+    index = LSHIndex(bands)
+    by_id: Dict[str, Dict[str, Any]] = {}
+    groups: Dict[bytes, List[str]] = {}
+    for prov in provisions:
+        signature = hasher.signature(provision_text(prov))
+        if signature is None:
+            continue
+        key = prov.get("provision_id")
+        by_id[key] = prov
+        raw = signature.tobytes()
+        if raw not in groups:
+            groups[raw] = []
+            index.add(key, signature)
+        groups[raw].append(key)
+
+    order = {key: i for i, key in enumerate(index.signatures)}
+    parent: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        root = key
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while key != root:
+            parent[key], key = root, parent.get(key, key)
+        return root
+
+    def union(left: str, right: str):
+        # The earlier-indexed root wins, so the representative is the first occurrence.
+        a, b = sorted((find(left), find(right)), key=order.__getitem__)
+        if a != b:
+            parent[b] = a
+
+    for band in index.buckets:
+        for keys in band.values():
+            reps: List[str] = []  # one member per distinct cluster seen in this bucket
+            for key in keys:
+                root = find(key)
+                if any(find(rep) == root for rep in reps):
+                    continue
+                for rep in reps:
+                    if jaccard_estimate(index.signatures[key], index.signatures[rep]) >= threshold:
+                        union(rep, key)
+                        break
+                else:
+                    reps.append(key)
+
+    members: Dict[str, List[str]] = {}
+    for keys in groups.values():
+        members.setdefault(find(keys[0]), []).extend(keys)
+    clusters = []
+    for root, keys in members.items():
+        if len(keys) < 2:
+            continue
+        rep = by_id[root]
+        clusters.append(
+            {
+                "representative": root,
+                "title": rep.get("title"),
+                "documents": sorted({by_id[k].get("doc_id") for k in keys if by_id[k].get("doc_id")}),
+                "members": [
+                    {
+                        "provision_id": k,
+                        "doc_id": by_id[k].get("doc_id"),
+                        "title": by_id[k].get("title"),
+                        "page_range": by_id[k].get("page_range"),
+                    }
+                    for k in keys
+                ],
+            }
+        )
+    clusters.sort(key=lambda c: -len(c["members"]))
+    return clusters
+
+
+def word_edits(old: str, new: str, limit: int = 5) -> List[Dict[str, str]]:
+    """First few word-level replacements/insertions/deletions between two texts."""
+    a, b = old.split(), new.split()
+    edits = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if op == "equal":
+            continue
+        edits.append({"op": op, "old": " ".join(a[i1:i2]), "new": " ".join(b[j1:j2])})
+        if len(edits) >= limit:
+            break
+    return edits
+
+
+def diff_versions(
+    old: List[Dict[str, Any]],
+    new: List[Dict[str, Any]],
+    hasher: MinHasher,
+    threshold: float = DIFF_THRESHOLD,
+    bands: int = DIFF_BANDS,
+) -> Dict[str, Any]:
+    """
+    Pair provisions of two versions of one document: identical text first, then
+    LSH candidates verified at `threshold` and matched greedily (most similar
+    first, one-to-one), then leftovers with the same title (short provisions,
+    where one added sentence moves most shingles). Unpaired old provisions were
+    removed, unpaired new ones added.
+    """
+    old_by_text: Dict[str, List[int]] = {}
+    for i, prov in enumerate(old):
+        old_by_text.setdefault(text_key(provision_text(prov)), []).append(i)
+    unchanged: List[Tuple[int, int]] = []
+    matched_old: Set[int] = set()
+    pending_new: List[int] = []
+    for j, prov in enumerate(new):
+        same = old_by_text.get(text_key(provision_text(prov)))
+        if same:
+            i = same.pop(0)
+            unchanged.append((i, j))
+            matched_old.add(i)
+        else:
+            pending_new.append(j)
+
+    index = LSHIndex(bands)
+    for i, prov in enumerate(old):
+        if i in matched_old:
+            continue
+        signature = hasher.signature(provision_text(prov))
+        if signature is not None:
+            index.add(i, signature)
+    scored: List[Tuple[int, float, int, int]] = []  # (tier, similarity, old, new); tier 1 = title fallback
+    signatures: Dict[int, array] = {}
+    for j in pending_new:
+        signature = hasher.signature(provision_text(new[j]))
+        if signature is None:
+            continue
+        signatures[j] = signature
+        scored.extend((0, score, i, j) for i, score in index.query(signature, threshold))
+    old_by_title: Dict[str, List[int]] = {}
+    for i, prov in enumerate(old):
+        old_by_title.setdefault((prov.get("title") or "").strip().lower(), []).append(i)
+    for j in pending_new:
+        title = (new[j].get("title") or "").strip().lower()
+        for i in old_by_title.get(title, []) if title else []:
+            if i not in matched_old and i in index.signatures and j in signatures:
+                scored.append((1, jaccard_estimate(index.signatures[i], signatures[j]), i, j))
+    changed = []
+    matched_new: Set[int] = set()
+    for _, score, i, j in sorted(scored, key=lambda item: (item[0], -item[1], item[2], item[3])):
+        if i in matched_old or j in matched_new:
+            continue
+        matched_old.add(i)
+        matched_new.add(j)
+        changed.append(
+            {
+                "old": old[i].get("provision_id"),
+                "new": new[j].get("provision_id"),
+                "title": new[j].get("title"),
+                "similarity": round(score, 4),
+                "edits": word_edits(provision_text(old[i]), provision_text(new[j])),
+            }
+        )
+
+    def ref(prov: Dict[str, Any]) -> Dict[str, Any]:
+        return {"provision_id": prov.get("provision_id"), "title": prov.get("title")}
+
+    added = [ref(new[j]) for j in pending_new if j not in matched_new]
+    removed = [ref(old[i]) for i in range(len(old)) if i not in matched_old]
+    return {
+        "summary": {"unchanged": len(unchanged), "changed": len(changed), "added": len(added), "removed": len(removed)},
+        "unchanged": [{"old": old[i].get("provision_id"), "new": new[j].get("provision_id")} for i, j in unchanged],
+        "changed": changed,
+        "added": added,
+        "removed": removed,
+    }
+
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    text_hash TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS minhash_buckets (
+    band INTEGER NOT NULL,
+    bucket BLOB NOT NULL,
+    text_hash TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, text_hash)
+) WITHOUT ROWID;
+"""
+
+
+class NearDuplicateStore:
+    """
+    Persistent LSH index over embedded texts, keyed by the embedding cache's text
+    hash; lives in the embedding cache's SQLite file (tables minhash_*).
+    """
+
+    def __init__(self, path: Path, threshold: float = 0.9, hasher: Optional[MinHasher] = None, bands: int = BANDS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self.bands = bands
+        self.conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.conn.executescript(STORE_SCHEMA)
+
+    def lookup(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """Text hash of the most similar stored text at or above the threshold, per text (None if none)."""
+        found: List[Optional[str]] = []
+        for text in texts:
+            signature = self.hasher.signature(text)
+            if signature is None:
+                found.append(None)
+                continue
+            candidates: Set[str] = set()
+            for band, bucket in enumerate(band_keys(signature, self.bands)):
+                rows = self.conn.execute(
+                    "SELECT text_hash FROM minhash_buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+            candidates.discard(text_key(text))
+            best, best_score = None, self.threshold
+            for text_hash in sorted(candidates):
+                row = self.conn.execute("SELECT signature FROM minhash_signatures WHERE text_hash = ?", (text_hash,)).fetchone()
+                if row is None:
+                    continue
+                score = jaccard_estimate(signature, array("Q", row[0]))
+                if score >= best_score:
+                    best, best_score = text_hash, score
+            found.append(best)
+        return found
+
+    def add(self, texts: Iterable[str]):
+        with self.conn:
+            for text in texts:
+                signature = self.hasher.signature(text)
+                if signature is None:
+                    continue
+                text_hash = text_key(text)
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO minhash_signatures (text_hash, signature) VALUES (?, ?)",
+                    (text_hash, signature.tobytes()),
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO minhash_buckets (band, bucket, text_hash) VALUES (?, ?, ?)",
+                    [(band, bucket, text_hash) for band, bucket in enumerate(band_keys(signature, self.bands))],
+                )
+
+    def close(self):
+        self.conn.close()
+
+
+def load_provisions(path: Path) -> Tuple[str, List[Dict[str, Any]]]:
+    """doc_id and provisions of a provisions file (same doc_id fallback as extract_canonical)."""
+    header, records = iter_provisions(path)
+    provisions = list(records)
+    doc_id = provisions[0].get("doc_id") if provisions else header.get("source_layout", path.stem)
+    return doc_id or path.stem, provisions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MinHash/LSH near-duplicate provisions across documents and versions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p: argparse.ArgumentParser, threshold: float, bands: int):
+        p.add_argument("--threshold", type=float, default=threshold, help="Minimum estimated Jaccard similarity.")
+        p.add_argument("--shingle-size", type=int, default=SHINGLE_SIZE, help="Words per shingle.")
+        p.add_argument("--num-perm", type=int, default=NUM_PERM, help="MinHash functions per signature.")
+        p.add_argument("--bands", type=int, default=bands, help="LSH bands (num-perm must divide evenly).")
+        p.add_argument("--out", required=True, help="JSON report path.")
+
+    cluster = sub.add_parser("cluster", help="Cluster near-identical provisions across a provisions directory.")
+    cluster.add_argument("--provisions-dir", required=True, help="Directory of provisions JSON/JSONL files.")
+    add_common(cluster, THRESHOLD, BANDS)
+
+    diff = sub.add_parser("diff", help="Changed/added/removed provisions between two versions of a document.")
+    diff.add_argument("--old", required=True, help="Provisions of the earlier version.")
+    diff.add_argument("--new", required=True, help="Provisions of the later version.")
+    add_common(diff, DIFF_THRESHOLD, DIFF_BANDS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.num_perm % args.bands:
+        sys.stderr.write("--num-perm must be a multiple of --bands.\n")
+        sys.exit(1)
+    hasher = MinHasher(args.num_perm, shingle_size=args.shingle_size)
+    if args.command == "cluster":
+        paths = sorted(p for p in Path(args.provisions_dir).iterdir() if p.suffix in (".json", ".jsonl") and not p.name.startswith("_"))
+        provisions = (prov for path in paths for prov in load_provisions(path)[1])
+        clusters = cluster_provisions(provisions, hasher, args.threshold, args.bands)
+        report: Dict[str, Any] = {
+            "documents": len(paths),
+            "clusters": len(clusters),
+            "clustered_provisions": sum(len(c["members"]) for c in clusters),
+            "threshold": args.threshold,
+            "items": clusters,
+        }
+        message = f"{report['clusters']} clusters covering {report['clustered_provisions']} provisions across {len(paths)} documents"
+    else:
+        old_doc, old = load_provisions(Path(args.old))
+        new_doc, new = load_provisions(Path(args.new))
+        report = {"old": old_doc, "new": new_doc, "threshold": args.threshold}
+        report.update(diff_versions(old, new, hasher, args.threshold, args.bands))
+        message = ", ".join(f"{k}={v}" for k, v in report["summary"].items())
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"{message}; wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
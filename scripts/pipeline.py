@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Single-process driver: layout -> segmentation -> canonical, handing each stage's
+output to the next in memory instead of serializing/re-parsing JSON between
+separate script invocations. Intermediate artifacts are written only when asked.
+
+Usage:
+  python scripts/pipeline.py --input test_data/.../plan.pdf --out tmp/canonical/plan.json
+  python scripts/pipeline.py --layout tmp/layout/plan.json --out tmp/canonical/plan.json --provisions-out tmp/provisions/plan.json
+  python scripts/pipeline.py --input big.pdf --local-standin --out tmp/canonical/big.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from extract_canonical import add_embedding_args, build_canonical, configure_embeddings, finish_embeddings
+from extract_layout import add_service_args, analyze_document, create_client
+from interval_index import ATTACH_MODES
+from jsonl_io import load_layout, write_layout, write_provisions
+from metrics import add_metrics_args, instrument
+from segment_provisions import segment
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run layout, segmentation and canonical extraction in one process.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="PDF to analyze (runs the layout stage).")
+    source.add_argument("--layout", help="Existing normalized layout JSON (skips the layout stage).")
+    parser.add_argument("--doc-id", help="Document ID (defaults to the layout document_id or input stem).")
+    parser.add_argument("--out", required=True, help="Output path for the canonical JSON.")
+    parser.add_argument("--layout-out", help="Also write the normalized layout JSON here.")
+    parser.add_argument("--provisions-out", help="Also write the provision JSON here.")
+    parser.add_argument("--timings", help="Write per-stage wall times (JSON) here.")
+    parser.add_argument("--redact-text", action="store_true", help="Redact text content in the layout stage.")
+    parser.add_argument("--toc-pages", type=int, default=3, help="Initial pages treated as TOC by segmentation.")
+    parser.add_argument("--table-attach", choices=ATTACH_MODES, default="first", help="Segmentation table attach mode.")
+    add_service_args(parser)
+    add_embedding_args(parser)
+    add_metrics_args(parser)
+    return parser.parse_args()
+
+
+def write_json(path: Path, payload: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2))
+
+
+def main():
+    args = parse_args()
+    timings: Dict[str, float] = {}
+    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    if args.from_cache and not cache_dir:
+        sys.stderr.write("--from-cache cannot be combined with --no-cache.\n")
+        sys.exit(1)
+
+    metrics_path = Path(args.metrics) if args.metrics else None
+    with instrument(args.doc_id, metrics_path, args.profile, Path(args.profile_dir)) as metrics:
+        start = time.perf_counter()
+        if args.input:
+            pdf_path = Path(args.input)
+            if not pdf_path.exists():
+                sys.stderr.write(f"Input file not found: {pdf_path}\n")
+                sys.exit(1)
+            client = create_client(args)
+            layout = analyze_document(
+                client,
+                pdf_path,
+                args.doc_id or pdf_path.stem,
+                args.endpoint,
+                args.key,
+                redact=args.redact_text,
+                cache_dir=cache_dir,
+                cache_only=args.from_cache,
+                chunk_pages=args.chunk_pages,
+                chunk_concurrency=args.chunk_concurrency,
+            )
+            layout_name = Path(args.layout_out).name if args.layout_out else f"{pdf_path.stem}.json"
+        else:
+            layout_path = Path(args.layout)
+            layout = load_layout(layout_path)
+            layout_name = layout_path.name
+        timings["layout"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        provisions = segment(layout, toc_pages=args.toc_pages, table_attach=args.table_attach)
+        # Same resolution as extract_canonical.load_provisions, so both paths label drafts alike.
+        doc_id = args.doc_id or (provisions[0].get("doc_id") if provisions else None) or Path(layout_name).stem
+        timings["segment"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        configure_embeddings(args)
+        canonical = build_canonical(doc_id, provisions)
+        timings["canonical"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if args.layout_out and args.input:
+            write_layout(Path(args.layout_out), layout)
+        if args.provisions_out:
+            write_provisions(Path(args.provisions_out), provisions, layout_name)
+        out_path = Path(args.out)
+        write_json(out_path, canonical)
+        timings["write"] = time.perf_counter() - start
+        if metrics:
+            metrics.doc_id = doc_id
+            for stage, secs in timings.items():
+                metrics.add_time(f"stage.{stage}", secs)
+
+    print(f"Wrote canonical draft for {doc_id} ({len(provisions)} provisions) to {out_path}")
+    print("Report:", canonical.get("report"))
+    print("Timings:", ", ".join(f"{stage}={secs:.2f}s" for stage, secs in timings.items()))
+    if args.timings:
+        write_json(Path(args.timings), {stage: round(secs, 4) for stage, secs in timings.items()})
+    finish_embeddings()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Per-provision text index shared by the canonical extractors.
+
+Each provision's title, block text and table-cell text is joined and normalized
+once per run; extractors then query the index (BM25 search, token counts,
+numeric tokens) instead of rebuilding the text blob per field.
+
+Candidate retrieval uses an inverted index with BM25 scoring over two fields
+(title, body+tables). Title matches are boosted rather than used as a hard
+filter, and queries only touch the postings of their own terms.
+
+Inputs:
+- Provision dicts from scripts/segment_provisions.py
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+NUMBER_RE = re.compile(r"\b(\d{1,3})\b")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_BOOST = 2.0
+
+
+def normalize_term(token: str) -> str:
+    """Minimal plural folding so "loans"/"loan" and "hours"/"hour" share postings."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    return [normalize_term(tok) for tok in TOKEN_RE.findall(text.lower())]
+
+
+def query_terms(phrases: Iterable[str]) -> List[str]:
+    """Distinct analyzed terms of a keyword list, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for phrase in phrases:
+        for term in analyze(phrase):
+            seen.setdefault(term, None)
+    return list(seen)
+
+
+def text_blob(prov: Dict[str, Any]) -> str:
+    parts = [prov.get("title") or ""]
+    for blk in prov.get("blocks", []):
+        parts.append(blk.get("text") or "")
+    for tbl in prov.get("tables", []):
+        for row in tbl.get("rows", []):
+            for cell in row.get("cells", []):
+                parts.append(cell.get("text") or "")
+    return " ".join(parts).lower()
+
+
+@dataclass
+class IndexedProvision:
+    """Normalized text views of one provision, built once and reused by every extractor."""
+
+    prov: Dict[str, Any]
+    title: str
+    body: str
+    table_text: str
+    blob: str
+    title_terms: Counter
+    body_terms: Counter
+    token_counts: Counter
+    token_total: int
+    numbers: List[int]
+
+    @classmethod
+    def from_provision(cls, prov: Dict[str, Any]) -> "IndexedProvision":
+        title = (prov.get("title") or "").lower()
+        body_parts = [(blk.get("text") or "") for blk in prov.get("blocks", [])]
+        table_parts = [
+            (cell.get("text") or "")
+            for tbl in prov.get("tables", [])
+            for row in tbl.get("rows", [])
+            for cell in row.get("cells", [])
+        ]
+        # Same join as text_blob() so substring matches behave identically.
+        blob = " ".join([prov.get("title") or ""] + body_parts + table_parts).lower()
+        body = " ".join(body_parts).lower()
+        table_text = " ".join(table_parts).lower()
+        title_terms = Counter(analyze(title))
+        body_terms = Counter(analyze(body)) + Counter(analyze(table_text))
+        token_counts = title_terms + body_terms
+        return cls(
+            prov=prov,
+            title=title,
+            body=body,
+            table_text=table_text,
+            blob=blob,
+            title_terms=title_terms,
+            body_terms=body_terms,
+            token_counts=token_counts,
+            token_total=sum(token_counts.values()),
+            numbers=[int(m.group(1)) for m in NUMBER_RE.finditer(blob)],
+        )
+
+    def first_int_in_range(self, min_val: int, max_val: int) -> Optional[int]:
+        for val in self.numbers:
+            if min_val <= val <= max_val:
+                return val
+        return None
+
+
+def bm25_idf(n: int, df: int) -> float:
+    return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+
+class BM25Index:
+    """Inverted index over provision title and body fields with BM25 scoring."""
+
+    def __init__(self, entries: List[IndexedProvision], k1: float = BM25_K1, b: float = BM25_B):
+        self.entries = entries
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, List[Tuple[int, int]]]] = {"title": defaultdict(list), "body": defaultdict(list)}
+        self.lengths: Dict[str, List[int]] = {"title": [], "body": []}
+        doc_freq: Counter = Counter()
+        for idx, entry in enumerate(entries):
+            for fname, terms in (("title", entry.title_terms), ("body", entry.body_terms)):
+                self.lengths[fname].append(sum(terms.values()))
+                postings = self.postings[fname]
+                for term, tf in terms.items():
+                    postings[term].append((idx, tf))
+            doc_freq.update(entry.token_counts.keys())
+        n = len(entries)
+        self.doc_freq = doc_freq  # kept so stored indexes can be merged (MergedBM25Index)
+        self.total_length = {f: sum(lens) for f, lens in self.lengths.items()}
+        self.avg_length = {f: (total / n if n else 0.0) or 1.0 for f, total in self.total_length.items()}
+        self.idf = {t: bm25_idf(n, df) for t, df in doc_freq.items()}
+
+    def _accumulate(self, scores: Dict[int, float], fname: str, terms: List[str], weight: float):
+        postings = self.postings[fname]
+        lengths = self.lengths[fname]
+        avg = self.avg_length[fname]
+        k1, b = self.k1, self.b
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in postings.get(term, ()):
+                norm = k1 * (1.0 - b + b * lengths[idx] / avg)
+                scores[idx] = scores.get(idx, 0.0) + weight * idf * tf * (k1 + 1.0) / (tf + norm)
+
+    def search(
+        self,
+        terms: List[str],
+        title_terms: Optional[List[str]] = None,
+        top_k: int = 10,
+        title_boost: float = TITLE_BOOST,
+    ) -> List[Tuple[float, IndexedProvision]]:
+        """Top-K (score, entry) pairs; ties keep document order."""
+        scores: Dict[int, float] = {}
+        self._accumulate(scores, "body", terms, 1.0)
+        boosted = terms + [t for t in (title_terms or []) if t not in terms]
+        self._accumulate(scores, "title", boosted, title_boost)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.entries[idx]) for idx, score in best]
+
+
+class MergedBM25Index:
+    """
+    BM25 over several prebuilt indexes as if they were one (entries concatenated
+    in order), without re-indexing them: postings stay per segment, and corpus
+    statistics (N, document frequency, average field length) are combined per
+    query term. Scores and tie order equal a BM25Index over all the entries.
+    """
+
+    def __init__(self, segments: List[BM25Index]):
+        self.segments = segments
+        self.entries: List[IndexedProvision] = [entry for seg in segments for entry in seg.entries]
+        self.offsets: List[int] = []
+        offset = 0
+        for seg in segments:
+            self.offsets.append(offset)
+            offset += len(seg.entries)
+        n = len(self.entries)
+        self.n = n
+        self.k1, self.b = segments[0].k1, segments[0].b
+        self.avg_length = {
+            f: (sum(seg.total_length[f] for seg in segments) / n if n else 0.0) or 1.0 for f in ("title", "body")
+        }
+        self._idf: Dict[str, Optional[float]] = {}
+
+    def idf(self, term: str) -> Optional[float]:
+        if term not in self._idf:
+            df = sum(seg.doc_freq.get(term, 0) for seg in self.segments)
+            self._idf[term] = bm25_idf(self.n, df) if df else None
+        return self._idf[term]
+
+    def _accumulate(self, scores: Dict[int, float], fname: str, terms: List[str], weight: float):
+        avg = self.avg_length[fname]
+        k1, b = self.k1, self.b
+        for term in terms:
+            idf = self.idf(term)
+            if idf is None:
+                continue
+            for seg, offset in zip(self.segments, self.offsets):
+                lengths = seg.lengths[fname]
+                for idx, tf in seg.postings[fname].get(term, ()):
+                    norm = k1 * (1.0 - b + b * lengths[idx] / avg)
+                    key = offset + idx
+                    scores[key] = scores.get(key, 0.0) + weight * idf * tf * (k1 + 1.0) / (tf + norm)
+
+    search = BM25Index.search  # same top-K selection; only _accumulate differs
+
+
+class ProvisionIndex:
+    """Index over a document's provisions; build once per run and pass to every extractor."""
+
+    def __init__(self, provisions: Iterable[Dict[str, Any]]):
+        self.entries: List[IndexedProvision] = [IndexedProvision.from_provision(p) for p in provisions]
+        self.bm25 = BM25Index(self.entries)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[IndexedProvision]) -> "ProvisionIndex":
+        """Index over already-normalized entries (e.g. a cached shared BPD plus fresh AA entries)."""
+        index = cls(())
+        index.entries = list(entries)
+        index.bm25 = BM25Index(index.entries)
+        return index
+
+    @classmethod
+    def merged(cls, indexes: Iterable["ProvisionIndex"]) -> "ProvisionIndex":
+        """Indexes searched as one, in order (e.g. a plan's AA ahead of a stored BPD), reusing their postings."""
+        index = cls(())
+        index.bm25 = MergedBM25Index([part.bm25 for part in indexes])
+        index.entries = index.bm25.entries
+        return index
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[IndexedProvision]:
+        return iter(self.entries)
+
+    def search(
+        self,
+        keywords: Optional[List[str]],
+        title_keywords: Optional[List[str]] = None,
+        top_k: int = 10,
+    ) -> List[Tuple[float, IndexedProvision]]:
+        """BM25 retrieval: keyword terms score both fields, title keywords only boost titles."""
+        return self.bm25.search(query_terms(keywords or []), query_terms(title_keywords or []), top_k=top_k)
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Long-running local query service: loads every provisions file once, keeps its
+BM25 index, semantic ranker (with the on-disk embedding cache) and resolved
+canonical fields in memory, and answers ad hoc retrieval and canonical-field
+queries over HTTP (TCP on localhost, or a Unix socket) with provenance.
+
+Hot reload: a background thread polls the provisions directory (--poll-seconds)
+and rebuilds a document when its file's mtime/size changes, drops it when the
+file disappears and loads new files. The previous version keeps serving until
+its replacement is built. POST /reload forces a rescan.
+
+Endpoints (JSON responses):
+  GET  /health
+  GET  /documents
+  GET  /search?q=where+does+this+plan+define+compensation+exclusions&doc_id=plan1&k=5
+       (doc_id may be omitted only when every document shares one embedding model)
+  GET  /fields?doc_id=plan1[&field=compensation.exclusions]   # all fields when omitted
+  POST /reload[?doc_id=plan1]
+
+Usage:
+  python scripts/query_service.py --provisions-dir tmp/provisions --port 8765
+  python scripts/query_service.py --provisions-dir tmp/provisions --socket tmp/query.sock --embedding-backend openai
+  curl -s 'localhost:8765/search?q=compensation+exclusions&doc_id=plan1'
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from extract_canonical import (
+    FIELD_QUERIES,
+    FieldResolver,
+    SemanticRanker,
+    add_embedding_args,
+    build_canonical,
+    configure_embeddings,
+    finish_embeddings,
+    load_provisions,
+    make_embedder,
+    provenance_from,
+)
+from field_specs import FIELD_SPECS
+from provision_index import IndexedProvision, ProvisionIndex
+
+# Question words that carry no retrieval signal ("where does this plan define ...").
+STOPWORDS = {
+    "a", "an", "and", "are", "be", "can", "define", "defined", "defines", "do", "does", "how", "in", "is",
+    "of", "or", "the", "this", "that", "to", "what", "when", "where", "which", "who",
+}
+SNIPPET_CHARS = 240
+RERANK_CANDIDATES = 50
+EMBED_LOCK_CHUNK = 64  # texts embedded per hold of the shared embedding lock
+SPECS = {spec.field: spec for spec in FIELD_SPECS}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local HTTP query service over provision indexes (hot reload).")
+    parser.add_argument("--provisions-dir", required=True, help="Directory of provisions JSON/JSONL files (<doc_id>.json).")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for TCP.")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port.")
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of TCP.")
+    parser.add_argument("--poll-seconds", type=float, default=2.0, help="Artifact change polling interval (0 = only POST /reload).")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    add_embedding_args(parser)
+    return parser.parse_args()
+
+
+def question_terms(question: str) -> List[str]:
+    words = [w for w in re.findall(r"[A-Za-z0-9-]+", question.lower()) if w not in STOPWORDS]
+    return words or [question]
+
+
+def snippet(entry: IndexedProvision, terms: List[str]) -> str:
+    """Window of the provision body around the first query term (body start if none occurs)."""
+    text = " ".join(blk.get("text") or "" for blk in entry.prov.get("blocks", [])).strip()
+    lowered = text.lower()
+    hits = [pos for pos in (lowered.find(t.lower()) for t in terms) if pos >= 0]
+    start = max(min(hits) - SNIPPET_CHARS // 4, 0) if hits else 0
+    window = text[start : start + SNIPPET_CHARS]
+    return ("..." if start else "") + window + ("..." if start + SNIPPET_CHARS < len(text) else "")
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LockedEmbedder:
+    """
+    Holds the shared embedding lock only around backend/cache calls, one chunk of
+    texts at a time, so a document (re)loading hundreds of provisions does not
+    block query embeddings for searches on other documents.
+    """
+
+    def __init__(self, base: Any, lock: threading.Lock):
+        self.base = base
+        self.lock = lock
+        self.model_id = base.model_id
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), EMBED_LOCK_CHUNK):
+            with self.lock:
+                vectors.extend(self.base.embed(texts[start : start + EMBED_LOCK_CHUNK]))
+        return vectors
+
+
+class LoadedDocument:
+    """One provisions file, indexed (and embedded) once per version; canonical fields resolved lazily."""
+
+    def __init__(self, path: Path, embed_lock: threading.Lock):
+        start = time.perf_counter()
+        self.path = path
+        self.signature = file_signature(path)
+        self.doc_id, self.provisions = load_provisions(path)
+        self.index = ProvisionIndex(self.provisions)
+        self.lock = threading.Lock()  # this document's lazy field/canonical resolution
+        self.ranker: Optional[SemanticRanker] = None
+        self.model_id: Optional[str] = None  # embedding model; scores are comparable across documents sharing one
+        embedder = make_embedder(self.index) if len(self.index) else None
+        if embedder:
+            self.ranker = SemanticRanker(self.index, list(FIELD_QUERIES.values()), LockedEmbedder(embedder, embed_lock))
+            self.model_id = embedder.model_id
+        self.resolver = FieldResolver(self.index, self.ranker, FIELD_SPECS)
+        self._fields: Dict[str, Any] = {}
+        self._canonical: Optional[Dict[str, Any]] = None
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        self.load_seconds = round(time.perf_counter() - start, 4)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "doc_id": self.doc_id,
+            "path": str(self.path),
+            "provisions": len(self.index),
+            "semantic": self.ranker is not None,
+            "model_id": self.model_id,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+        }
+
+    def search(self, question: str, k: int) -> List[Dict[str, Any]]:
+        terms = question_terms(question)
+        candidates = self.index.search(terms, terms, top_k=max(k, RERANK_CANDIDATES) if self.ranker else k)
+        if self.ranker and candidates:
+            scored = [(self.ranker.similarity(question, entry), entry) for _, entry in candidates]
+            candidates = sorted(scored, key=lambda item: -item[0])
+        return [
+            {**provenance_from(entry), "score": round(float(score), 4), "snippet": snippet(entry, terms)}
+            for score, entry in candidates[:k]
+        ]
+
+    def field(self, name: str) -> Any:
+        if name not in self._fields:
+            spec = SPECS[name]
+            with self.lock:
+                if name not in self._fields:
+                    self._fields[name] = self.resolver.resolve(spec)
+        return self._fields[name]
+
+    def canonical(self) -> Dict[str, Any]:
+        if self._canonical is None:
+            with self.lock:
+                if self._canonical is None:
+                    self._canonical = build_canonical(
+                        self.doc_id, self.provisions, index=self.index, ranker=self.ranker
+                    )
+        return self._canonical
+
+
+class DocumentRegistry:
+    """Loaded documents keyed by doc_id; scan() picks up new, changed and removed provisions files."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.docs: Dict[str, LoadedDocument] = {}
+        self.paths: Dict[Path, str] = {}
+        self.lock = threading.Lock()  # guards docs/paths swaps; lookups read a consistent snapshot
+        self.scan_lock = threading.Lock()  # one scan at a time (poller vs POST /reload)
+        self.embed_lock = threading.Lock()  # embedding backend/SQLite cache calls only (see LockedEmbedder)
+        self.reloads = 0
+
+    def files(self) -> List[Path]:
+        return sorted(
+            p for p in self.root.iterdir() if p.suffix in (".json", ".jsonl") and not p.name.startswith("_") and p.is_file()
+        )
+
+    def scan(self, force_doc: Optional[str] = None) -> Dict[str, List[str]]:
+        """Load new/changed files (force_doc reloads that document even if unchanged); drop removed ones."""
+        changes: Dict[str, List[str]] = {"loaded": [], "reloaded": [], "removed": [], "failed": []}
+        with self.scan_lock:
+            current = self.files()
+            for path in current:
+                doc_id = self.paths.get(path)
+                doc = self.docs.get(doc_id) if doc_id else None
+                try:
+                    if doc and doc.signature == file_signature(path) and doc_id != force_doc:
+                        continue
+                    fresh = LoadedDocument(path, self.embed_lock)
+                except (OSError, ValueError, KeyError) as exc:
+                    # Half-written artifact or bad JSON: keep serving the previous version.
+                    changes["failed"].append(f"{path.name}: {exc}")
+                    continue
+                with self.lock:
+                    if doc_id and doc_id != fresh.doc_id:
+                        self.docs.pop(doc_id, None)
+                    self.docs[fresh.doc_id] = fresh
+                    self.paths[path] = fresh.doc_id
+                changes["reloaded" if doc else "loaded"].append(fresh.doc_id)
+            for path in set(self.paths) - set(current):
+                with self.lock:
+                    doc_id = self.paths.pop(path)
+                    self.docs.pop(doc_id, None)
+                changes["removed"].append(doc_id)
+            if changes["reloaded"] or changes["removed"]:
+                self.reloads += 1
+        for name, items in changes.items():
+            if items:
+                print(f"{name}: {', '.join(items)}", flush=True)
+        return changes
+
+    def get(self, doc_id: str) -> Optional[LoadedDocument]:
+        with self.lock:
+            return self.docs.get(doc_id)
+
+    def all(self) -> List[LoadedDocument]:
+        with self.lock:
+            return list(self.docs.values())
+
+    def poll(self, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                self.scan()
+            except Exception as exc:  # keep the poller alive; the next pass retries
+                print(f"WARNING: reload scan failed: {exc}", file=sys.stderr, flush=True)
+
+
+class QueryError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    registry: DocumentRegistry
+    verbose = False
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = (method, url.path.rstrip("/") or "/")
+        try:
+            handler = ROUTES.get(route)
+            if handler is None:
+                raise QueryError(404, f"no route {method} {url.path}")
+            payload = handler(self.registry, params)
+        except QueryError as exc:
+            self._send(exc.status, {"error": str(exc)})
+            return
+        except Exception as exc:
+            print(f"ERROR: {method} {self.path} failed:", file=sys.stderr, flush=True)
+            traceback.print_exc(file=sys.stderr)
+            self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        payload["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        self._send(200, payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+def _document(registry: DocumentRegistry, params: Dict[str, str]) -> LoadedDocument:
+    doc_id = params.get("doc_id")
+    if not doc_id:
+        raise QueryError(400, "doc_id is required")
+    doc = registry.get(doc_id)
+    if doc is None:
+        raise QueryError(404, f"unknown doc_id {doc_id!r}")
+    return doc
+
+
+def route_health(registry: DocumentRegistry, params: Dict[str, str]) -> Dict[str, Any]:
+    return {"status": "ok", "documents": len(registry.all()), "reloads": registry.reloads}
+
+
+def route_documents(registry: DocumentRegistry, params: Dict[str, str]) -> Dict[str, Any]:
+    return {"documents": [doc.summary() for doc in sorted(registry.all(), key=lambda d: d.doc_id)]}
+
+
+def route_search(registry: DocumentRegistry, params: Dict[str, str]) -> Dict[str, Any]:
+    question = (params.get("q") or "").strip()
+    if not question:
+        raise QueryError(400, "q is required")
+    try:
+        k = int(params.get("k", 5))
+    except ValueError:
+        raise QueryError(400, "k must be an integer")
+    docs = [_document(registry, params)] if params.get("doc_id") else registry.all()
+    # BM25 scores (and those of per-document local models) only rank within their own document.
+    models = {doc.model_id for doc in docs}
+    if len(docs) > 1 and (len(models) > 1 or None in models):
+        raise QueryError(400, "doc_id is required unless every document is ranked by one shared embedding model")
+    hits = [hit for doc in docs for hit in doc.search(question, k)]
+    hits.sort(key=lambda hit: -hit["score"])
+    return {"query": question, "results": hits[:k]}
+
+
+def route_fields(registry: DocumentRegistry, params: Dict[str, str]) -> Dict[str, Any]:
+    doc = _document(registry, params)
+    name = params.get("field")
+    if not name:
+        return doc.canonical()
+    if name not in SPECS:
+        raise QueryError(404, f"unknown field {name!r}; known: {', '.join(SPECS)}")
+    node = doc.field(name)
+    return {"doc_id": doc.doc_id, "field": name, "status": "hit" if node is not None else "miss", "node": node}
+
+
+def route_reload(registry: DocumentRegistry, params: Dict[str, str]) -> Dict[str, Any]:
+    doc_id = params.get("doc_id")
+    if doc_id and registry.get(doc_id) is None:
+        raise QueryError(404, f"unknown doc_id {doc_id!r}")
+    return registry.scan(force_doc=doc_id)
+
+
+ROUTES = {
+    ("GET", "/health"): route_health,
+    ("GET", "/documents"): route_documents,
+    ("GET", "/search"): route_search,
+    ("GET", "/fields"): route_fields,
+    ("POST", "/reload"): route_reload,
+}
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    args = parse_args()
+    root = Path(args.provisions_dir)
+    if not root.is_dir():
+        sys.stderr.write(f"Provisions directory not found: {root}\n")
+        sys.exit(1)
+    configure_embeddings(args)
+    registry = DocumentRegistry(root)
+    start = time.perf_counter()
+    registry.scan()
+    print(f"Loaded {len(registry.all())} documents in {time.perf_counter() - start:.2f}s", flush=True)
+
+    handler = type("Handler", (QueryHandler,), {"registry": registry, "verbose": args.verbose})
+    if args.socket:
+        sock = Path(args.socket)
+        if sock.exists():
+            sock.unlink()
+        sock.parent.mkdir(parents=True, exist_ok=True)
+        server: Any = UnixHTTPServer(str(sock), handler)
+        where = f"unix:{sock}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        where = f"http://{args.host}:{server.server_address[1]}"
+    stop = threading.Event()
+    if args.poll_seconds > 0:
+        threading.Thread(target=registry.poll, args=(args.poll_seconds, stop), daemon=True).start()
+    print(f"Serving on {where} (Ctrl-C to stop)", flush=True)
+
+    def terminate(signum: int, frame: Any):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        finish_embeddings()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Incremental corpus rebuild (make-style): for each document, rebuild layout ->
+provisions -> canonical only where the artifact's manifest (scripts/manifest.py)
+no longer matches its inputs' content hashes, the stage's code version, or its
+config. Downstream stages key on the upstream artifact's content hash, so a
+rebuild that yields byte-identical output stops propagating there.
+
+Usage:
+  python scripts/rebuild.py --input-dir sample_docs/source --layout-dir tmp/layout_full \
+      --provisions-dir tmp/provisions --canonical-dir tmp/canonical
+  python scripts/rebuild.py --layout-dir tmp/layout_full --provisions-dir tmp/provisions \
+      --canonical-dir tmp/canonical --dry-run   # layouts already built; show what would rerun
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import extract_canonical
+from extract_canonical import add_embedding_args, build_canonical, configure_embeddings, finish_embeddings, load_provisions
+from extract_layout import MODEL_ID, add_service_args, analyze_document, collect_batch_jobs, create_client
+from interval_index import ATTACH_MODES
+from manifest import sha256_file, stage_version, stale_reason, write_manifest
+from segment_provisions import IncrementalMismatch, segment, segment_incremental
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild only out-of-date layout/provision/canonical artifacts.")
+    parser.add_argument("--input-dir", help="PDFs to analyze (omit to start from existing layouts).")
+    parser.add_argument("--manifest", help='JSON list of PDF paths or {"input": ..., "doc_id": ...} objects.')
+    parser.add_argument("--layout-dir", required=True, help="Normalized layout JSON directory (<doc_id>.json).")
+    parser.add_argument("--provisions-dir", required=True, help="Provision JSON directory.")
+    parser.add_argument("--canonical-dir", required=True, help="Canonical JSON directory.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every stage regardless of manifests.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what is stale without building.")
+    parser.add_argument("--summary", help="Write the per-document rebuild report (JSON) here.")
+    parser.add_argument("--redact-text", action="store_true", help="Redact text content in the layout stage.")
+    parser.add_argument("--toc-pages", type=int, default=3, help="Initial pages treated as TOC by segmentation.")
+    parser.add_argument("--table-attach", choices=ATTACH_MODES, default="first", help="Segmentation table attach mode.")
+    add_service_args(parser)
+    add_embedding_args(parser)
+    return parser.parse_args()
+
+
+def canonical_config() -> Dict[str, Any]:
+    """Embedding settings that change canonical output (call after configure_embeddings)."""
+    backend = extract_canonical.EMB_BACKEND
+    config: Dict[str, Any] = {"embedding_backend": backend}
+    if backend == "openai":
+        config["embedding_model"] = extract_canonical.EMB_MODEL
+        if extract_canonical.EMB_NEAR_DUPS:
+            config["near_duplicate_threshold"] = extract_canonical.EMB_NEAR_DUPS.threshold
+    elif backend == "local":
+        model_path = extract_canonical.LOCAL_MODEL_PATH
+        config["local_model"] = sha256_file(model_path) if model_path and model_path.exists() else None
+        config["local_svd_components"] = extract_canonical.LOCAL_SVD_COMPONENTS
+    return config
+
+
+def write_json(path: Path, payload: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2))
+
+
+class Rebuilder:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.client: Any = None
+        self.cache_dir = None if args.no_cache else Path(args.cache_dir)
+        self.versions = {stage: stage_version(stage) for stage in ("layout", "segment", "canonical")}
+        self.configs: Dict[str, Dict[str, Any]] = {
+            "layout": {"model_id": MODEL_ID, "redact": args.redact_text},
+            "segment": {"toc_pages": args.toc_pages, "table_attach": args.table_attach},
+            "canonical": canonical_config(),
+        }
+        # Layouts replaced this run (path -> previous layout), for incremental re-segmentation.
+        self.previous_layouts: Dict[Path, Dict[str, Any]] = {}
+
+    def _stale(self, stage: str, artifact: Path, inputs: Dict[str, str]) -> Optional[str]:
+        if self.args.force:
+            return "forced"
+        return stale_reason(artifact, stage, self.versions[stage], inputs, self.configs[stage])
+
+    def _record(self, stage: str, artifact: Path, inputs: Dict[str, str]):
+        write_manifest(artifact, stage, self.versions[stage], inputs, self.configs[stage])
+
+    def layout(self, pdf: Path, doc_id: str, out: Path, report: Dict[str, Any]):
+        inputs = {"pdf": sha256_file(pdf)}
+        reason = report["layout"] = self._stale("layout", out, inputs) or "up to date"
+        if reason == "up to date" or self.args.dry_run:
+            return
+        if self.client is None and not self.args.from_cache:
+            self.client = create_client(self.args)
+        result = analyze_document(
+            self.client,
+            pdf,
+            doc_id,
+            self.args.endpoint,
+            self.args.key,
+            redact=self.args.redact_text,
+            cache_dir=self.cache_dir,
+            cache_only=self.args.from_cache,
+            chunk_pages=self.args.chunk_pages,
+            chunk_concurrency=self.args.chunk_concurrency,
+        )
+        if out.exists():
+            self.previous_layouts[out] = json.loads(out.read_text())
+        write_json(out, result)
+        self._record("layout", out, inputs)
+
+    def segment(self, layout_path: Path, out: Path, report: Dict[str, Any]):
+        inputs = {"layout": sha256_file(layout_path)}
+        reason = report["segment"] = self._stale("segment", out, inputs) or "up to date"
+        if reason == "up to date" or self.args.dry_run:
+            return
+        layout = json.loads(layout_path.read_text())
+        previous_layout = self.previous_layouts.pop(layout_path, None)
+        provisions = None
+        if reason == "inputs changed" and previous_layout is not None:
+            # Only the layout changed: re-segment around its changed pages.
+            try:
+                provisions, stats = segment_incremental(
+                    previous_layout, json.loads(out.read_text())["provisions"], layout, self.args.toc_pages, self.args.table_attach
+                )
+                report["segment"] = f"{reason} (incremental: {stats['provisions_reused']} reused, {stats['provisions_resegmented']} re-segmented)"
+            except IncrementalMismatch:
+                provisions = None
+        if provisions is None:
+            provisions = segment(layout, self.args.toc_pages, self.args.table_attach)
+        write_json(out, {"provisions": provisions, "source_layout": layout_path.name})
+        self._record("segment", out, inputs)
+
+    def canonical(self, provisions_path: Path, out: Path, report: Dict[str, Any]):
+        inputs = {"provisions": sha256_file(provisions_path)}
+        reason = report["canonical"] = self._stale("canonical", out, inputs) or "up to date"
+        if reason == "up to date" or self.args.dry_run:
+            return
+        doc_id, provisions = load_provisions(provisions_path)
+        write_json(out, build_canonical(doc_id, provisions))
+        self._record("canonical", out, inputs)
+
+    def run_document(self, doc_id: str, pdf: Optional[Path]) -> Dict[str, Any]:
+        args = self.args
+        layout_path = Path(args.layout_dir) / f"{doc_id}.json"
+        provisions_path = Path(args.provisions_dir) / f"{doc_id}.json"
+        canonical_path = Path(args.canonical_dir) / f"{doc_id}.json"
+        report: Dict[str, Any] = {"doc_id": doc_id}
+        start = time.perf_counter()
+        if pdf:
+            self.layout(pdf, doc_id, layout_path, report)
+        # In a dry run a stale upstream means downstream would see new input; stop there.
+        if layout_path.exists() and not (args.dry_run and report.get("layout", "up to date") != "up to date"):
+            self.segment(layout_path, provisions_path, report)
+            if provisions_path.exists() and not (args.dry_run and report["segment"] != "up to date"):
+                self.canonical(provisions_path, canonical_path, report)
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+
+
+def collect_documents(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    if args.input_dir or args.manifest:
+        return [{"doc_id": job["doc_id"], "pdf": job["input"]} for job in collect_batch_jobs(args.input_dir, args.manifest)]
+    layouts = [
+        p
+        for p in sorted(Path(args.layout_dir).glob("*.json"))
+        if not p.name.startswith("_") and not p.name.endswith(".manifest.json")
+    ]
+    return [{"doc_id": path.stem, "pdf": None} for path in layouts]
+
+
+def main():
+    args = parse_args()
+    if args.from_cache and args.no_cache:
+        sys.stderr.write("--from-cache cannot be combined with --no-cache.\n")
+        sys.exit(1)
+    configure_embeddings(args)
+    rebuilder = Rebuilder(args)
+    documents = collect_documents(args)
+    reports: List[Dict[str, Any]] = []
+    failed = 0
+    for doc in documents:
+        try:
+            report = rebuilder.run_document(doc["doc_id"], doc["pdf"])
+        except Exception as exc:  # keep going; one bad document should not stop the corpus
+            report = {"doc_id": doc["doc_id"], "error": f"{type(exc).__name__}: {exc}"}
+            failed += 1
+        reports.append(report)
+        stages = ", ".join(f"{s}={report[s]}" for s in ("layout", "segment", "canonical") if s in report)
+        print(f"{doc['doc_id']}: {report.get('error') or stages}")
+
+    rebuilt = {
+        stage: sum(1 for r in reports if r.get(stage) not in (None, "up to date"))
+        for stage in ("layout", "segment", "canonical")
+    }
+    verb = "stale" if args.dry_run else "rebuilt"
+    print(f"{len(documents)} documents; {verb}: " + ", ".join(f"{s}={n}" for s, n in rebuilt.items()) + f"; failed={failed}")
+    if args.summary:
+        write_json(Path(args.summary), {"documents": reports, verb: rebuilt, "failed": failed, "stage_versions": rebuilder.versions})
+    finish_embeddings()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,18 @@ See docs/segmentation_design.md for intent and docs/layout_schema.md for input s
 """
 
 import argparse
+import hashlib
 import json
 import re
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from interval_index import ATTACH_MODES, attach_tables
+from jsonl_io import iter_provisions, is_jsonl, load_layout, open_layout, write_provisions
+from layout_diff import diff_layouts
+from layout_records import Block, Section, Table, sections_from_dicts
+from metrics import add_metrics_args, incr, instrument, timer
 
 HEADING_PATTERNS = [
     re.compile(r"^ARTICLE\b", re.IGNORECASE),
@@ -21,20 +28,34 @@ HEADING_PATTERNS = [
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Segment layout JSON into provision candidates.")
-    parser.add_argument("--input", required=True, help="Path to normalized layout JSON (full text).")
-    parser.add_argument("--out", required=True, help="Output path for provision JSON.")
+    parser.add_argument(
+        "--input", required=True, help="Path to normalized layout JSON (full text); .jsonl layouts are streamed."
+    )
+    parser.add_argument("--out", required=True, help="Output path for provision JSON (.jsonl writes incrementally).")
     parser.add_argument(
         "--toc-pages",
         type=int,
         default=3,
         help="Number of initial pages to treat as TOC and skip content grouping.",
     )
+    parser.add_argument(
+        "--table-attach",
+        choices=ATTACH_MODES,
+        default="first",
+        help="Attach each table to the first overlapping provision, all overlapping ones, or the best bbox/page overlap.",
+    )
+    parser.add_argument(
+        "--previous-layout",
+        help="Layout this document's previous provisions were segmented from; with --previous-provisions, re-segment only around changed pages.",
+    )
+    parser.add_argument("--previous-provisions", help="Provisions JSON/JSONL segmented from --previous-layout.")
+    add_metrics_args(parser)
     return parser.parse_args()
 
 
-def is_heading(block: Dict[str, Any]) -> bool:
-    text = (block.get("text") or "").strip()
-    btype = (block.get("type") or "").lower()
+def is_heading(block: Block) -> bool:
+    text = (block.text or "").strip()
+    btype = (block.type or "").lower()
     text_has_alpha = any(ch.isalpha() for ch in text)
     if not text_has_alpha:
         return False
@@ -43,86 +64,383 @@ def is_heading(block: Dict[str, Any]) -> bool:
     return any(pat.search(text) for pat in HEADING_PATTERNS)
 
 
-def flatten_blocks(sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    blocks: List[Dict[str, Any]] = []
+def reading_order(block: Block) -> Tuple[int, Tuple[float, ...]]:
+    return block.page or 0, tuple(block.bbox) if block.bbox else (0, 0, 0, 0)
+
+
+def flatten_blocks(sections: List[Section]) -> List[Block]:
+    blocks: List[Block] = []
     for section in sections:
-        blocks.extend(section.get("blocks", []))
-    return sorted(blocks, key=lambda b: (b.get("page") or 0, b.get("bbox") or [0, 0, 0, 0]))
+        blocks.extend(section.blocks or [])
+    return sorted(blocks, key=reading_order)
 
 
-def collect_tables(sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    tables: List[Dict[str, Any]] = []
+def collect_tables(sections: List[Section]) -> List[Table]:
+    tables: List[Table] = []
     for section in sections:
-        tables.extend(section.get("tables", []))
+        tables.extend(section.tables or [])
     return tables
 
 
-def provision_id(doc_id: str, idx: int, heading_text: str) -> str:
-    slug = re.sub(r"[^a-zA-Z0-9]+", "_", heading_text.strip()).strip("_").lower() or f"section_{idx}"
-    return f"{doc_id}:{idx:04d}:{slug}"
+def provision_id(doc_id: str, heading_text: str, first_text: str = "") -> str:
+    """
+    Content-derived ID: heading slug plus a digest of the heading and the
+    provision's first block, so inserting or removing provisions elsewhere in
+    the document leaves it unchanged.
+    """
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", heading_text.strip()).strip("_").lower() or "section"
+    digest = hashlib.sha1(f"{heading_text.strip()}\n{first_text.strip()}".encode("utf-8")).hexdigest()[:8]
+    return f"{doc_id}:{slug}:{digest}"
 
 
-def segment(layout: Dict[str, Any], toc_pages: int) -> List[Dict[str, Any]]:
-    doc_id = layout.get("document_id") or Path(layout.get("file_name", "")).stem
-    sections = layout.get("sections", [])
-    blocks = [b for b in flatten_blocks(sections) if (b.get("page") or 0) > toc_pages]
-    tables = collect_tables(sections)
+class ProvisionIds:
+    """Assigns provision IDs in document order; exact repeats (same heading and first block) get ~2, ~3, ..."""
 
-    provisions: List[Dict[str, Any]] = []
-    current: Dict[str, Any] = {}
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.seen: Dict[str, int] = {}
+
+    def assign(self, provision: Any):
+        if isinstance(provision, dict):
+            title, blocks = provision.get("title"), provision.get("blocks") or []
+            first = blocks[0].get("text") if blocks else ""
+        else:
+            title, blocks = provision.title, provision.blocks or []
+            first = blocks[0].text if blocks else ""
+        pid = provision_id(self.doc_id, title or "", first or "")
+        count = self.seen[pid] = self.seen.get(pid, 0) + 1
+        if count > 1:
+            pid = f"{pid}~{count}"
+        if isinstance(provision, dict):
+            provision["provision_id"] = pid
+        else:
+            provision.provision_id = pid
+
+
+def new_provision(doc_id: str, blk: Block) -> Section:
+    # provision_id is assigned once the provision is complete (ProvisionIds).
+    return Section.new(
+        provision_id=None,
+        title=blk.text,
+        doc_id=doc_id,
+        breadcrumbs=[blk.text],
+        page_range=[blk.page, blk.page],
+        blocks=[],
+        tables=[],
+        provenance={
+            "section": blk.text,
+            "page_range": [blk.page, blk.page],
+        },
+    )
+
+
+def add_block(provision: Section, blk: Block):
+    provision.blocks.append(blk)
+    if blk.page and provision.page_range:
+        provision.page_range[1] = max(provision.page_range[1], blk.page)
+
+
+def group_blocks(doc_id: str, blocks: List[Block]) -> List[Section]:
+    """Heading-driven grouping of reading-ordered content blocks (content before the first heading is skipped)."""
+    provisions: List[Section] = []
+    current: Optional[Section] = None
     for blk in blocks:
         if is_heading(blk):
             if current:
                 provisions.append(current)
-            current = {
-                "provision_id": provision_id(doc_id, len(provisions) + 1, blk.get("text", "")),
-                "title": blk.get("text"),
-                "doc_id": doc_id,
-                "breadcrumbs": [blk.get("text")],
-                "page_range": [blk.get("page"), blk.get("page")],
-                "blocks": [],
-                "tables": [],
-                "provenance": {
-                    "section": blk.get("text"),
-                    "page_range": [blk.get("page"), blk.get("page")],
-                },
-            }
-        else:
-            if not current:
-                # Skip content before first heading after TOC
-                continue
-            current["blocks"].append(blk)
-            page = blk.get("page")
-            if page and current.get("page_range"):
-                current["page_range"][1] = max(current["page_range"][1], page)
+            current = new_provision(doc_id, blk)
+        elif current:
+            add_block(current, blk)
 
     if current:
         provisions.append(current)
+    return provisions
+
 
-    # Attach tables by page overlap
-    for tbl in tables:
-        pr = tbl.get("page_range")
-        if not pr:
-            continue
-        for prov in provisions:
-            ppr = prov.get("page_range")
-            if ppr and pr[0] <= ppr[1] and pr[1] >= ppr[0]:
-                prov.setdefault("tables", []).append(tbl)
-                break
+def segment_sections(doc_id: str, sections: List[Section], toc_pages: int, table_attach: str = "first") -> List[Section]:
+    """Group layout section records into provision records (no dict conversion)."""
+    blocks = [b for b in flatten_blocks(sections) if (b.page or 0) > toc_pages]
+    tables = collect_tables(sections)
+    provisions = group_blocks(doc_id, blocks)
+
+    # Attach tables by page overlap (unmatched tables are dropped)
+    with timer("segment.attach_tables"):
+        attach_tables(provisions, tables, mode=table_attach)
 
+    ids = ProvisionIds(doc_id)
+    for prov in provisions:
+        ids.assign(prov)
+    incr("segment.blocks", len(blocks))
+    incr("segment.tables", len(tables))
+    incr("segment.provisions", len(provisions))
     return provisions
 
 
+def layout_doc_id(layout: Dict[str, Any]) -> str:
+    return layout.get("document_id") or Path(layout.get("file_name", "")).stem
+
+
+def segment(layout: Dict[str, Any], toc_pages: int, table_attach: str = "first") -> List[Dict[str, Any]]:
+    """Dict-in/dict-out wrapper over segment_sections()."""
+    with timer("segment.load_records"):
+        sections = sections_from_dicts(layout.get("sections", []))
+    with timer("segment.group"):
+        provisions = segment_sections(layout_doc_id(layout), sections, toc_pages, table_attach)
+    with timer("segment.dump_records"):
+        return [prov.to_dict() for prov in provisions]
+
+
+class IncrementalMismatch(ValueError):
+    """Previous provisions do not line up with the previous layout (different layout, TOC pages or version)."""
+
+
+def _spliced_provision(doc_id: str, heading: Dict[str, Any], blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Same dict as new_provision()/add_block() followed by to_dict(), built from the new layout's block dicts.
+    page = heading.get("page")
+    end = max([page] + [b.get("page") for b in blocks if b.get("page")])
+    return {
+        "provision_id": None,
+        "title": heading.get("text"),
+        "doc_id": doc_id,
+        "breadcrumbs": [heading.get("text")],
+        "page_range": [page, end],
+        "blocks": blocks,
+        "tables": [],
+        "provenance": {"section": heading.get("text"), "page_range": [page, page]},
+    }
+
+
+def segment_incremental(
+    previous_layout: Dict[str, Any],
+    previous_provisions: List[Dict[str, Any]],
+    layout: Dict[str, Any],
+    toc_pages: int,
+    table_attach: str = "first",
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    segment() for an amended layout, given the previous layout and its provisions.
+
+    The page diff (layout_diff.py) maps unchanged old pages to new pages. A
+    previous provision is reused when every block from its heading through the
+    next provision's heading sits on unchanged pages at a constant offset; its
+    blocks are then taken from the new layout by position (ids and page numbers
+    follow the new layout) without re-running heading detection. Only the gaps
+    between reused provisions (the region around changed pages) are grouped
+    again. Tables are re-attached over the spliced list (cheap, page-interval
+    index) and IDs reassigned, so the output equals segment() on the new layout.
+    Raises IncrementalMismatch if the previous provisions do not fit the previous layout.
+    """
+    doc_id = layout_doc_id(layout)
+    with timer("segment.layout_diff"):
+        diff = diff_layouts(previous_layout, layout)
+    old_blocks, old_offsets = diff.old.content_blocks(toc_pages)
+    new_blocks, new_offsets = diff.new.content_blocks(toc_pages)
+
+    # Old content position -> new content position, for blocks on unchanged pages that stay past the TOC.
+    position = [-1] * len(old_blocks)
+    for old_page, new_page in diff.page_map.items():
+        if old_page in old_offsets and new_page in new_offsets:
+            start, target = old_offsets[old_page], new_offsets[new_page]
+            for i in range(len(diff.old.pages[old_page])):
+                position[start + i] = target + i
+
+    # Each previous provision is its heading block followed by its blocks, back to back.
+    headings: List[int] = []
+    cursor = len(old_blocks) - sum(1 + len(p.get("blocks") or []) for p in previous_provisions)
+    for prov in previous_provisions:
+        if cursor < 0 or old_blocks[cursor].get("text") != prov.get("title"):
+            raise IncrementalMismatch(f"provision {prov.get('provision_id')!r} does not start at a heading of the previous layout")
+        headings.append(cursor)
+        cursor += 1 + len(prov.get("blocks") or [])
+
+    def reusable(k: int) -> bool:
+        # Blocks from this heading through the next heading (or the end) unchanged, contiguous in the new layout.
+        start = headings[k]
+        last = headings[k + 1] if k + 1 < len(headings) else len(old_blocks) - 1
+        base = position[start]
+        if base < 0 or any(position[i] != base + (i - start) for i in range(start + 1, last + 1)):
+            return False
+        return k + 1 < len(headings) or position[last] == len(new_blocks) - 1
+
+    provisions: List[Dict[str, Any]] = []
+    stats = {"pages_changed": len(diff.changed_pages), "pages_removed": len(diff.removed_pages)}
+    stats.update({"provisions_reused": 0, "provisions_resegmented": 0, "blocks_resegmented": 0})
+
+    def regroup(begin: int, end: int):
+        if begin >= end:
+            return
+        blocks = [Block.from_dict(b) for b in new_blocks[begin:end]]
+        fresh = [prov.to_dict() for prov in group_blocks(doc_id, blocks)]
+        provisions.extend(fresh)
+        stats["provisions_resegmented"] += len(fresh)
+        stats["blocks_resegmented"] += end - begin
+
+    with timer("segment.splice"):
+        cursor = 0  # first new content position not yet covered
+        for k, prov in enumerate(previous_provisions):
+            if not reusable(k):
+                continue
+            start = position[headings[k]]
+            regroup(cursor, start)
+            count = len(prov.get("blocks") or [])
+            provisions.append(_spliced_provision(doc_id, new_blocks[start], new_blocks[start + 1 : start + 1 + count]))
+            stats["provisions_reused"] += 1
+            cursor = start + 1 + count
+        regroup(cursor, len(new_blocks))
+
+    with timer("segment.attach_tables"):
+        attach_tables(provisions, list(diff.new.tables), mode=table_attach)
+    ids = ProvisionIds(doc_id)
+    for prov in provisions:
+        ids.assign(prov)
+    for name, value in stats.items():
+        incr(f"segment.incremental.{name}", value)
+    incr("segment.provisions", len(provisions))
+    return provisions, stats
+
+
+class StreamOrderError(ValueError):
+    """Layout sections are too far out of page order to segment as a stream."""
+
+
+def _table_pages(table: Table) -> Optional[List[int]]:
+    pr = table.page_range
+    return pr if pr and pr[0] is not None and pr[1] is not None else None
+
+
+def segment_stream(
+    header: Dict[str, Any], sections: Iterable[Dict[str, Any]], toc_pages: int, table_attach: str = "first"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming segment(): consumes sections in document order and yields each
+    provision once no later block or table can change it. Blocks wait in a page
+    window until a section starting on a later page arrives, and tables attach
+    once every provision they could overlap is closed, so memory holds a few
+    pages rather than the document. Output equals segment() for layouts whose
+    sections are in page order; otherwise StreamOrderError is raised and callers
+    fall back to segment().
+    """
+    if table_attach not in ATTACH_MODES:
+        raise ValueError(f"Unknown table attach mode {table_attach!r}; expected one of {ATTACH_MODES}")
+    doc_id = layout_doc_id(header)
+    window: Dict[int, List[Block]] = {}  # page -> buffered blocks, arrival order
+    flushed_below = 0  # blocks on pages below this have been segmented
+    emitted_end = 0  # last page of any provision already yielded
+    closed: Deque[Section] = deque()
+    pending: Deque[Table] = deque()
+    state: Dict[str, Any] = {"current": None}
+    ids = ProvisionIds(doc_id)
+
+    def take(blocks: List[Block]):
+        # Same grouping as segment_sections(), applied to one page's sorted blocks.
+        for blk in blocks:
+            if (blk.page or 0) <= toc_pages:
+                continue
+            current = state["current"]
+            if is_heading(blk):
+                if current:
+                    closed.append(current)
+                state["current"] = new_provision(doc_id, blk)
+            elif current:
+                add_block(current, blk)
+
+    def flush(below: float):
+        for page in sorted(p for p in window if p < below):
+            take(sorted(window.pop(page), key=reading_order))
+
+    def attach_ready(open_start: float):
+        # FIFO keeps each provision's tables in segment()'s collection order.
+        while pending and _table_pages(pending[0])[1] < min(flushed_below, open_start):
+            attach_tables(list(closed), [pending.popleft()], mode=table_attach)
+
+    def emit_ready() -> Iterator[Dict[str, Any]]:
+        nonlocal emitted_end
+        while closed and all(_table_pages(t)[0] > closed[0].page_range[1] for t in pending):
+            prov = closed.popleft()
+            ids.assign(prov)
+            emitted_end = max(emitted_end, prov.page_range[1] or 0)
+            yield prov.to_dict()
+
+    def open_start() -> float:
+        current = state["current"]
+        return current.page_range[0] if current and current.page_range[0] is not None else float("inf")
+
+    for section_dict in sections:
+        section = Section.from_dict(section_dict)
+        pages: List[int] = []
+        for blk in section.blocks or []:
+            page = blk.page or 0
+            if page < flushed_below and page > toc_pages:
+                raise StreamOrderError(f"block on page {page} arrived after pages < {flushed_below} were segmented")
+            window.setdefault(page, []).append(blk)
+            pages.append(page)
+        for table in section.tables or []:
+            tpr = _table_pages(table)
+            if not tpr:
+                continue  # segment() drops tables without a page range
+            if tpr[0] <= emitted_end:
+                raise StreamOrderError(f"table on page {tpr[0]} arrived after overlapping provisions were written")
+            pending.append(table)
+            pages.append(tpr[0])
+        if pages and min(pages) > flushed_below:
+            flush(min(pages))
+            flushed_below = min(pages)
+        attach_ready(open_start())
+        yield from emit_ready()
+
+    flush(float("inf"))
+    flushed_below = float("inf")
+    if state["current"]:
+        closed.append(state["current"])
+        state["current"] = None
+    attach_ready(float("inf"))
+    yield from emit_ready()
+
+
+def segment_amended(args: argparse.Namespace, layout_path: Path, out_path: Path) -> int:
+    """--previous-layout/--previous-provisions mode; falls back to a full segment() if they do not line up."""
+    with timer("segment.read"):
+        layout = load_layout(layout_path)
+        previous_layout = load_layout(Path(args.previous_layout))
+        previous = list(iter_provisions(Path(args.previous_provisions))[1])
+    try:
+        provisions, stats = segment_incremental(previous_layout, previous, layout, args.toc_pages, args.table_attach)
+        print("Incremental:", ", ".join(f"{k}={v}" for k, v in stats.items()))
+    except IncrementalMismatch as exc:
+        print(f"WARNING: {exc}; segmenting the whole document instead.")
+        provisions = segment(layout, toc_pages=args.toc_pages, table_attach=args.table_attach)
+    with timer("segment.write"):
+        return write_provisions(out_path, provisions, layout_path.name)
+
+
 def main():
     args = parse_args()
     layout_path = Path(args.input)
-    data = json.loads(layout_path.read_text())
-    provisions = segment(data, toc_pages=args.toc_pages)
-
     out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps({"provisions": provisions, "source_layout": layout_path.name}, indent=2))
-    print(f"Wrote {len(provisions)} provisions to {out_path}")
+    metrics_path = Path(args.metrics) if args.metrics else None
+    with instrument(layout_path.stem, metrics_path, args.profile, Path(args.profile_dir)):
+        if args.previous_layout and args.previous_provisions:
+            count = segment_amended(args, layout_path, out_path)
+        elif is_jsonl(layout_path):
+            header, records = open_layout(layout_path)
+            sections = (record for kind, record in records if kind == "section")
+            try:
+                count = write_provisions(
+                    out_path, segment_stream(header, sections, args.toc_pages, args.table_attach), layout_path.name
+                )
+                # Counted only once the stream completes; segment() counts its own on fallback.
+                incr("segment.provisions", count)
+            except StreamOrderError as exc:
+                print(f"WARNING: {exc}; segmenting in memory instead.")
+                provisions = segment(load_layout(layout_path), toc_pages=args.toc_pages, table_attach=args.table_attach)
+                count = write_provisions(out_path, provisions, layout_path.name)
+        else:
+            with timer("segment.read"):
+                data = json.loads(layout_path.read_text())
+            provisions = segment(data, toc_pages=args.toc_pages, table_attach=args.table_attach)
+            with timer("segment.write"):
+                count = write_provisions(out_path, provisions, layout_path.name)
+    print(f"Wrote {count} provisions to {out_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Vectorized similarity scoring for embedding matrices.
+
+Rows are L2-normalized once, so cosine similarity for every query x provision
+pair is a single matrix product; top-K selection uses argpartition instead of a
+full sort. NumPy is optional: without it the same functions fall back to plain
+Python (slower, same results), matching how other optional deps are handled.
+"""
+
+import heapq
+import math
+from typing import Any, List, Sequence
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+EPS = 1e-9
+
+
+def normalize_rows(vectors: Sequence[Sequence[float]]) -> Any:
+    """Unit-length rows (float32 ndarray with NumPy, list of lists otherwise)."""
+    if np is not None:
+        mat = np.asarray(vectors, dtype=np.float32)
+        if mat.ndim != 2:
+            return np.zeros((len(vectors), 0), dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        return mat / (norms + EPS)
+    rows = []
+    for vec in vectors:
+        norm = math.sqrt(sum(x * x for x in vec))
+        rows.append([x / (norm + EPS) for x in vec])
+    return rows
+
+
+def similarity_matrix(queries: Any, docs: Any) -> Any:
+    """Cosine similarities (len(queries) x len(docs)) for pre-normalized row matrices."""
+    if np is not None:
+        if not len(queries) or not len(docs):
+            return np.zeros((len(queries), len(docs)), dtype=np.float32)
+        return queries @ docs.T
+    return [[sum(x * y for x, y in zip(q, d)) for d in docs] for q in queries]
+
+
+def top_k_indices(scores: Any, k: int) -> List[int]:
+    """Indices of the k highest scores, best first; ties keep the lower index first."""
+    n = len(scores)
+    if k <= 0 or not n:
+        return []
+    if np is not None:
+        arr = np.asarray(scores)
+        if k == 1:
+            return [int(np.argmax(arr))]
+        part = np.argpartition(-arr, k - 1)[:k] if k < n else np.arange(n)
+        return [int(i) for i in part[np.lexsort((part, -arr[part]))]]
+    return heapq.nlargest(k, range(n), key=lambda i: (scores[i], -i))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Per-page spatial index over layout bboxes, used to tie selection marks
+(checkboxes/radios) to the table cells that contain them or to the nearest label
+block. Items are bucketed into a uniform grid, so each lookup touches only the
+buckets around a point instead of scanning every cell/block on the page.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+GRID_DIVISIONS = 32  # buckets per page side
+MAX_LABEL_DISTANCE = 1.0  # inches (prebuilt-layout PDF units)
+
+STATE_MAP = {"selected": "checked", "unselected": "unchecked"}
+
+BBox = List[float]
+
+
+def bbox_center(bbox: BBox) -> Tuple[float, float]:
+    return (bbox[0] + bbox[2]) / 2.0, (bbox[1] + bbox[3]) / 2.0
+
+
+def point_to_bbox_distance(x: float, y: float, bbox: BBox) -> float:
+    dx = max(bbox[0] - x, 0.0, x - bbox[2])
+    dy = max(bbox[1] - y, 0.0, y - bbox[3])
+    return math.hypot(dx, dy)
+
+
+class GridIndex:
+    """Uniform grid of buckets; each bbox is registered in every bucket it overlaps."""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size or 1.0
+        self.buckets: Dict[Tuple[int, int], List[Tuple[BBox, Any]]] = {}
+
+    @classmethod
+    def for_boxes(cls, bboxes: Iterable[BBox], divisions: int = GRID_DIVISIONS) -> "GridIndex":
+        extent = max((max(b[2], b[3]) for b in bboxes), default=0.0)
+        return cls(extent / divisions if extent else 1.0)
+
+    def _key(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, bbox: BBox, item: Any):
+        kx0, ky0 = self._key(bbox[0], bbox[1])
+        kx1, ky1 = self._key(bbox[2], bbox[3])
+        for kx in range(kx0, kx1 + 1):
+            for ky in range(ky0, ky1 + 1):
+                self.buckets.setdefault((kx, ky), []).append((bbox, item))
+
+    def containing(self, x: float, y: float) -> List[Tuple[BBox, Any]]:
+        """Items whose bbox contains the point, smallest area first."""
+        hits = [(b, it) for b, it in self.buckets.get(self._key(x, y), []) if b[0] <= x <= b[2] and b[1] <= y <= b[3]]
+        hits.sort(key=lambda h: (h[0][2] - h[0][0]) * (h[0][3] - h[0][1]))
+        return hits
+
+    def nearest(self, x: float, y: float, max_distance: float) -> Optional[Tuple[float, Any]]:
+        """Closest item (point-to-bbox distance) within max_distance, searching outward ring by ring."""
+        cx, cy = self._key(x, y)
+        best: Optional[Tuple[float, Any]] = None
+        max_ring = int(max_distance // self.cell_size) + 1
+        for ring in range(max_ring + 1):
+            # Anything in ring r is at least (r - 1) * cell_size away.
+            if best and best[0] <= (ring - 1) * self.cell_size:
+                break
+            for kx in range(cx - ring, cx + ring + 1):
+                for ky in range(cy - ring, cy + ring + 1):
+                    if max(abs(kx - cx), abs(ky - cy)) != ring:
+                        continue
+                    for bbox, item in self.buckets.get((kx, ky), ()):
+                        dist = point_to_bbox_distance(x, y, bbox)
+                        if dist <= max_distance and (best is None or dist < best[0]):
+                            best = (dist, item)
+        return best
+
+
+def _strip_marks(text: Optional[str]) -> str:
+    return (text or "").replace(":selected:", "").replace(":unselected:", "").strip()
+
+
+def _cell_label(cell: Dict[str, Any], row_cells: List[Dict[str, Any]]) -> Optional[str]:
+    text = _strip_marks(cell.get("text"))
+    if text:
+        return text
+    headers = [_strip_marks(h) for h in cell.get("headers") or []]
+    if any(headers):
+        return " / ".join(h for h in headers if h)
+    first = next((c for c in row_cells if c.get("col_index") == 0 and c is not cell), None)
+    if not first:
+        return None
+    return (first.get("text") or "").strip() or None
+
+
+def link_selection_marks(
+    sections: List[Dict[str, Any]],
+    tables: List[Dict[str, Any]],
+    selection_marks: List[Dict[str, Any]],
+    max_label_distance: float = MAX_LABEL_DISTANCE,
+):
+    """
+    Assign each selection mark to the smallest table cell containing its center (setting the
+    cell's checkbox_state) or, failing that, to the nearest block on the page as its label.
+    Mutates the normalized dicts in place.
+    """
+    cells_by_page: Dict[int, List[Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]]] = {}
+    for table in tables:
+        for row in table.get("rows", []):
+            for cell in row.get("cells", []):
+                if cell.get("page") and cell.get("bbox"):
+                    cells_by_page.setdefault(cell["page"], []).append((cell, table, row.get("cells", [])))
+    blocks_by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for section in sections:
+        for blk in section.get("blocks", []):
+            if blk.get("page") and blk.get("bbox") and (blk.get("text") or "").strip():
+                blocks_by_page.setdefault(blk["page"], []).append(blk)
+
+    marks_by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for idx, mark in enumerate(selection_marks):
+        mark["id"] = mark.get("id") or f"sm-{mark.get('page')}-{idx}"
+        if mark.get("page") and mark.get("bbox"):
+            marks_by_page.setdefault(mark["page"], []).append(mark)
+
+    for page, marks in marks_by_page.items():
+        page_cells = cells_by_page.get(page, [])
+        page_blocks = blocks_by_page.get(page, [])
+        boxes = [c[0]["bbox"] for c in page_cells] + [b["bbox"] for b in page_blocks] + [m["bbox"] for m in marks]
+        cell_grid = GridIndex.for_boxes(boxes)
+        block_grid = GridIndex(cell_grid.cell_size)
+        for entry in page_cells:
+            cell_grid.insert(entry[0]["bbox"], entry)
+        for blk in page_blocks:
+            block_grid.insert(blk["bbox"], blk)
+
+        for mark in marks:
+            x, y = bbox_center(mark["bbox"])
+            state = STATE_MAP.get(mark.get("state") or "", "unknown")
+            inside = cell_grid.containing(x, y)
+            if inside:
+                cell, table, row_cells = inside[0][1]
+                ids = cell.setdefault("selection_mark_ids", [])
+                ids.append(mark["id"])
+                # Several marks in one cell: any checked mark wins, otherwise keep the first known state.
+                prior = cell.get("checkbox_state")
+                if prior in (None, "unknown") or state == "checked":
+                    cell["checkbox_state"] = state
+                mark.update(
+                    {
+                        "table_id": table.get("id"),
+                        "row_index": cell.get("row_index"),
+                        "col_index": cell.get("col_index"),
+                        "label": _cell_label(cell, row_cells),
+                        "label_block_id": None,
+                    }
+                )
+                continue
+            near = block_grid.nearest(x, y, max_label_distance)
+            if near:
+                blk = near[1]
+                mark.update({"label": blk.get("text"), "label_block_id": blk.get("id"), "table_id": None})
+            else:
+                mark.update({"label": None, "label_block_id": None, "table_id": None})
@@ -0,0 +1,40 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from corpus_db import CorpusStore, connect, field_values, resolve_field  # noqa: E402
+
+PROVENANCE = {"doc_id": "plan1", "provision_id": "plan1:7_1_loans:4f1c9a2e", "title": "7.1 LOANS", "page_range": [7, 8]}
+
+
+def test_resolve_field_follows_spec_plan_path():
+    plan = {"loans": {"enabled": True, "provenance": PROVENANCE}}
+    node, provenance = resolve_field(plan, "loans.enabled")
+    assert node == plan["loans"]
+    assert provenance == PROVENANCE
+
+
+def test_resolve_leaf_value_uses_enclosing_provenance():
+    plan = {"custom": {"flag": True, "provenance": PROVENANCE}}
+    node, provenance = resolve_field(plan, "custom.flag")
+    assert node is True
+    assert provenance == PROVENANCE
+    assert resolve_field(plan, "custom.missing") == (None, None)
+
+
+def test_ingest_canonical_leaf_field_keeps_provenance(tmp_path):
+    canonical = {
+        "doc_id": "plan1",
+        "plan": {"loans": {"enabled": True, "provenance": PROVENANCE}},
+        "report": {"loans.enabled": "hit"},
+    }
+    path = tmp_path / "plan1.json"
+    path.write_text(json.dumps(canonical))
+    conn = connect(tmp_path / "corpus.sqlite")
+    CorpusStore(conn).ingest_canonical(path, "digest")
+    rows = field_values(conn, "loans.enabled")
+    assert len(rows) == 1
+    assert rows[0]["provision_id"] == PROVENANCE["provision_id"]
+    assert (rows[0]["page_start"], rows[0]["page_end"]) == (7, 8)